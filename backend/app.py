@@ -16,7 +16,7 @@ try:
 except ImportError:
     print("Warning: SignalGenerator not found, using mock")
     class SignalGenerator:
-        def __init__(self, symbols=None):
+        def __init__(self, symbols=None, price_store=None, token_registry=None):
             self.symbols = symbols if symbols else ["BTC", "ETH", "ADA", "SOL", "DOT", "LINK"]
 
         def generate_signals(self):
@@ -100,7 +100,7 @@ try:
 except ImportError:
     print("Warning: RebalanceEngine not found, using mock")
     class RebalanceEngine:
-        def __init__(self, risk_manager=None):
+        def __init__(self, risk_manager=None, covariance=None):
             self.risk_manager = risk_manager
             self.strategies = {
                 'shannon': {'name': "Shannon's Demon"},
@@ -134,19 +134,34 @@ except ImportError:
                 'timestamp': time.time()
             }
             
-        def generate_rebalance_plan(self, current_weights, target_weights, prices, cash=0):
+        def generate_rebalance_plan(self, current_weights, target_weights, prices, cash=0, total_value=None,
+                                    bands=None, trailing_volume=0):
             return [
                 {'asset': 'BTC', 'action': 'BUY', 'amount': 0.05, 'value': 2250},
                 {'asset': 'ETH', 'action': 'SELL', 'amount': 0.75, 'value': 2250}
             ]
 
+# Import EWMACovariance with fallback
+try:
+    from models.covariance import EWMACovariance
+except ImportError:
+    print("Warning: EWMACovariance not found, 'mpt' will use signal ranking")
+    EWMACovariance = None
+
+# Import MonteCarloEvaluator with fallback
+try:
+    from models.monte_carlo import MonteCarloEvaluator
+except ImportError:
+    print("Warning: MonteCarloEvaluator not found, strategy simulation disabled")
+    MonteCarloEvaluator = None
+
 # Import VirtualAccountManager with fallback
 try:
     from models.virtual_account import VirtualAccountManager
 except ImportError:
     print("Warning: VirtualAccountManager not found, using mock")
     class VirtualAccountManager:
-        def __init__(self): self.accounts = {}
+        def __init__(self, **kwargs): self.accounts = {}
         def create_account(self, user_id, **kwargs): self.accounts[user_id] = {'balance': 100000, 'bots': []}; return self.accounts[user_id]
         def get_account(self, user_id): return self.accounts.get(user_id)
         def deploy_bot(self, user_id, **kwargs): return {'bot_id': 'mock_bot', 'status': 'active'}
@@ -154,6 +169,29 @@ except ImportError:
         def update_bot_portfolios(self, *args): print("Updating mock bot portfolios...")
         def resume_bot(self, user_id, bot_id): return True
         def delete_bot(self, user_id, bot_id): return True
+        def append_performance(self, user_id, record): self.accounts[user_id].setdefault('performance_history', []).append(record)
+        def get_bot_performance(self, user_id, bot_id, since=None): return []
+
+# Import PriceHistoryStore with fallback
+try:
+    from services.price_store import PriceHistoryStore
+except ImportError:
+    print("Warning: PriceHistoryStore not found, price history will not be persisted")
+    PriceHistoryStore = None
+
+# Import TokenRegistry with fallback
+try:
+    from services.token_registry import TokenRegistry
+except ImportError:
+    print("Warning: TokenRegistry not found, each service will use its own token map")
+    TokenRegistry = None
+
+# Import RecommendationCache with fallback
+try:
+    from services.recommendation_cache import RecommendationCache
+except ImportError:
+    print("Warning: RecommendationCache not found, recommendations will be computed per request")
+    RecommendationCache = None
 
 # Import PriceService with fallback
 try:
@@ -161,6 +199,9 @@ try:
 except ImportError:
     print("Warning: PriceService not found, using mock")
     class PriceService:
+        def __init__(self, price_store=None, token_registry=None):
+            self.price_store = price_store
+        
         def get_latest_prices(self, tokens):
             import random
             base_prices = {
@@ -178,7 +219,7 @@ except ImportError:
                     prices[token] = base_prices[token] * (1 + variation)
             return prices
         
-        def get_historical_data(self):
+        def get_historical_data(self, token=None, days=7):
             # Return mock historical data
             return {
                 'BTC': [45000, 44500, 46000, 45800, 45200],
@@ -224,15 +265,34 @@ cache = {
 
 # Initialize services
 risk_manager = RiskManager()
-signal_generator = SignalGenerator(['BTC', 'ETH', 'ADA', 'DOT', 'USDC'])
-price_service = PriceService()
-rebalance_engine = RebalanceEngine(risk_manager)
-account_manager = VirtualAccountManager()
+price_store = PriceHistoryStore() if PriceHistoryStore else None
+token_registry = TokenRegistry() if TokenRegistry else None
+signal_generator = SignalGenerator(['BTC', 'ETH', 'ADA', 'DOT', 'USDC'], price_store=price_store,
+                                   token_registry=token_registry)
+# Charts keep CoinGecko's hourly resolution, so price history for them is stored in hourly bars
+chart_store = PriceHistoryStore(bar_interval=3600) if PriceHistoryStore else None
+price_service = PriceService(price_store=chart_store, token_registry=token_registry)
+covariance = EWMACovariance(['BTC', 'ETH', 'ADA', 'DOT', 'USDC']) if EWMACovariance else None
+rebalance_engine = RebalanceEngine(risk_manager, covariance=covariance)
+monte_carlo = MonteCarloEvaluator(rebalance_engine) if MonteCarloEvaluator else None
+account_manager = VirtualAccountManager(token_registry=token_registry)
+recommendation_cache = RecommendationCache() if RecommendationCache else None
 
 # Create a default user account for demo
 DEFAULT_USER_ID = "trading_user_01"
 account_manager.create_account(DEFAULT_USER_ID)
 
+def compute_recommendation(risk_profile, current_weights):
+    """Strategy comparison for one risk profile on the latest published signals and prices"""
+    return rebalance_engine.get_rebalance_recommendation(
+        current_weights,
+        cache['signals'],
+        cache['prices'],
+        risk_profile=risk_profile,
+        compare_strategies=True,
+        signals_version=cache.get('signals_version')
+    )
+
 def background_refresh():
     """Background thread to refresh data periodically"""
     global cache
@@ -256,17 +316,30 @@ def background_refresh():
                 }
                 prices = mock_prices
             
+            # Keep the shared covariance current (it only moves when a new bar starts)
+            if covariance is not None:
+                try:
+                    if not covariance.ready:
+                        covariance.seed_from_frames(signal_generator.fetch_price_data_batch(
+                            covariance.tokens, days=signal_generator.history_days))
+                    covariance.observe(prices, time.time())
+                except Exception as e:
+                    logger.warning(f"Covariance update failed: {e}")
+            
             # Generate signals
             signals = signal_generator.generate_signals()
             weights = signal_generator.calculate_target_weights()
             
             # Generate rebalance recommendation
+            current_weights = cache['portfolio_data']['current_weights']
             try:
                 rebalance_recommendation = rebalance_engine.get_rebalance_recommendation(
-                    cache['portfolio_data']['current_weights'],
+                    current_weights,
                     signals,
                     prices,
-                    risk_profile=50  # Default to moderate risk
+                    risk_profile=50,  # Default to moderate risk
+                    compare_strategies=True,
+                    signals_version=getattr(signal_generator, 'signals_version', None)
                 )
             except Exception as e:
                 logger.warning(f"Rebalance recommendation failed: {e}")
@@ -308,6 +381,7 @@ def background_refresh():
             # Update cache
             cache.update({
                 'signals': signals,
+                'signals_version': getattr(signal_generator, 'signals_version', None),
                 'weights': weights,
                 'prices': prices,
                 'risk_assessment': risk_assessment,
@@ -317,6 +391,14 @@ def background_refresh():
                 'last_update': time.time()
             })
             
+            # New data invalidates every cached recommendation; warm all risk profiles again
+            if recommendation_cache is not None:
+                signals_version = cache.get('signals_version')
+                recommendation_cache.publish(signals_version)
+                if rebalance_recommendation is not None:
+                    recommendation_cache.put(50, current_weights, signals_version, rebalance_recommendation)
+                recommendation_cache.warm(current_weights, signals_version, compute_recommendation)
+            
             logger.info("Data refresh completed successfully")
             
         except Exception as e:
@@ -342,7 +424,15 @@ def health_check():
             'prices': 'active',
             'risk_manager': 'active',
             'rebalance_engine': 'active'
-        }
+        },
+        'signal_cache': signal_generator.snapshot_cache.stats() if hasattr(signal_generator, 'snapshot_cache') else {},
+        'target_cache': rebalance_engine.target_cache_stats() if hasattr(rebalance_engine, 'target_cache_stats') else {},
+        'order_netting': getattr(account_manager, 'last_netting_stats', {}),
+        'drift_scheduler': account_manager.drift_scheduler.stats if hasattr(account_manager, 'drift_scheduler') else {},
+        'recommendation_cache': recommendation_cache.stats() if recommendation_cache is not None else {},
+        'account_store': dict(account_manager.store.stats, backend=type(account_manager.store).__name__)
+                         if hasattr(account_manager, 'store') else {},
+        'persistence': account_manager.persistence.stats() if hasattr(account_manager, 'persistence') else {}
     })
 
 @app.route('/api/signals', methods=['GET'])
@@ -398,7 +488,8 @@ def rebalance_portfolio():
         rebalance_plan = rebalance_engine.generate_rebalance_plan(
             current_weights, 
             weights or cache['rebalance_recommendation']['target_weights'],
-            prices
+            prices,
+            total_value=cache['portfolio_data']['total_value']
         )
         
         # Simulate rebalancing delay
@@ -436,17 +527,14 @@ def get_rebalance_recommendation():
     """Get portfolio rebalance recommendation"""
     try:
         risk_profile = request.args.get('risk_profile', 50, type=int)
+        current_weights = cache['portfolio_data']['current_weights']
         
-        if not cache.get('rebalance_recommendation') or risk_profile != 50:
-            # Generate new recommendation if risk profile changed
-            recommendation = rebalance_engine.get_rebalance_recommendation(
-                cache['portfolio_data']['current_weights'],
-                cache['signals'],
-                cache['prices'],
-                risk_profile=risk_profile
-            )
+        if recommendation_cache is not None:
+            # Warmed after every refresh; concurrent misses for the same key share one computation
+            recommendation = recommendation_cache.get(risk_profile, current_weights, cache.get('signals_version'),
+                                                      compute_recommendation)
         else:
-            recommendation = cache['rebalance_recommendation']
+            recommendation = compute_recommendation(risk_profile, current_weights)
             
         return jsonify({
             'recommendation': recommendation,
@@ -457,6 +545,35 @@ def get_rebalance_recommendation():
         logger.error(f"Rebalance recommendation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/portfolio/simulation', methods=['GET'])
+def simulate_strategies():
+    """Monte Carlo outcome distributions of every strategy over the coming horizon"""
+    try:
+        if monte_carlo is None:
+            return jsonify({'error': 'Strategy simulation not available'}), 503
+        
+        simulation = monte_carlo.evaluate(
+            cache['portfolio_data']['current_weights'],
+            cache['signals'],
+            cache['prices'],
+            risk_profile=int(request.args.get('risk_profile', 50)),
+            n_paths=int(request.args.get('paths', monte_carlo.n_paths)),
+            horizon=int(request.args.get('horizon', monte_carlo.horizon)),
+            seed=int(request.args['seed']) if 'seed' in request.args else None,
+            signals_version=cache.get('signals_version')
+        )
+        
+        return jsonify({
+            'simulation': simulation,
+            'last_update': cache['last_update']
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Strategy simulation error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/portfolio/history', methods=['GET'])
 def get_portfolio_history():
     """Get portfolio performance history"""
@@ -586,6 +703,22 @@ def delete_bot(bot_id):
         logger.error(f"Failed to delete bot {bot_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/bots/<bot_id>/performance', methods=['GET'])
+def get_bot_performance(bot_id):
+    """Performance snapshots of one of the user's bots over the last `hours` (default 24)."""
+    try:
+        user_id = request.args.get('user_id', DEFAULT_USER_ID)
+        hours = float(request.args.get('hours', 24))
+        history = account_manager.get_bot_performance(user_id, bot_id, since=time.time() - hours * 3600)
+        if history is None:
+            return jsonify({'error': f'Bot {bot_id} not found'}), 404
+        return jsonify({'bot_id': bot_id, 'hours': hours, 'performance': history})
+    except ValueError:
+        return jsonify({'error': 'hours must be a number'}), 400
+    except Exception as e:
+        logger.error(f"Failed to fetch performance for bot {bot_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/strategies', methods=['GET'])
 def get_strategies():
     """Get available rebalancing strategies"""
@@ -688,15 +821,8 @@ def update_account_performance():
             'pnl_percent': pnl_percent
         }
         
-        # Add to performance history
-        if 'performance_history' not in account:
-            account['performance_history'] = []
-        
-        account['performance_history'].append(new_record)
-        
-        # Save account
-        account_manager.accounts[user_id] = account
-        account_manager.save_accounts()
+        # Add to performance history (journaled by the account manager)
+        account_manager.append_performance(user_id, new_record)
         
         return jsonify({
             'success': True,
@@ -742,6 +868,7 @@ if __name__ == '__main__':
     print("   • POST /api/bots/<id>/stop     - Stop a trading bot")
     print("   • POST /api/bots/<id>/resume   - Resume a trading bot")
     print("   • DELETE /api/bots/<id>/delete - Delete a trading bot")
+    print("   • GET  /api/bots/<id>/performance - Bot performance (last 24h)")
     print("\n🌐 Frontend should connect to: http://localhost:5000")
     
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
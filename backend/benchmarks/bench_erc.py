@@ -0,0 +1,66 @@
+"""Equal-risk-contribution solve time vs universe size, cold vs warm-started, and batched subsets.
+
+Run from the backend directory:  python -m benchmarks.bench_erc
+"""
+import time
+
+import numpy as np
+
+from models.covariance import EWMACovariance
+from models.portfolio_optimizer import equal_risk_contribution, equal_risk_contribution_batch
+from services.synthetic_market import SyntheticMarket
+
+SIZES = (5, 10, 25, 50, 100, 250)
+
+
+def make_covariance(n, bars=400, seed=42):
+    """EWMA covariance seeded from a correlated synthetic panel, plus the next bar's prices"""
+    rng = np.random.default_rng(seed)
+    market = SyntheticMarket(seed=seed, drift=0.0, volatility=rng.uniform(0.02, 0.08, n), correlation=0.5)
+    panel = market.generate(n, bars + 1, 100.0)
+    covariance = EWMACovariance([f"T{i}" for i in range(n)])
+    covariance.seed(panel[:, :-1])
+    return covariance, panel[:, -1]
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_sizes():
+    print("📊 ERC solve time vs universe size (best of 5)")
+    print(f"   {'assets':>6s} {'cold':>10s} {'sweeps':>6s} {'warm':>10s} {'sweeps':>6s}")
+    for n in SIZES:
+        covariance, next_prices = make_covariance(n)
+        cov = covariance.matrix(covariance.tokens)
+        cold_time, (previous, cold_sweeps) = timed(lambda: equal_risk_contribution(cov, return_sweeps=True))
+
+        # Next tick: one more bar folded into the EWMA, re-solved from the previous weights
+        covariance._update_bar(next_prices)
+        cov = covariance.matrix(covariance.tokens)
+        warm_time, (_, warm_sweeps) = timed(lambda: equal_risk_contribution(cov, start=previous, return_sweeps=True))
+
+        print(f"   {n:6d} {cold_time * 1e3:8.2f}ms {cold_sweeps:6d} {warm_time * 1e3:8.2f}ms {warm_sweeps:6d}")
+
+
+def bench_batch(universe=50, subset_size=5, subsets=1000, seed=7):
+    covariance, _ = make_covariance(universe)
+    rng = np.random.default_rng(seed)
+    picks = [tuple(rng.choice(covariance.tokens, subset_size, replace=False)) for _ in range(subsets)]
+    covs = np.stack([covariance.matrix(assets) for assets in picks])
+
+    loop_time, _ = timed(lambda: [equal_risk_contribution(cov) for cov in covs], repeat=3)
+    batch_time, _ = timed(lambda: equal_risk_contribution_batch(covs), repeat=3)
+    print(f"\n📊 {subsets} subsets of {subset_size} from {universe} assets")
+    print(f"   one by one: {loop_time * 1e3:8.1f}ms")
+    print(f"   batched:    {batch_time * 1e3:8.1f}ms  ({loop_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    bench_sizes()
+    bench_batch()
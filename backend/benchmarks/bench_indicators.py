@@ -0,0 +1,56 @@
+"""Per-tick cost of the pandas indicator path vs the incremental IndicatorState.
+
+Run from the backend directory:  python -m benchmarks.bench_indicators
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from signals.indicators import IndicatorState
+from signals.strategy import SignalGenerator
+
+
+def make_prices(n, seed=42):
+    rng = np.random.default_rng(seed)
+    prices = 45000 * np.cumprod(1 + rng.normal(0.001, 0.05, n))
+    return pd.Series(prices, index=pd.date_range('2024-01-01', periods=n, freq='D'))
+
+
+def bench_pandas(generator, history, ticks):
+    windows = generator.indicator_windows
+    start = time.perf_counter()
+    for i in range(ticks):
+        prices = history.iloc[i:i + 60]
+        generator.calculate_mean_reversion(prices, windows['mean_reversion'])
+        generator.calculate_momentum(prices, windows['momentum'])
+        generator.calculate_volatility(prices, windows['volatility'])
+        generator.calculate_breakout(prices, windows['breakout'])
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_incremental(generator, history, ticks):
+    state = IndicatorState.from_series(history.iloc[:60], generator.indicator_windows)
+    new_bars = history.iloc[60:60 + ticks]
+    start = time.perf_counter()
+    for timestamp, price in new_bars.items():
+        state.update(price, timestamp)
+        state.signals()
+    return (time.perf_counter() - start) / ticks
+
+
+def main(ticks=500):
+    generator = SignalGenerator(['BTC'])
+    history = make_prices(60 + ticks)
+
+    pandas_cost = bench_pandas(generator, history, ticks)
+    incremental_cost = bench_incremental(generator, history, ticks)
+
+    print(f"📊 Indicator cost per tick over {ticks} ticks (60-bar history)")
+    print(f"   pandas rolling:  {pandas_cost * 1e6:10.1f} µs")
+    print(f"   incremental:     {incremental_cost * 1e6:10.1f} µs")
+    print(f"   speedup:         {pandas_cost / incremental_cost:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Benchmark suite for the signal, rebalance, risk and account hot paths.
+
+Every benchmark runs on fixed, seeded synthetic inputs, so numbers are
+comparable between runs on the same machine. Results are appended to a
+JSON history file; --compare checks the new run against the previous
+one (or --baseline) and exits non-zero when something got slower.
+
+Run from the backend directory:
+    python -m benchmarks.suite                 # run everything, record history
+    python -m benchmarks.suite --compare       # ... and flag regressions
+    python -m benchmarks.suite --only accounts --no-save
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from models.monte_carlo import MonteCarloEvaluator
+from models.rebalance_engine import RebalanceEngine
+from models.risk_model import RiskManager
+from models.virtual_account import VirtualAccountManager
+from signals.strategy import SignalGenerator
+
+TOKENS = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+ALLOCATIONS = [
+    {'BTC': 0.5, 'ETH': 0.5},
+    {'BTC': 0.2, 'ETH': 0.3, 'ADA': 0.2, 'DOT': 0.1, 'USDC': 0.2},
+    {'BTC': 0.4, 'ETH': 0.4, 'DOT': 0.2},
+    {'BTC': 0.3, 'ETH': 0.3, 'ADA': 0.2, 'DOT': 0.2}
+]
+PLAN_TARGETS = {'BTC': 40.0, 'ETH': 25.0, 'ADA': 10.0, 'DOT': 15.0, 'USDC': 10.0}
+BOTS_PER_USER = 10
+SEED = 42
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), 'results', 'history.json')
+
+
+# Fixed synthetic inputs
+
+def make_price_series(n=60, seed=SEED):
+    rng = np.random.default_rng(seed)
+    prices = 45000 * np.cumprod(1 + rng.normal(0.001, 0.05, n))
+    return pd.Series(prices, index=pd.date_range('2024-01-01', periods=n, freq='D'))
+
+
+def make_signals(seed=SEED):
+    rng = np.random.default_rng(seed)
+    signals = {}
+    for token in TOKENS:
+        values = {key: float(v) for key, v in zip(
+            ('mean_reversion', 'momentum', 'volatility', 'breakout'), rng.uniform(-1, 1, 4))}
+        values['total_score'] = round(sum(values.values()) / 4, 3)
+        values['ml_confidence'] = 0.75
+        signals[token] = values
+    return signals
+
+
+def make_portfolios(n, seed=SEED):
+    """Drifted current weights over the bot allocations, for batch recommendations"""
+    rng = np.random.default_rng(seed)
+    portfolios = {}
+    for i in range(n):
+        allocation = ALLOCATIONS[i % len(ALLOCATIONS)]
+        weights = rng.dirichlet([weight * 20 for weight in allocation.values()])
+        portfolios[f"bot_{i}"] = {'current_weights': dict(zip(allocation.keys(), weights.tolist())),
+                                  'risk_profile': [25, 50, 75][i % 3]}
+    return portfolios
+
+
+def make_accounts(n_bots, seed=SEED):
+    """Accounts with BOTS_PER_USER active bots each, history fresh enough that a tick doesn't append"""
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    accounts = {}
+    for b in range(n_bots):
+        user_id = f"user_{b // BOTS_PER_USER}"
+        account = accounts.setdefault(user_id, {
+            'account_id': user_id, 'user_id': user_id, 'balance': 50000, 'initial_balance': 100000,
+            'portfolio': {}, 'bots': [], 'trade_history': [],
+            'performance_history': [{'timestamp': now, 'balance': 50000, 'portfolio_value': 50000,
+                                     'total_value': 100000}],
+            'created_at': now
+        })
+        allocation = ALLOCATIONS[b % len(ALLOCATIONS)]
+        fund = float(rng.uniform(1000, 10000))
+        account['bots'].append({
+            'bot_id': f"bot_{b}", 'strategy': 'tactical', 'risk_profile': 50,
+            'allocated_fund': fund, 'initial_value': fund, 'portfolio_value': fund,
+            'assets': {asset: fund * weight / PRICES[asset] for asset, weight in allocation.items()},
+            'deployment_prices': PRICES, 'status': 'active', 'created_at': now,
+            'performance_history': [{'timestamp': now, 'value': fund, 'pnl': 0, 'pnl_percent': 0}]
+        })
+    return accounts
+
+
+OPEN_MANAGERS = []
+
+
+def make_account_manager(n_bots, directory, storage='journal'):
+    """Manager over make_accounts(n_bots), loaded through the given storage backend"""
+    data_file = os.path.join(directory, f"accounts_{storage}_{n_bots}.json")
+    with open(data_file, 'w') as f:
+        json.dump(make_accounts(n_bots), f)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = VirtualAccountManager(data_file=data_file, start_updates=False, storage=storage)
+    OPEN_MANAGERS.append(manager)  # Closed before their temporary directory goes away
+    return manager
+
+
+# Timing
+
+def measure(fn, repeat=5, number=1):
+    """Run fn `number` times per sample for `repeat` samples; seconds per call"""
+    fn()  # Warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {'median': statistics.median(samples), 'min': min(samples), 'repeat': repeat, 'number': number}
+
+
+def quiet(fn):
+    """Wrap fn so the repo's progress prints don't swamp the report"""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def build_benchmarks(workdir, bot_counts=(10, 1000, 10000)):
+    """(name, callable, repeat, number) for every benchmark"""
+    benchmarks = []
+
+    generator = SignalGenerator(TOKENS)
+    generator.use_real_data = False
+    generator.mock_seed = SEED
+
+    def generate_signals():
+        generator.snapshot_cache.invalidate()  # Time the full recompute, not a cache hit
+        generator.generate_signals()
+
+    benchmarks.append(('signals.generate_signals[mock]', quiet(generate_signals), 5, 5))
+
+    prices = make_price_series()
+    windows = generator.indicator_windows
+    benchmarks += [
+        ('signals.calculate_mean_reversion',
+         lambda: generator.calculate_mean_reversion(prices, windows['mean_reversion']), 5, 50),
+        ('signals.calculate_momentum', lambda: generator.calculate_momentum(prices, windows['momentum']), 5, 50),
+        ('signals.calculate_volatility', lambda: generator.calculate_volatility(prices, windows['volatility']), 5, 50),
+        ('signals.calculate_breakout', lambda: generator.calculate_breakout(prices, windows['breakout']), 5, 50),
+    ]
+
+    engine = RebalanceEngine()
+    risk_manager = RiskManager()
+    signals = make_signals()
+    current_weights = {'BTC': 0.3, 'ETH': 0.3, 'ADA': 0.2, 'DOT': 0.1, 'USDC': 0.1}
+    portfolios = make_portfolios(1000)
+    benchmarks += [
+        ('rebalance.get_rebalance_recommendation',
+         quiet(lambda: engine.get_rebalance_recommendation(current_weights, signals, PRICES, risk_profile=50,
+                                                           compare_strategies=True)), 5, 20),
+        ('rebalance.get_rebalance_recommendation[single]',
+         quiet(lambda: engine.get_rebalance_recommendation(current_weights, signals, PRICES, risk_profile=50,
+                                                           strategy='tactical')), 5, 50),
+        ('rebalance.get_rebalance_recommendation[single,cached]',
+         quiet(lambda: engine.get_rebalance_recommendation(current_weights, signals, PRICES, risk_profile=50,
+                                                           strategy='tactical', signals_version=1)), 5, 50),
+        ('rebalance.get_rebalance_recommendations_batch[1000]',
+         quiet(lambda: engine.get_rebalance_recommendations_batch(portfolios, signals, PRICES,
+                                                                  compare_strategies=True)), 5, 1),
+        ('rebalance.generate_rebalance_plan',
+         lambda: engine.generate_rebalance_plan(current_weights, PLAN_TARGETS, PRICES, total_value=25000), 5, 200),
+        ('montecarlo.evaluate[5000x30]',
+         lambda: MonteCarloEvaluator(engine).evaluate(current_weights, signals, PRICES, seed=SEED), 3, 1),
+        ('risk.calculate_portfolio_risk',
+         quiet(lambda: risk_manager.calculate_portfolio_risk(current_weights, PRICES, signals)), 5, 200),
+    ]
+
+    for n_bots in bot_counts:
+        manager = make_account_manager(n_bots, workdir)
+        repeat, number = (3, 1) if n_bots >= 10000 else (5, 3 if n_bots >= 1000 else 20)
+        benchmarks += [
+            (f"accounts.update_all_portfolios[{n_bots}]",
+             quiet(lambda manager=manager: manager._update_all_portfolios(prices=PRICES)), repeat, number),
+            (f"accounts.save_accounts[{n_bots}]", quiet(manager.save_accounts), repeat, number),
+        ]
+        for storage, prefix in (('journal', 'accounts'), ('sqlite', 'accounts.sqlite')):
+            if storage != 'journal':
+                manager = make_account_manager(n_bots, workdir, storage)
+            last_bot, last_user = f"bot_{n_bots - 1}", f"user_{(n_bots - 1) // BOTS_PER_USER}"
+            benchmarks += [
+                (f"{prefix}.execute_virtual_trade[{n_bots}]",
+                 quiet(lambda manager=manager: manager.execute_virtual_trade('user_0', 'bot_0', 'BTC', 'BUY', 0.001,
+                                                                             PRICES['BTC'])), 5, 20),
+                (f"{prefix}.get_bot_performance[{n_bots}]",
+                 lambda manager=manager, user_id=last_user, bot_id=last_bot:
+                 manager.get_bot_performance(user_id, bot_id, time.time() - 86400), 5, 20),
+            ]
+
+    return benchmarks
+
+
+# History and comparison
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+
+def compare(current, baseline, threshold):
+    """Per-benchmark ratios of the fastest sample (least affected by scheduler noise);
+    a ratio above 1 + threshold counts as a regression"""
+    rows = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if not previous:
+            rows.append((name, result['min'], None, None, False))
+            continue
+        ratio = result['min'] / previous['min'] if previous['min'] > 0 else float('inf')
+        rows.append((name, result['min'], previous['min'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def format_time(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', help='Run only benchmarks whose name contains this text')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON history file')
+    parser.add_argument('--no-save', action='store_true', help="Don't append this run to the history")
+    parser.add_argument('--compare', action='store_true', help='Compare against a previous run')
+    parser.add_argument('--baseline', type=int, default=-1,
+                        help='History entry to compare against (default: the latest)')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown ratio that counts as a regression (default: 0.10 = 10%%)')
+    parser.add_argument('--bots', type=int, nargs='+', default=[10, 1000, 10000],
+                        help='Bot counts for the account benchmarks')
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = build_benchmarks(workdir, args.bots)
+        if args.only:
+            benchmarks = [b for b in benchmarks if args.only in b[0]]
+
+        print(f"📊 Running {len(benchmarks)} benchmarks")
+        results = {}
+        for name, fn, repeat, number in benchmarks:
+            results[name] = measure(fn, repeat, number)
+            print(f"   {name:52s} {format_time(results[name]['median']):>12s}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            while OPEN_MANAGERS:
+                OPEN_MANAGERS.pop().close()
+
+    exit_code = 0
+    if args.compare:
+        if not history:
+            print("⚠️ No history to compare against")
+        else:
+            baseline = history[args.baseline]
+            print(f"\n🔍 Compared with {baseline['timestamp']} ({baseline.get('revision') or 'unknown revision'})")
+            regressions = 0
+            for name, now, before, ratio, regressed in compare(results, baseline['results'], args.threshold):
+                change = f"{(ratio - 1) * 100:+7.1f}%" if ratio is not None else '    new'
+                flag = '❌ slower' if regressed else ''
+                print(f"   {name:52s} {format_time(before):>12s} -> {format_time(now):>12s} {change} {flag}")
+                regressions += regressed
+            if regressions:
+                print(f"❌ {regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+                exit_code = 1
+            else:
+                print("✅ No regressions")
+
+    if not args.no_save:
+        history.append({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results
+        })
+        save_history(args.history, history)
+        print(f"💾 Recorded run in {args.history}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
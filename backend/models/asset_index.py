@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+
+
+class AssetIndex:
+    """Shared symbol -> column map, so weight dicts become fixed-layout NumPy vectors.
+
+    Every vector built from the same index puts an asset in the same column,
+    so drift, turnover and cost between any two portfolios are single array
+    operations. Columns are only ever appended; the layout of each asset
+    order seen is cached.
+    """
+
+    def __init__(self, symbols=()):
+        self.positions = {}
+        self._layouts = {}
+        self._lock = threading.Lock()
+        for symbol in symbols:
+            self.positions.setdefault(symbol, len(self.positions))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def layout(self, assets):
+        """Columns of the given assets, in their order (unseen symbols are registered)"""
+        key = tuple(assets)
+        layout = self._layouts.get(key)
+        if layout is None:
+            with self._lock:
+                for asset in key:
+                    self.positions.setdefault(asset, len(self.positions))
+                layout = np.array([self.positions[asset] for asset in key], dtype=np.intp)
+                if len(self._layouts) >= 4096:
+                    self._layouts.clear()
+                self._layouts[key] = layout
+        return layout
+
+    def vectors(self, *weight_dicts):
+        """One vector per weights dict, all the same length (absent assets are 0)"""
+        first = weight_dicts[0]
+        if all(weights.keys() == first.keys() for weights in weight_dicts):
+            # Same assets throughout (e.g. every strategy's targets for one portfolio): one scatter
+            layout = self.layout(first)
+            vectors = np.zeros((len(weight_dicts), len(self.positions)))
+            vectors[:, layout] = [[weights[asset] for asset in first] for weights in weight_dicts]
+            return vectors
+
+        layouts = [self.layout(weights) for weights in weight_dicts]
+        vectors = np.zeros((len(weight_dicts), len(self.positions)))
+        for row, (weights, layout) in enumerate(zip(weight_dicts, layouts)):
+            vectors[row, layout] = list(weights.values())
+        return vectors
+
+    def vector(self, weights):
+        return self.vectors(weights)[0]
+
+    def to_dict(self, vector, assets):
+        """Back to {asset: value} for the given assets, as plain floats"""
+        return dict(zip(assets, vector[self.layout(assets)].tolist()))
+
+
+# Example usage
+if __name__ == "__main__":
+    index = AssetIndex(['BTC', 'ETH', 'ADA', 'DOT', 'USDC'])
+    current, target = index.vectors({'BTC': 0.45, 'ETH': 0.35, 'USDC': 0.20}, {'BTC': 0.40, 'ETH': 0.40, 'ADA': 0.20})
+    print(f"Turnover: {np.abs(current - target).sum() / 2:.2%}")
+    print(index.to_dict(current - target, ['BTC', 'ETH', 'ADA', 'USDC']))
@@ -0,0 +1,139 @@
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EWMACovariance:
+    """Exponentially weighted covariance of per-bar log returns, updated once per bar.
+
+    One instance is shared by every bot and request: each closed bar costs a
+    single rank-one update, and optimizers read shrunk sub-matrices for the
+    assets they need. ``version`` increases on every update so callers can
+    key caches on it.
+    """
+
+    def __init__(self, tokens, halflife=30, shrinkage=0.2, bar_interval=86400, min_bars=20):
+        self.tokens = list(tokens)
+        self.index = {token: i for i, token in enumerate(self.tokens)}
+        self.decay = 0.5 ** (1 / halflife)  # Weight left on the old estimate after one bar
+        self.shrinkage = shrinkage  # Pull toward the zero-correlation target
+        self.bar_interval = bar_interval
+        self.min_bars = min_bars
+        self.version = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        n = len(self.tokens)
+        self.mean = np.zeros(n)
+        self.cov = np.zeros((n, n))
+        self.updates = 0
+        self._last_close = None
+        self._current_bar = None
+        self._pending = None  # Latest price in the still-forming bar
+
+    @property
+    def ready(self):
+        return self.updates >= self.min_bars
+
+    def covers(self, assets):
+        return self.ready and all(asset in self.index for asset in assets)
+
+    def _update_bar(self, closes):
+        """Fold one closed bar into the estimate"""
+        if self._last_close is not None:
+            returns = np.log(closes / self._last_close)
+            returns = np.where(np.isfinite(returns), returns, 0.0)  # Missing prices count as flat
+            alpha = 1 - self.decay
+            delta = returns - self.mean
+            mean = self.mean + alpha * delta
+            cov = self.decay * (self.cov + alpha * np.outer(delta, delta))
+            self.mean, self.cov = mean, cov
+            self.updates += 1
+            self.version += 1
+        self._last_close = closes
+
+    def seed(self, panel, bar_timestamps=None):
+        """Rebuild the estimate from a tokens x bars price panel (rows in self.tokens order).
+
+        The last bar is treated as still forming, so the next observe() in
+        a later bar closes it.
+        """
+        panel = np.asarray(panel, dtype=float)
+        with self._lock:
+            self._reset()
+            for t in range(panel.shape[1] - 1):
+                self._update_bar(panel[:, t])
+            self._pending = panel[:, -1].copy()
+            if bar_timestamps is not None:
+                self._current_bar = self._bar(bar_timestamps[-1])
+            self.version += 1
+
+    def seed_from_frames(self, frames):
+        """Seed from generate_signals-style {token: DataFrame with 'price'} on their common bars.
+
+        Frames tagged as fallback mock data (see SignalGenerator.is_fallback)
+        count as missing: seeding from them would mark the estimate ready on
+        random prices and it would never be rebuilt from real history. The
+        estimate stays un-ready instead, so the next refresh retries.
+        """
+        missing = [token for token in self.tokens
+                   if frames.get(token) is None or frames[token].empty or frames[token].attrs.get('fallback', False)]
+        if missing:
+            logger.warning("Covariance not seeded, no real history for %s", ', '.join(missing))
+            return False
+
+        length = min(len(frames[token]) for token in self.tokens)
+        panel = np.vstack([frames[token]['price'].to_numpy(dtype=float)[-length:] for token in self.tokens])
+        last_index = frames[self.tokens[0]].index[-1]
+        self.seed(panel, [last_index.timestamp() if hasattr(last_index, 'timestamp') else last_index])
+        logger.info("Covariance seeded from %d bars for %d tokens", length, len(self.tokens))
+        return True
+
+    def _bar(self, ts):
+        return int(ts // self.bar_interval)
+
+    def observe(self, prices, ts):
+        """Feed a price snapshot; the estimate only moves when a new bar starts"""
+        with self._lock:
+            bar = self._bar(ts)
+            pending = self._pending if self._pending is not None else np.full(len(self.tokens), np.nan)
+            closes = np.array([prices.get(token, pending[i]) for i, token in enumerate(self.tokens)], dtype=float)
+
+            if self._current_bar is not None and bar > self._current_bar and self._pending is not None:
+                self._update_bar(self._pending)
+            if self._current_bar is None or bar >= self._current_bar:
+                self._current_bar = bar
+                self._pending = closes
+
+    def matrix(self, assets):
+        """Shrunk covariance for the given assets, in that order"""
+        idx = [self.index[asset] for asset in assets]
+        with self._lock:
+            sample = self.cov[np.ix_(idx, idx)]
+        target = np.diag(np.diag(sample))
+        shrunk = (1 - self.shrinkage) * sample + self.shrinkage * target
+        # A tiny ridge keeps the matrix positive definite for flat (stablecoin) series
+        return shrunk + np.eye(len(idx)) * 1e-10
+
+    def volatility(self, assets):
+        idx = [self.index[asset] for asset in assets]
+        with self._lock:
+            return np.sqrt(np.diag(self.cov)[idx])
+
+
+# Example usage
+if __name__ == "__main__":
+    from services.synthetic_market import SyntheticMarket
+
+    tokens = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+    market = SyntheticMarket(seed=3, drift=0.0, volatility=[0.03, 0.04, 0.05, 0.05, 0.001], correlation=0.6)
+    panel = market.generate(len(tokens), 120, [45000, 3000, 1.2, 25.0, 1.0])
+
+    covariance = EWMACovariance(tokens)
+    covariance.seed(panel)
+    print(f"Daily vols: {dict(zip(tokens, np.round(covariance.volatility(tokens), 4).tolist()))}")
+    print(np.round(np.corrcoef(panel[:4, 1:] / panel[:4, :-1])[0], 2))
@@ -0,0 +1,133 @@
+import heapq
+import math
+from itertools import count
+
+
+def breach_move(weights, targets, threshold=0.05):
+    """Smallest log price move that could push any weight past target ± threshold.
+
+    A weight w moves furthest when its asset's price moves by a log return
+    of d and every other asset by -d: it becomes w e^(2d) / (w e^(2d) + 1 - w).
+    Solving that for the room left above and below the target gives the
+    move needed in each direction; the bot is safe until some price has
+    moved by at least the smallest of them. 0 means already outside the band.
+    """
+    move = math.inf
+    for asset, target in targets.items():
+        weight = weights.get(asset, 0)
+        drift = weight - target
+        if abs(drift) > threshold:
+            return 0.0
+        if weight <= 0 or weight >= 1:
+            continue  # An unheld or sole asset's weight can't move with prices
+
+        up = threshold - drift  # Room above before the band is crossed
+        if weight + up < 1:
+            ratio = (weight + up) * (1 - weight) / (weight * (1 - weight - up))
+            move = min(move, 0.5 * math.log(ratio))
+        down = threshold + drift  # Room below
+        if weight - down > 0:
+            ratio = weight * (1 - weight + down) / ((weight - down) * (1 - weight))
+            move = min(move, 0.5 * math.log(ratio))
+    return move
+
+
+class DriftScheduler:
+    """Priority queue of bots ordered by how far prices must move before they can leave their drift band.
+
+    The scheduler keeps a clock that advances on every price update by the
+    largest absolute log move of any asset. A bot checked at clock c with a
+    breach move m can't have crossed its band before the clock reaches
+    c + m, so each tick only pops the bots whose deadline has passed. Target
+    weights change with the epoch (signals and covariance version), so a new
+    epoch makes every bot due again.
+    """
+
+    def __init__(self, threshold=0.05):
+        self.threshold = threshold  # Same band as calculate_rebalance_need
+        self.clock = 0.0
+        self.epoch = None
+        self._last_prices = None
+        self._heap = []  # (deadline, sequence, key)
+        self._entries = {}  # key -> (sequence, payload) of each bot's live heap entry
+        self._sequence = count()
+        self.stats = {'scheduled': 0, 'due': 0, 'rebuilds': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def advance(self, prices, epoch):
+        """Move the clock to a new price snapshot; returns True when every bot must be re-checked"""
+        previous = self._last_prices
+        if epoch != self.epoch or previous is None or previous.keys() != prices.keys():
+            # New targets, or assets gained/lost a price (which changes every weight)
+            self.reset()
+            self.epoch = epoch
+            self._last_prices = dict(prices)
+            self.stats['rebuilds'] += 1
+            return True
+
+        self._last_prices = dict(prices)
+        moves = [abs(math.log(prices[asset] / price)) for asset, price in previous.items()
+                 if price > 0 and prices[asset] > 0]
+        self.clock += max(moves, default=0.0)
+        return False
+
+    def reset(self):
+        """Forget every bot and the price reference (e.g. after the accounts are reloaded)"""
+        self.clock = 0.0
+        self.epoch = None
+        self._last_prices = None
+        self._heap = []
+        self._entries = {}
+
+    def schedule(self, key, weights, targets, payload=None):
+        """(Re)queue a bot after checking it; weights and targets are fractions"""
+        move = breach_move(weights, targets, self.threshold)
+        if math.isinf(move):
+            self._entries.pop(key, None)  # Prices alone can never push it out of band
+            return move
+        sequence = next(self._sequence)
+        self._entries[key] = (sequence, payload)
+        heapq.heappush(self._heap, (self.clock + move, sequence, key))
+        self.stats['scheduled'] = len(self._entries)
+        return move
+
+    def mark_due(self, key, payload=None):
+        """Check a bot on the next tick (new, resumed or otherwise changed outside a tick)"""
+        sequence = next(self._sequence)
+        self._entries[key] = (sequence, payload)
+        heapq.heappush(self._heap, (-math.inf, sequence, key))
+
+    def forget(self, key):
+        self._entries.pop(key, None)
+
+    def pop_due(self):
+        """(key, payload) for every bot whose deadline the clock has reached"""
+        due = []
+        while self._heap and self._heap[0][0] <= self.clock:
+            _, sequence, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != sequence:
+                continue  # Superseded by a later schedule() or forgotten
+            del self._entries[key]
+            due.append((key, entry[1]))
+        self.stats['due'] = len(due)
+        self.stats['scheduled'] = len(self._entries)
+        return due
+
+
+# Example usage
+if __name__ == "__main__":
+    weights = {'BTC': 0.42, 'ETH': 0.28, 'USDC': 0.30}
+    targets = {'BTC': 0.40, 'ETH': 0.30, 'USDC': 0.30}
+    move = breach_move(weights, targets)
+    print(f"📏 Safe until some price moves {math.expm1(move):.2%}")
+
+    scheduler = DriftScheduler()
+    prices = {'BTC': 109400, 'ETH': 2675, 'USDC': 1.0}
+    scheduler.advance(prices, epoch=1)
+    scheduler.schedule('bot_a', weights, targets)
+    for btc in (110000, 112000, 118000):
+        scheduler.advance(dict(prices, BTC=btc), epoch=1)
+        print(f"BTC {btc}: due {[key for key, _ in scheduler.pop_due()]}")
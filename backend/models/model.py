@@ -6,11 +6,25 @@ import joblib
 import os
 
 class PredictionModel:
-    def __init__(self):
+    def __init__(self, price_store=None, tokens=None):
         self.model = None
         self.model_path = os.path.join(os.path.dirname(__file__), 'saved_model.pkl')
+        self.price_store = price_store  # Optional PriceHistoryStore used for training and inference data
+        self.tokens = tokens or ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
         self.load_or_train_model()
     
+    def load_price_data(self, days=60):
+        """Read price DataFrames for all tokens from the price history store"""
+        if self.price_store is None:
+            return {}
+        
+        price_data = {}
+        for token in self.tokens:
+            rows = self.price_store.get_history(token, days)
+            if len(rows):
+                price_data[token] = self.price_store.to_frame(rows).reset_index(drop=True)
+        return price_data
+    
     def prepare_features(self, price_data):
         """
         Prepare features from price data
@@ -57,19 +71,27 @@ class PredictionModel:
             print("Loading existing model...")
             self.model = joblib.load(self.model_path)
         else:
-            print("No model found. For a real implementation, train with historical data.")
-            # For hackathon purposes, we'll create a dummy model
             self.model = RandomForestClassifier(n_estimators=100, random_state=42)
             
-            # Generate dummy data
-            dummy_data = pd.DataFrame({
-                'price': np.random.normal(100, 10, 1000)
-            })
-            for i in range(1, 1000):
-                # Add some trend
-                dummy_data.loc[i, 'price'] = dummy_data.loc[i-1, 'price'] * (1 + np.random.normal(0, 0.02))
+            # Prefer real stored history; each token's features are built separately so windows don't span tokens
+            prepared = [self.prepare_features(df) for df in self.load_price_data(days=3650).values() if len(df) > 60]
+            if prepared:
+                print(f"Training model on stored price history for {len(prepared)} tokens...")
+                X = pd.concat([features for features, _ in prepared])
+                y = pd.concat([target for _, target in prepared])
+            else:
+                print("No model found. For a real implementation, train with historical data.")
+                # For hackathon purposes, we'll create a dummy model
+                # Generate dummy data
+                dummy_data = pd.DataFrame({
+                    'price': np.random.normal(100, 10, 1000)
+                })
+                for i in range(1, 1000):
+                    # Add some trend
+                    dummy_data.loc[i, 'price'] = dummy_data.loc[i-1, 'price'] * (1 + np.random.normal(0, 0.02))
+                
+                X, y = self.prepare_features(dummy_data)
             
-            X, y = self.prepare_features(dummy_data)
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
             
             self.model.fit(X_train, y_train)
@@ -85,13 +107,15 @@ class PredictionModel:
         
         return self.model.predict(features), self.model.predict_proba(features)
     
-    def enhance_signals(self, signals, price_data):
+    def enhance_signals(self, signals, price_data=None):
         """
         Use ML model to enhance trading signals
         - signals: dict from SignalGenerator
-        - price_data: dict mapping token to price DataFrame
+        - price_data: dict mapping token to price DataFrame (defaults to the price history store)
         """
         enhanced_signals = signals.copy()
+        if price_data is None:
+            price_data = self.load_price_data()
         
         for token, data in signals.items():
             if token in price_data:
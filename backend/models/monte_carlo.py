@@ -0,0 +1,208 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.rebalance_engine import RebalanceEngine, DRIFT_THRESHOLD
+from services.synthetic_market import SyntheticMarket
+
+STABLECOINS = ('USDC', 'USDT', 'DAI')
+DEFAULT_VOLATILITY = 0.04  # Per-bar volatility assumed for assets the covariance doesn't cover yet
+DEFAULT_CORRELATION = 0.5
+STABLECOIN_VOLATILITY = 0.001
+MAX_PATH_BARS = 2000000  # paths x bars cap, keeps one return array under ~100 MB for 5 assets
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def distribution(values, scale=100, digits=2):
+    """Summary of one statistic across paths (scaled, e.g. fractions to percent)"""
+    values = np.asarray(values, dtype=float) * scale
+    quantiles = np.percentile(values, PERCENTILES)
+    summary = {'mean': round(float(values.mean()), digits), 'std': round(float(values.std()), digits)}
+    summary.update({f"p{p}": round(float(q), digits) for p, q in zip(PERCENTILES, quantiles)})
+    return summary
+
+
+class MonteCarloEvaluator:
+    """Forward-looking strategy evaluation on simulated correlated price paths.
+
+    One draw of paths x assets x bars log returns is shared by every strategy
+    (common random numbers), so differences between strategies come from
+    their rules rather than from sampling noise. Each strategy's rule runs
+    along all paths at once, bar by bar: 'shannon' rebalances every bar,
+    the others rebalance when any weight leaves the drift band, and 'hold'
+    never trades. Strategies are simulated in parallel threads.
+    """
+
+    def __init__(self, rebalance_engine=None, covariance=None, n_paths=5000, horizon=30, fee_rate=0.001,
+                 threshold=DRIFT_THRESHOLD, periods_per_year=365, max_workers=None):
+        self.rebalance_engine = rebalance_engine or RebalanceEngine(covariance=covariance)
+        self.covariance = covariance if covariance is not None else self.rebalance_engine.covariance
+        self.n_paths = n_paths
+        self.horizon = horizon  # Bars simulated forward
+        self.fee_rate = fee_rate  # Charged on traded notional, as in BacktestEngine
+        self.threshold = threshold
+        self.periods_per_year = periods_per_year
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def market_parameters(self, assets, signals):
+        """Per-bar drift, volatility and correlation for the simulated market"""
+        if self.covariance is not None and self.covariance.covers(assets):
+            cov = self.covariance.matrix(assets)
+            volatility = np.sqrt(np.diag(cov))
+            correlation = cov / np.outer(volatility, volatility)
+        else:
+            volatility = np.array([STABLECOIN_VOLATILITY if asset in STABLECOINS else DEFAULT_VOLATILITY
+                                   for asset in assets])
+            correlation = SyntheticMarket.correlation_matrix(len(assets), DEFAULT_CORRELATION)
+            correlation[[i for i, asset in enumerate(assets) if asset in STABLECOINS], :] = 0.0
+            correlation[:, [i for i, asset in enumerate(assets) if asset in STABLECOINS]] = 0.0
+            np.fill_diagonal(correlation, 1.0)
+
+        # Signal-implied expected returns, as the mean-variance optimizer uses them
+        scores = np.array([signals.get(asset, {}).get('total_score', 0) for asset in assets], dtype=float)
+        drift = self.rebalance_engine.signal_ic * volatility * scores
+        return drift, volatility, correlation
+
+    def simulate(self, growth, current, target, every_bar=False):
+        """Run one rebalancing rule along every path.
+
+        growth holds per-bar gross returns (bars x assets x paths), current
+        and target are fractional weight vectors (target None = never trade).
+        Paths run along the last axis so every per-bar sum is a handful of
+        row additions rather than many short reductions.
+        Returns the equity curves (bars+1 x paths, starting at 1), the
+        turnover per path and the number of rebalances per path.
+        """
+        n_bars, n_assets, n_paths = growth.shape
+        weights = np.repeat(current[:, None], n_paths, axis=1)
+        if target is not None:
+            target = target[:, None]
+        equity = np.ones((n_bars + 1, n_paths))
+        turnover = np.zeros(n_paths)
+        rebalances = np.zeros(n_paths, dtype=int)
+
+        for t in range(n_bars + 1):
+            if t > 0:
+                gross = weights * growth[t - 1]
+                bar_return = gross.sum(axis=0)
+                weights = gross / bar_return
+                equity[t] = equity[t - 1] * bar_return
+            if target is None:
+                continue
+
+            drift = np.abs(weights - target)
+            trade = np.ones(n_paths, dtype=bool) if every_bar else drift.max(axis=0) > self.threshold
+            traded = np.where(trade, drift.sum(axis=0), 0.0)
+            equity[t] *= 1 - traded * self.fee_rate
+            turnover += traded
+            rebalances += trade & (traded > 0)
+            weights = np.where(trade, target, weights)
+        return equity, turnover, rebalances
+
+    def summarize(self, equity, turnover, rebalances):
+        returns = equity[1:] / equity[:-1] - 1
+        std = returns.std(axis=0, ddof=1)
+        annualizer = np.sqrt(self.periods_per_year)
+        sharpe = np.divide(returns.mean(axis=0), std, out=np.zeros_like(std), where=std > 0) * annualizer
+        drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+        total_return = equity[-1] - 1
+
+        worst = np.sort(total_return)[:max(1, len(total_return) // 20)]
+        return {
+            'total_return': distribution(total_return),
+            'annual_volatility': distribution(std * annualizer),
+            'max_drawdown': distribution(-drawdown.min(axis=0)),
+            'turnover': distribution(turnover, scale=1, digits=3),
+            'sharpe_ratio': distribution(sharpe, scale=1, digits=3),
+            'probability_of_loss': round(float((total_return < 0).mean()) * 100, 2),
+            'expected_shortfall_5': round(float(-worst.mean()) * 100, 2),  # Mean loss in the worst 5% of paths
+            'rebalances': round(float(rebalances.mean()), 2)
+        }
+
+    def evaluate(self, current_weights, signals, prices, risk_profile=50, strategies=None, n_paths=None,
+                 horizon=None, seed=None, signals_version=None):
+        """Simulated outcome distributions for each strategy and for holding the current weights.
+
+        Weights are fractions; returns, volatility and drawdown are reported
+        in percent over the horizon. Each strategy also gets its impact
+        relative to 'hold', the simulated counterpart of the
+        risk/return/Sharpe impacts in calculate_rebalance_metrics.
+        """
+        start = time.perf_counter()
+        assets = list(current_weights)
+        strategies = strategies or list(self.rebalance_engine.strategies.keys())
+        n_paths = self.n_paths if n_paths is None else n_paths
+        horizon = self.horizon if horizon is None else horizon
+        if not assets:
+            raise ValueError("No current weights to simulate")
+        if n_paths < 1 or horizon < 2:
+            raise ValueError("Need at least one path and two bars")
+        if n_paths * horizon > MAX_PATH_BARS:
+            raise ValueError(f"paths x horizon must be at most {MAX_PATH_BARS}, got {n_paths * horizon}")
+
+        current = np.array([current_weights[asset] for asset in assets], dtype=float)
+        current = current / current.sum() if current.sum() > 0 else np.full(len(assets), 1 / len(assets))
+
+        targets = {}
+        for strategy in strategies:
+            target_pct = self.rebalance_engine.get_strategy_targets(strategy, assets, signals, prices, risk_profile,
+                                                                    signals_version)
+            target = np.array([target_pct.get(asset, 0) / 100 for asset in assets])
+            targets[strategy] = target / target.sum() if target.sum() > 0 else np.full(len(assets), 1 / len(assets))
+
+        drift, volatility, correlation = self.market_parameters(assets, signals)
+        market = SyntheticMarket(seed=seed)
+        log_returns = market.log_returns(len(assets), horizon, n_paths, drift=drift, volatility=volatility,
+                                         correlation=correlation)
+        growth = np.exp(np.ascontiguousarray(log_returns.transpose(2, 1, 0)))  # bars x assets x paths
+
+        def run(strategy):
+            target = targets.get(strategy)
+            return self.summarize(*self.simulate(growth, current, target, every_bar=strategy == 'shannon'))
+
+        names = ['hold'] + list(strategies)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as executor:
+            summaries = dict(zip(names, executor.map(run, names)))
+
+        hold = summaries.pop('hold')
+        results = {}
+        for strategy, summary in summaries.items():
+            summary['target_weights'] = dict(zip(assets, np.round(targets[strategy] * 100, 1).tolist()))
+            summary['impact'] = {
+                key: round(summary[key]['mean'] - hold[key]['mean'], 3)
+                for key in ('total_return', 'annual_volatility', 'max_drawdown', 'sharpe_ratio')
+            }
+            results[strategy] = summary
+
+        return {
+            'strategies': results,
+            'hold': hold,
+            'best_strategy': max(results, key=lambda s: results[s]['sharpe_ratio']['mean']) if results else None,
+            'paths': n_paths,
+            'horizon': horizon,
+            'assets': assets,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    weights = {'BTC': 0.32, 'ETH': 0.28, 'ADA': 0.18, 'DOT': 0.12, 'USDC': 0.10}
+    signals = {
+        'BTC': {'total_score': 0.4, 'momentum': 0.6, 'mean_reversion': -0.2, 'volatility': 0.3},
+        'ETH': {'total_score': 0.1, 'momentum': 0.2, 'mean_reversion': 0.1, 'volatility': 0.4},
+        'ADA': {'total_score': -0.3, 'momentum': -0.5, 'mean_reversion': 0.4, 'volatility': 0.6},
+        'DOT': {'total_score': 0.0, 'momentum': 0.1, 'mean_reversion': 0.0, 'volatility': 0.5},
+        'USDC': {'total_score': 0.0, 'momentum': 0.0, 'mean_reversion': 0.0, 'volatility': 0.0}
+    }
+    prices = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+
+    result = MonteCarloEvaluator().evaluate(weights, signals, prices, seed=7)
+    print(f"🎲 {result['paths']} paths x {result['horizon']} bars in {result['elapsed_ms']} ms")
+    for strategy, summary in result['strategies'].items():
+        print(f"{strategy:12s} return {summary['total_return']['p50']:6.2f}% "
+              f"vol {summary['annual_volatility']['mean']:6.2f}% "
+              f"drawdown {summary['max_drawdown']['mean']:5.2f}% turnover {summary['turnover']['mean']:.3f}")
+    print(f"🏆 Best risk-adjusted: {result['best_strategy']}")
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from models.rebalance_planner import fee_rate
+
+
+class OrderNettingBook:
+    """Crosses one tick's planned trades across bots before anything is executed.
+
+    Bots add their plans (generate_rebalance_plan format). settle() matches
+    opposing buys and sells of each asset internally at the plan price and
+    sends only the net residual to execution, as one order per asset. Every
+    bot's trade is still filled in full; the residual order's fee and
+    slippage are split pro rata between the trades on its side, and the
+    crossed volume pays ``internal_fee_rate`` (free by default).
+
+    ``cost_saved`` compares against sending every order to the market in
+    the same tick, where each side's orders walk the same book.
+    """
+
+    def __init__(self, planner, internal_fee_rate=0.0, trailing_volume=0):
+        self.planner = planner  # Cost model for the residual orders
+        self.internal_fee_rate = internal_fee_rate
+        self.trailing_volume = trailing_volume
+        self.orders = []  # (owner, trade)
+
+    def add(self, owner, trade_plan):
+        for trade in trade_plan:
+            self.orders.append((owner, trade))
+
+    def _execute(self, asset, value):
+        """Simulated market fill of a residual order: (fee, slippage)"""
+        return value * fee_rate(self.planner.fee_tiers, self.trailing_volume), self.planner.slippage.cost(asset, value)
+
+    def settle(self):
+        """Net the book and return ({owner: filled trade plan}, stats)"""
+        by_asset = defaultdict(lambda: {'BUY': [], 'SELL': []})
+        for index, (owner, trade) in enumerate(self.orders):
+            by_asset[trade['asset']][trade['action']].append(index)
+
+        fills = [None] * len(self.orders)
+        stats = {
+            'bots': len({owner for owner, _ in self.orders}),
+            'orders': len(self.orders),
+            'execution_orders': 0,
+            'gross_value': 0.0,
+            'crossed_value': 0.0,
+            'executed_value': 0.0,
+            'unnetted_cost': 0.0,
+            'cost': 0.0
+        }
+
+        for asset, sides in by_asset.items():
+            totals = {side: sum(self.orders[i][1]['value'] for i in indices) for side, indices in sides.items()}
+            crossed = min(totals['BUY'], totals['SELL'])
+            residual_side = 'BUY' if totals['BUY'] > totals['SELL'] else 'SELL'
+            residual = totals[residual_side] - crossed
+
+            fee = slippage = 0.0
+            if residual > 0:
+                fee, slippage = self._execute(asset, residual)
+                stats['execution_orders'] += 1
+
+            for side, indices in sides.items():
+                for i in indices:
+                    trade = self.orders[i][1]
+                    share = trade['value'] / totals[side] if totals[side] > 0 else 0.0
+                    # Both sides cross the same amount; only the residual side reaches the market
+                    crossed_value = share * crossed
+                    filled = dict(trade)
+                    filled['crossed_value'] = round(crossed_value, 2)
+                    filled['fee'] = round(crossed_value * self.internal_fee_rate + (share * fee if side == residual_side else 0), 2)
+                    filled['slippage'] = round(share * slippage if side == residual_side else 0.0, 2)
+                    fills[i] = filled
+                    stats['cost'] += filled['fee'] + filled['slippage']
+
+            # Without netting both sides would walk the same book this tick
+            for side in ('BUY', 'SELL'):
+                if totals[side] > 0:
+                    stats['unnetted_cost'] += sum(self._execute(asset, totals[side]))
+            stats['gross_value'] += totals['BUY'] + totals['SELL']
+            stats['crossed_value'] += 2 * crossed
+            stats['executed_value'] += residual
+
+        plans = defaultdict(list)
+        for (owner, _), filled in zip(self.orders, fills):
+            plans[owner].append(filled)
+
+        stats['cost_saved'] = stats['unnetted_cost'] - stats['cost']
+        stats['orders_avoided'] = stats['orders'] - stats['execution_orders']
+        for key in ('gross_value', 'crossed_value', 'executed_value', 'unnetted_cost', 'cost', 'cost_saved'):
+            stats[key] = round(stats[key], 2)
+        return dict(plans), stats
+
+
+# Example usage
+if __name__ == "__main__":
+    from models.rebalance_planner import RebalancePlanner
+
+    planner = RebalancePlanner()
+    prices = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+    book = OrderNettingBook(planner)
+    book.add('bot_a', planner.plan({'BTC': 0.6, 'ETH': 0.4}, {'BTC': 50.0, 'ETH': 50.0}, prices, total_value=20000))
+    book.add('bot_b', planner.plan({'BTC': 0.3, 'ETH': 0.7}, {'BTC': 50.0, 'ETH': 50.0}, prices, total_value=15000))
+
+    plans, stats = book.settle()
+    for owner, plan in plans.items():
+        print(owner, [(t['action'], t['asset'], t['value'], t['crossed_value'], t['fee']) for t in plan])
+    print(f"🔁 Crossed ${stats['crossed_value']:,.2f} of ${stats['gross_value']:,.2f}, "
+          f"{stats['execution_orders']}/{stats['orders']} orders sent, saved ${stats['cost_saved']:.2f}")
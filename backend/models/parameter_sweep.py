@@ -0,0 +1,157 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from models.backtest_engine import BacktestEngine
+from signals.indicators import DEFAULT_WINDOWS, DEFAULT_SCORE_WEIGHTS
+from signals.panel import RollingStats, compute_signal_history
+
+# Per-worker state: the shared panel view and its rolling-intermediate cache
+_worker = {}
+
+
+def _attach_panel(shm_name, shape, tokens, backtest_options):
+    """Process pool initializer: map the shared read-only price panel once per worker"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    panel = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    panel.flags.writeable = False
+    _worker.update({
+        'shm': shm,  # Keep the mapping alive for the worker's lifetime
+        'tokens': tokens,
+        'stats': RollingStats(panel),
+        'backtester': BacktestEngine(**backtest_options)
+    })
+
+
+def _evaluate_points(points):
+    """Backtest a batch of grid points that share the worker's rolling-intermediate cache"""
+    stats = _worker['stats']
+    backtester = _worker['backtester']
+    tokens = _worker['tokens']
+
+    rows = []
+    for point in points:
+        windows, weights = point['windows'], point['weights']
+        history = compute_signal_history(stats.panel, windows, weights, stats)
+        result = backtester.run(tokens, stats.panel, point['strategy'], point['risk_profile'],
+                                signal_history=history, windows=windows)
+        rows.append({
+            **{f"{key}_window": value for key, value in windows.items()},
+            **{f"{key}_weight": value for key, value in weights.items()},
+            'risk_profile': point['risk_profile'],
+            'strategy': point['strategy'],
+            **{key: value for key, value in result.items() if not key.endswith('_curve') and key != 'strategy'}
+        })
+    return rows
+
+
+class ParameterSweep:
+    """Grid search over indicator windows, score weights and risk profiles.
+
+    The price panel is placed in shared memory once and mapped read-only by
+    every worker of a ProcessPoolExecutor. Grid points are batched by
+    window combination so each worker computes a window's rolling
+    statistics once and reuses them for every weight vector and risk
+    profile that shares it.
+    """
+
+    def __init__(self, tokens, panel, max_workers=None, **backtest_options):
+        self.tokens = list(tokens)
+        self.panel = np.ascontiguousarray(panel, dtype=np.float64)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.backtest_options = backtest_options  # Forwarded to BacktestEngine in each worker
+
+    @staticmethod
+    def build_grid(window_grid=None, weight_vectors=None, risk_profiles=None, strategies=None):
+        """Cartesian product of the parameter lists (unspecified dimensions use today's defaults)"""
+        window_grid = window_grid or {}
+        keys = list(DEFAULT_WINDOWS.keys())
+        window_values = [window_grid.get(key, [DEFAULT_WINDOWS[key]]) for key in keys]
+        weight_vectors = weight_vectors or [DEFAULT_SCORE_WEIGHTS]
+        risk_profiles = risk_profiles or [50]
+        strategies = strategies or ['tactical']
+
+        grid = []
+        for combo in itertools.product(*window_values):
+            windows = dict(zip(keys, combo))
+            for weights, risk_profile, strategy in itertools.product(weight_vectors, risk_profiles, strategies):
+                grid.append({'windows': windows, 'weights': dict(weights),
+                             'risk_profile': risk_profile, 'strategy': strategy})
+        return grid
+
+    def _batches(self, grid):
+        """Group points by window combination, splitting big groups so every worker stays busy"""
+        groups = {}
+        for point in grid:
+            groups.setdefault(tuple(sorted(point['windows'].items())), []).append(point)
+
+        batch_size = max(1, len(grid) // (self.max_workers * 4))
+        batches = []
+        for points in groups.values():
+            for i in range(0, len(points), batch_size):
+                batches.append(points[i:i + batch_size])
+        return batches
+
+    def run(self, grid, rank_by='sharpe_ratio', ascending=False):
+        """Evaluate every grid point and return a ranked results table"""
+        batches = self._batches(grid)
+
+        if self.max_workers == 1:
+            _attach_panel_local(self.panel, self.tokens, self.backtest_options)
+            rows = [row for batch in batches for row in _evaluate_points(batch)]
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=self.panel.nbytes)
+            try:
+                np.ndarray(self.panel.shape, dtype=np.float64, buffer=shm.buf)[:] = self.panel
+                with ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_attach_panel,
+                    initargs=(shm.name, self.panel.shape, self.tokens, self.backtest_options)
+                ) as executor:
+                    rows = [row for batch_rows in executor.map(_evaluate_points, batches) for row in batch_rows]
+            finally:
+                shm.close()
+                shm.unlink()
+
+        table = pd.DataFrame(rows).sort_values(rank_by, ascending=ascending, kind='mergesort').reset_index(drop=True)
+        table.insert(0, 'rank', table.index + 1)
+        return table
+
+
+def _attach_panel_local(panel, tokens, backtest_options):
+    """In-process equivalent of _attach_panel for single-worker runs"""
+    _worker.update({
+        'tokens': tokens,
+        'stats': RollingStats(panel),
+        'backtester': BacktestEngine(**backtest_options)
+    })
+
+
+# Example usage
+if __name__ == "__main__":
+    from services.synthetic_market import SyntheticMarket
+
+    tokens = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+    market = SyntheticMarket(seed=7, drift=[0.001, 0.001, 0.001, 0.001, 0.0],
+                             volatility=[0.04, 0.05, 0.06, 0.06, 0.001], correlation=0.5)
+    panel = market.generate(len(tokens), 400, [45000, 3000, 1.2, 25.0, 1.0])
+
+    grid = ParameterSweep.build_grid(
+        window_grid={'mean_reversion': [7, 14, 21], 'momentum': [7, 14], 'breakout': [20, 30]},
+        weight_vectors=[
+            DEFAULT_SCORE_WEIGHTS,
+            {'mean_reversion': 0.4, 'momentum': 0.4, 'volatility': 0.1, 'breakout': 0.1},
+            {'mean_reversion': 0.2, 'momentum': 0.2, 'volatility': 0.3, 'breakout': 0.3}
+        ],
+        risk_profiles=[25, 50, 75]
+    )
+
+    start = time.perf_counter()
+    table = ParameterSweep(tokens, panel).run(grid)
+    print(f"Evaluated {len(grid)} grid points in {time.perf_counter() - start:.1f}s")
+    print(table.head(10).to_string(index=False))
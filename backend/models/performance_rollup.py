@@ -0,0 +1,132 @@
+import time
+
+DAY = 86400
+WEEK = 7 * DAY
+WEEK_OFFSET = 4 * DAY  # The epoch was a Thursday; weeks start on Monday 00:00 UTC
+
+# Fields a rolled-up record computes itself rather than copying from its last record
+ROLLUP_FIELDS = ('open', 'high', 'low', 'close', 'count', 'events', 'event', 'resolution', 'period_start')
+
+
+def value_key(record):
+    """The field a history charts: 'value' for bots, 'total_value' for accounts"""
+    if 'value' in record:
+        return 'value'
+    if 'total_value' in record:
+        return 'total_value'
+    return None
+
+
+def merge_records(records, resolution, period_start):
+    """One OHLC record summarizing consecutive history records (raw or already rolled up)"""
+    first, last = records[0], records[-1]
+    merged = {key: value for key, value in last.items() if key not in ROLLUP_FIELDS}
+    key = value_key(last)
+    if key is not None:
+        values = [r for r in records if key in r]
+        merged['open'] = first.get('open', first.get(key))
+        merged['high'] = max(r.get('high', r[key]) for r in values)
+        merged['low'] = min(r.get('low', r[key]) for r in values)
+        merged['close'] = last.get('close', last[key])
+    merged['count'] = sum(r.get('count', 1) for r in records)
+    events = [event for r in records for event in r.get('events', [r['event']] if 'event' in r else [])]
+    if events:
+        merged['events'] = events
+    merged['resolution'] = resolution
+    merged['period_start'] = period_start
+    return merged
+
+
+class PerformanceRollup:
+    """Retention policy for performance_history lists: raw records, then daily, then weekly OHLC.
+
+    A history stays one time-ordered list: weekly records, then daily
+    records, then the raw records of the last ``raw_days`` days. Rolled-up
+    records keep the fields of the last record they cover (so charts keep
+    working) plus open/high/low/close of the charted value, the number of
+    raw records (count), any event markers and their resolution.
+
+    ``maintain`` is called after each append. Nothing can age out until the
+    newest record starts a new UTC day, so appends within a day cost one
+    comparison; at a day boundary only the days and weeks that just aged
+    out are merged. It returns the changes as (start, stop, records)
+    splices so they can be persisted as small ops.
+    """
+
+    def __init__(self, raw_days=7, daily_days=84):
+        self.raw_window = raw_days * DAY
+        self.daily_window = daily_days * DAY
+
+    @staticmethod
+    def day_start(timestamp):
+        return timestamp - timestamp % DAY
+
+    @staticmethod
+    def week_start(timestamp):
+        return timestamp - (timestamp - WEEK_OFFSET) % WEEK
+
+    def maintain(self, history, now=None):
+        """Roll up what has aged out, in place; returns the splices applied.
+
+        ``now`` defaults to the newest record's timestamp, in which case the
+        history is only examined when that record opened a new day.
+        """
+        if not history:
+            return []
+        if now is None:
+            now = history[-1]['timestamp']
+            if len(history) > 1 and self.day_start(history[-2]['timestamp']) == self.day_start(now):
+                return []
+
+        splices = []
+        raw_cutoff = now - self.raw_window
+        daily_cutoff = now - self.daily_window
+
+        # Daily records whose week has fully aged out become one weekly record
+        start = next((i for i, r in enumerate(history) if r.get('resolution') != 'weekly'), len(history))
+        while start < len(history) and history[start].get('resolution') == 'daily':
+            week = self.week_start(history[start]['timestamp'])
+            if week + WEEK > daily_cutoff:
+                break
+            stop = start
+            while (stop < len(history) and history[stop].get('resolution') == 'daily'
+                   and self.week_start(history[stop]['timestamp']) == week):
+                stop += 1
+            splices.append(self._splice(history, start, stop, 'weekly', week))
+            start += 1
+
+        # Raw records whose day has fully aged out become one daily record
+        while start < len(history) and history[start].get('resolution') == 'daily':
+            start += 1
+        while start < len(history) and 'resolution' not in history[start]:
+            day = self.day_start(history[start]['timestamp'])
+            if day + DAY > raw_cutoff:
+                break
+            stop = start
+            while (stop < len(history) and 'resolution' not in history[stop]
+                   and self.day_start(history[stop]['timestamp']) == day):
+                stop += 1
+            splices.append(self._splice(history, start, stop, 'daily', day))
+            start += 1
+        return splices
+
+    @staticmethod
+    def _splice(history, start, stop, resolution, period_start):
+        merged = [merge_records(history[start:stop], resolution, period_start)]
+        history[start:stop] = merged
+        return start, stop, merged
+
+
+# Example usage
+if __name__ == "__main__":
+    rollup = PerformanceRollup()
+    now = time.time()
+    history = []
+    for hour in range(365 * 24, -1, -1):
+        history.append({'timestamp': now - hour * 3600, 'value': 10000 + hour % 500, 'pnl': 0, 'pnl_percent': 0})
+        rollup.maintain(history)
+    resolutions = {}
+    for record in history:
+        resolution = record.get('resolution', 'raw')
+        resolutions[resolution] = resolutions.get(resolution, 0) + 1
+    print(f"📉 A year of hourly records rolled up to {len(history)}: {resolutions}")
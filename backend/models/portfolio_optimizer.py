@@ -0,0 +1,180 @@
+import numpy as np
+
+MIN_WEIGHT = 0.05  # Box constraints the rebalance engine already enforces (5-40%)
+MAX_WEIGHT = 0.40
+
+
+def box_bounds(n, lower=MIN_WEIGHT, upper=MAX_WEIGHT):
+    """Drop whichever bound a fully invested portfolio of n assets can't satisfy"""
+    return (lower if n * lower <= 1 else 0.0), (upper if n * upper >= 1 else 1.0)
+
+
+def project_to_box_simplex(y, lower, upper):
+    """Euclidean projection of y onto {w : sum(w) = 1, lower <= w <= upper}.
+
+    The projection is clip(y - shift, lower, upper) for the shift that makes
+    the weights sum to 1. That sum is piecewise linear and decreasing in the
+    shift, so the exact shift is interpolated between its sorted breakpoints.
+    """
+    breakpoints = np.sort(np.concatenate([y - upper, y - lower]))
+    totals = np.clip(y[None, :] - breakpoints[:, None], lower, upper).sum(axis=1)
+    k = min(np.searchsorted(-totals, -1.0), len(totals) - 1)  # First breakpoint with total <= 1
+    if k == 0 or totals[k] == totals[k - 1]:
+        shift = breakpoints[k]
+    else:
+        # Linear between breakpoints k-1 and k
+        fraction = (totals[k - 1] - 1) / (totals[k - 1] - totals[k])
+        shift = breakpoints[k - 1] + fraction * (breakpoints[k] - breakpoints[k - 1])
+    return np.clip(y - shift, lower, upper)
+
+
+def rescale_into_box(weights, lower, upper):
+    """Scale weights by the factor that makes clip(scale * w, lower, upper) sum to 1.
+
+    Unlike the Euclidean projection this keeps the ratios between the
+    weights that end up inside the box. The clipped sum is piecewise linear
+    and increasing in the scale, so the factor is interpolated exactly
+    between its sorted breakpoints.
+    """
+    weights = np.maximum(np.asarray(weights, dtype=float), 0)
+    positive = weights[weights > 0]
+    if not len(positive):
+        return np.full(len(weights), 1 / len(weights))
+
+    breakpoints = np.sort(np.concatenate([[0.0], lower / positive, upper / positive]))
+    totals = np.clip(breakpoints[:, None] * weights[None, :], lower, upper).sum(axis=1)
+    k = min(np.searchsorted(totals, 1.0), len(totals) - 1)  # First breakpoint with total >= 1
+    if k == 0 or totals[k] == totals[k - 1]:
+        scale = breakpoints[k]
+    else:
+        fraction = (1 - totals[k - 1]) / (totals[k] - totals[k - 1])
+        scale = breakpoints[k - 1] + fraction * (breakpoints[k] - breakpoints[k - 1])
+    return np.clip(scale * weights, lower, upper)
+
+
+def _largest_eigenvalue(cov):
+    """Lipschitz constant of the variance gradient"""
+    return max(np.linalg.eigvalsh(cov)[-1], 1e-12)
+
+
+def mean_variance(mu, cov, risk_aversion, lower=MIN_WEIGHT, upper=MAX_WEIGHT, start=None, max_iter=500, tol=1e-8,
+                  lipschitz=None):
+    """Box-constrained argmax of mu'w - (risk_aversion / 2) w'Σw via accelerated projected gradient"""
+    n = cov.shape[0]
+    lower, upper = box_bounds(n, lower, upper)
+    step = 1 / ((lipschitz or _largest_eigenvalue(cov)) * risk_aversion)
+    weights = project_to_box_simplex(np.full(n, 1 / n) if start is None else start, lower, upper)
+    momentum_point, t = weights, 1.0
+    for _ in range(max_iter):
+        gradient = risk_aversion * (cov @ momentum_point) - mu
+        updated = project_to_box_simplex(momentum_point - step * gradient, lower, upper)
+        if np.abs(updated - weights).max() < tol:
+            return updated
+        if (momentum_point - updated) @ (updated - weights) > 0:
+            t = 1.0  # Adaptive restart: momentum is pointing uphill
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        momentum_point = updated + (t - 1) / t_next * (updated - weights)
+        weights, t = updated, t_next
+    return weights
+
+
+def min_variance(cov, lower=MIN_WEIGHT, upper=MAX_WEIGHT):
+    """Box-constrained minimum-variance weights"""
+    return mean_variance(np.zeros(cov.shape[0]), cov, 1.0, lower, upper)
+
+
+def sharpe_ratio(weights, mu, cov):
+    variance = weights @ cov @ weights
+    return (mu @ weights) / np.sqrt(variance) if variance > 0 else 0.0
+
+
+def max_sharpe(mu, cov, lower=MIN_WEIGHT, upper=MAX_WEIGHT, start=None, max_iter=50, tol=1e-8):
+    """Box-constrained maximum-Sharpe weights.
+
+    At the optimum w*, w* also maximizes mu'w - (g/2) w'Σw with
+    g = mu'w* / w*'Σw*, so we alternate between updating g and re-solving
+    that (convex) problem from the previous weights until they stop moving.
+    Each step never lowers the Sharpe ratio. When no feasible portfolio has
+    a positive expected return the minimum-variance portfolio is returned.
+    """
+    n = cov.shape[0]
+    lower, upper = box_bounds(n, lower, upper)
+    weights = start if start is not None else min_variance(cov, lower, upper)
+
+    # Start from the higher-return end of the box if min-variance has no positive return
+    if mu @ weights <= 0:
+        greedy = project_to_box_simplex(mu / (np.abs(mu).max() or 1) * 10, lower, upper)
+        if mu @ greedy <= 0:
+            return weights
+        weights = greedy
+
+    lipschitz = _largest_eigenvalue(cov)
+    for _ in range(max_iter):
+        risk_aversion = (mu @ weights) / (weights @ cov @ weights)
+        updated = mean_variance(mu, cov, risk_aversion, lower, upper, start=weights, lipschitz=lipschitz)
+        if np.abs(updated - weights).max() < tol:
+            return updated
+        weights = updated
+    return weights
+
+
+def optimize(mu, cov, risk_factor, lower=MIN_WEIGHT, upper=MAX_WEIGHT):
+    """Blend min-variance (risk_factor 0) and max-Sharpe (risk_factor 1) portfolios.
+
+    Both ends satisfy the box constraints, so every blend does too.
+    """
+    low_risk = min_variance(cov, lower, upper)
+    if risk_factor <= 0:
+        return low_risk
+    high_risk = max_sharpe(mu, cov, lower, upper, start=low_risk)
+    return (1 - risk_factor) * low_risk + risk_factor * high_risk
+
+
+def risk_contributions(weights, cov):
+    """Each asset's share of portfolio variance"""
+    marginal = cov @ weights
+    return weights * marginal / (weights @ marginal)
+
+
+def equal_risk_contribution_batch(covs, starts=None, max_sweeps=500, tol=1e-8, return_sweeps=False):
+    """Equal-risk-contribution weights for a stack of same-size covariance matrices.
+
+    Cyclical coordinate descent on min ½ y'Σy - (1/n) Σ ln y_i, whose
+    solution normalized to sum 1 has equal risk contributions. Each
+    coordinate update has a closed form and is applied to the whole stack
+    at once. starts (e.g. the previous tick's weights) warm-start the
+    descent, so re-solving after a small covariance change takes a few
+    sweeps.
+    """
+    covs = np.asarray(covs, dtype=float)
+    batch, n, _ = covs.shape
+    budget = 1 / n
+    diagonal = np.diagonal(covs, axis1=1, axis2=2)
+
+    y = np.full((batch, n), 1 / n) if starts is None else np.array(starts, dtype=float)
+    # The optimum satisfies y'Σy = sum of budgets = 1, so rescale the start onto that surface
+    y /= np.sqrt(np.einsum('bi,bij,bj->b', y, covs, y))[:, None]
+
+    sweeps = 0
+    for sweeps in range(1, max_sweeps + 1):
+        for i in range(n):
+            c = np.einsum('bj,bj->b', covs[:, i, :], y) - diagonal[:, i] * y[:, i]
+            root = np.sqrt(c * c + 4 * diagonal[:, i] * budget)
+            # Positive root of d y² + c y - budget. For c > 0 the textbook form cancels and then
+            # divides by d, which is ~0 for a flat (stablecoin) series, so use the equivalent 2b / (c + root)
+            y[:, i] = np.where(c > 0, 2 * budget / (c + root), (root - c) / (2 * diagonal[:, i]))
+
+        contributions = y * np.einsum('bij,bj->bi', covs, y)
+        if np.abs(contributions * n / contributions.sum(axis=1, keepdims=True) - 1).max() < tol:
+            break
+
+    weights = y / y.sum(axis=1, keepdims=True)
+    return (weights, sweeps) if return_sweeps else weights
+
+
+def equal_risk_contribution(cov, start=None, max_sweeps=500, tol=1e-8, return_sweeps=False):
+    """Equal-risk-contribution weights for one covariance matrix (see equal_risk_contribution_batch)"""
+    result = equal_risk_contribution_batch(np.asarray(cov)[None], None if start is None else np.asarray(start)[None],
+                                           max_sweeps, tol, return_sweeps=True)
+    weights, sweeps = result[0][0], result[1]
+    return (weights, sweeps) if return_sweeps else weights
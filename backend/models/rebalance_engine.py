@@ -1,13 +1,30 @@
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import threading
 import time
 
+from models.asset_index import AssetIndex
+from models.portfolio_optimizer import (
+    MIN_WEIGHT, MAX_WEIGHT, box_bounds, rescale_into_box, optimize,
+    equal_risk_contribution, equal_risk_contribution_batch
+)
+from models.rebalance_planner import RebalancePlanner
+
+DRIFT_THRESHOLD = 0.05  # Absolute weight drift that triggers a rebalance
+TRANSACTION_COST_RATE = 0.001  # Cost estimate per unit of traded value
+SCORE_MARGIN = 0.2  # Unrounded scores are within 0.075 of the rounded ones, so this never drops the winner
+
 class RebalanceEngine:
     """Advanced Portfolio Rebalancing Engine with multiple strategies"""
     
-    def __init__(self, risk_manager=None):
+    def __init__(self, risk_manager=None, covariance=None, planner=None, asset_index=None):
         self.risk_manager = risk_manager
+        self.asset_index = asset_index or AssetIndex()  # Column layout shared by all internal weight arrays
+        self.planner = planner or RebalancePlanner()  # Fee/slippage-aware trade planning back into drift bands
+        self.covariance = covariance  # Shared EWMACovariance; 'mpt' falls back to signal ranking without it
+        self.signal_ic = 0.1  # Information coefficient turning signal scores into expected returns
         self.strategies = {
             'shannon': {
                 'name': "Shannon's Demon",
@@ -34,8 +51,16 @@ class RebalanceEngine:
                 'description': 'Dynamic allocation based on market signals'
             }
         }
+        # LRU memo of target weights keyed by (strategy, assets, signals version, risk_profile)
+        self.target_cache = OrderedDict()
+        self.target_cache_size = 4096
+        self._target_cache_lock = threading.Lock()
+        self._target_cache_hits = 0
+        self._target_cache_misses = 0
+        # Latest equal-risk-contribution solution per asset tuple: (covariance version, weights)
+        self.erc_solutions = OrderedDict()
     
-    def calculate_rebalance_need(self, current_weights, target_weights, threshold=0.05):
+    def calculate_rebalance_need(self, current_weights, target_weights, threshold=DRIFT_THRESHOLD):
         """Calculate whether portfolio needs rebalancing based on threshold"""
         if not current_weights or not target_weights:
             return False, 0, {}
@@ -53,43 +78,17 @@ class RebalanceEngine:
         
         return needs_rebalance, max_drift, drift_values
     
-    def generate_rebalance_plan(self, current_weights, target_weights, prices, cash=0):
-        """Generate detailed rebalancing execution plan"""
-        if not current_weights or not target_weights or not prices:
-            return []
-            
-        total_value = sum(current_weights.get(asset, 0) * prices.get(asset, 0) for asset in current_weights)
-        total_value += cash  # Add available cash
-        
-        trade_plan = []
-        
-        for asset in set(list(current_weights.keys()) + list(target_weights.keys())):
-            current_weight = current_weights.get(asset, 0)
-            target_weight = target_weights.get(asset, 0)
-            price = prices.get(asset, 0)
-            
-            if price <= 0:
-                continue  # Skip assets with no price data
-                
-            current_value = current_weight * total_value
-            target_value = target_weight * total_value / 100  # Target weights as percentages
-            
-            trade_value = target_value - current_value
-            trade_amount = trade_value / price if price > 0 else 0
-            
-            if abs(trade_value) > 1:  # Ignore tiny trades
-                action = "BUY" if trade_value > 0 else "SELL"
-                trade_plan.append({
-                    'asset': asset,
-                    'action': action,
-                    'amount': abs(round(trade_amount, 8)),
-                    'value': abs(round(trade_value, 2)),
-                    'current_allocation': round(current_weight * 100, 2) if current_weight else 0,
-                    'target_allocation': target_weight,
-                    'price': price
-                })
-        
-        return sorted(trade_plan, key=lambda x: abs(x['value']), reverse=True)
+    def generate_rebalance_plan(self, current_weights, target_weights, prices, cash=0, total_value=None,
+                                bands=None, trailing_volume=0):
+        """Generate detailed rebalancing execution plan.
+
+        Delegates to the planner, which finds the cheapest trades (fees plus
+        slippage, respecting minimum order sizes) that bring every asset back
+        inside its drift band rather than all the way to target. Target
+        weights may be percentages or fractions.
+        """
+        return self.planner.plan(current_weights, target_weights, prices, cash=cash, total_value=total_value,
+                                 bands=bands, trailing_volume=trailing_volume)
     
     def calculate_rebalance_metrics(self, current_weights, target_weights, historical_data=None):
         """Calculate metrics to evaluate rebalance effectiveness"""
@@ -107,41 +106,11 @@ class RebalanceEngine:
             if not current_weights or not target_weights:
                 return metrics
             
-            # Calculate drift reduction
-            drift_sum = sum(abs(current_weights.get(k, 0) - target_weights.get(k, 0)/100) 
-                          for k in set(list(current_weights.keys()) + list(target_weights.keys())))
-            metrics['drift_reduction'] = round(drift_sum * 100, 2)
-            
-            # Simple transaction cost estimate (0.1% of traded value)
-            value_traded = sum(abs(current_weights.get(k, 0) - target_weights.get(k, 0)/100) 
-                            for k in set(list(current_weights.keys()) + list(target_weights.keys())))
-            metrics['transaction_cost_estimate'] = round(value_traded * 0.001 * 100, 4)  # As percentage
-            
-            # Risk and return impacts (simplified model)
-            if target_weights.get('USDC', 0) > current_weights.get('USDC', 0) * 100:
-                # More stablecoins = lower risk but lower returns
-                metrics['risk_impact'] = -0.2  # Negative means risk reduction
-                metrics['expected_return_impact'] = -0.1  # Slightly negative return impact
-                metrics['volatility_impact'] = -0.15
-            else:
-                # More crypto exposure = higher risk and higher returns
-                metrics['risk_impact'] = 0.15
-                metrics['expected_return_impact'] = 0.2
-                metrics['volatility_impact'] = 0.1
-            
-            # Impact on Sharpe ratio (simplified)
-            if metrics['expected_return_impact'] > abs(metrics['risk_impact']):
-                metrics['sharpe_impact'] = 0.1  # Positive impact
-            else:
-                metrics['sharpe_impact'] = -0.05  # Negative impact
-            
-            # Overall optimization score
-            metrics['optimization_score'] = round((
-                metrics['drift_reduction'] * 0.4 +  # 40% weight on drift reduction
-                metrics['expected_return_impact'] * 0.3 +  # 30% on return impact
-                (1 - metrics['transaction_cost_estimate']) * 0.1 +  # 10% on minimizing costs
-                (metrics['sharpe_impact'] + 0.2) * 0.2  # 20% on Sharpe ratio impact
-            ) * 10, 1)  # 0-10 scale
+            # Calculate drift reduction (also the traded value for the cost estimate)
+            current, target = self.asset_index.vectors(current_weights, target_weights)
+            drift_sum = float(np.abs(current - target / 100).sum())
+            adds_stablecoin = target_weights.get('USDC', 0) > current_weights.get('USDC', 0) * 100
+            metrics.update(self._metrics_from_drift(drift_sum, adds_stablecoin))
             
             return metrics
             
@@ -149,6 +118,91 @@ class RebalanceEngine:
             print(f"Error calculating rebalance metrics: {e}")
             return metrics
     
+    @staticmethod
+    def _impacts(adds_stablecoin):
+        """Risk, return, volatility and Sharpe impacts of a rebalance (simplified model)"""
+        if adds_stablecoin:
+            # More stablecoins = lower risk but lower returns
+            impacts = {'risk_impact': -0.2, 'expected_return_impact': -0.1, 'volatility_impact': -0.15}
+        else:
+            # More crypto exposure = higher risk and higher returns
+            impacts = {'risk_impact': 0.15, 'expected_return_impact': 0.2, 'volatility_impact': 0.1}
+        
+        # Impact on Sharpe ratio (simplified)
+        if impacts['expected_return_impact'] > abs(impacts['risk_impact']):
+            impacts['sharpe_impact'] = 0.1  # Positive impact
+        else:
+            impacts['sharpe_impact'] = -0.05  # Negative impact
+        return impacts
+    
+    @staticmethod
+    def _score(drift_reduction, transaction_cost_estimate, expected_return_impact, sharpe_impact):
+        """Overall optimization score on a 0-10 scale, before rounding (floats or arrays)"""
+        return (
+            drift_reduction * 0.4 +  # 40% weight on drift reduction
+            expected_return_impact * 0.3 +  # 30% on return impact
+            (1 - transaction_cost_estimate) * 0.1 +  # 10% on minimizing costs
+            (sharpe_impact + 0.2) * 0.2  # 20% on Sharpe ratio impact
+        ) * 10
+    
+    def _metrics_from_drift(self, drift_sum, adds_stablecoin):
+        """Rebalance metrics from the summed absolute drift (shared by the single and batch paths)"""
+        impacts = self._impacts(adds_stablecoin)
+        metrics = {
+            'drift_reduction': round(drift_sum * 100, 2),
+            'risk_impact': impacts['risk_impact'],
+            'expected_return_impact': impacts['expected_return_impact'],
+            # Simple transaction cost estimate (0.1% of traded value)
+            'transaction_cost_estimate': round(drift_sum * TRANSACTION_COST_RATE * 100, 4),  # As percentage
+            'volatility_impact': impacts['volatility_impact'],
+            'sharpe_impact': impacts['sharpe_impact']
+        }
+        metrics['optimization_score'] = round(self._score(
+            metrics['drift_reduction'], metrics['transaction_cost_estimate'],
+            metrics['expected_return_impact'], metrics['sharpe_impact']), 1)
+        return metrics
+    
+    def _optimization_scores(self, drift_sum, adds_stablecoin):
+        """_metrics_from_drift's optimization_score for arrays of drift sums, without its roundings"""
+        stable, crypto = self._impacts(True), self._impacts(False)
+        return self._score(
+            drift_sum * 100, drift_sum * TRANSACTION_COST_RATE * 100,
+            np.where(adds_stablecoin, stable['expected_return_impact'], crypto['expected_return_impact']),
+            np.where(adds_stablecoin, stable['sharpe_impact'], crypto['sharpe_impact'])
+        )
+    
+    def _evaluate_strategies(self, current, targets):
+        """Best strategy for each portfolio, from one array pass over every (portfolio, strategy) pair.
+        
+        current holds fractional weights (portfolios x assets) and targets
+        percent weights (portfolios x strategies x assets), both laid out by
+        self.asset_index. The array scores shortlist the strategies that can
+        win; only those get the exact metrics. Returns (strategy index,
+        max drift, metrics) per portfolio.
+        """
+        drift = np.abs(current[:, None, :] - targets / 100)
+        max_drift = drift.max(axis=2).tolist()
+        drift_sum = drift.sum(axis=2)
+        usdc = self.asset_index.positions.get('USDC')
+        if usdc is None:
+            adds_stablecoin = np.zeros(drift_sum.shape, dtype=bool)
+        else:
+            adds_stablecoin = targets[:, :, usdc] > current[:, None, usdc] * 100
+        scores = self._optimization_scores(drift_sum, adds_stablecoin)
+        shortlist = (scores >= scores.max(axis=1, keepdims=True) - SCORE_MARGIN).tolist()
+        
+        drift_sum, adds_stablecoin = drift_sum.tolist(), adds_stablecoin.tolist()
+        results = []
+        for p, candidates in enumerate(shortlist):
+            best, best_metrics = None, None
+            for s in (s for s, candidate in enumerate(candidates) if candidate):
+                metrics = self._metrics_from_drift(drift_sum[p][s], adds_stablecoin[p][s])
+                # First strategy with the top score wins, as with max() over the strategy dict
+                if best is None or metrics['optimization_score'] > best_metrics['optimization_score']:
+                    best, best_metrics = s, metrics
+            results.append((best, max_drift[p][best], best_metrics))
+        return results
+    
     def apply_rebalance_strategy(self, portfolio, signals, prices, strategy='tactical', risk_profile=50):
         """Apply selected rebalancing strategy to determine target weights"""
         if not portfolio or not signals or not prices:
@@ -178,40 +232,51 @@ class RebalanceEngine:
             target_weights = {asset: equal_weight for asset in portfolio}
             
         elif strategy == 'mpt':
-            # Modern Portfolio Theory (simplified)
-            # Higher risk profile = more weight to higher expected return assets
-            # Sort assets by expected return (using signal score as proxy)
-            sorted_assets = sorted(
-                [(asset, signals.get(asset, {}).get('total_score', 0)) for asset in portfolio],
-                key=lambda x: x[1], 
-                reverse=True
-            )
+            if self.covariance is not None and self.covariance.covers(portfolio):
+                # Box-constrained mean-variance optimization on the shared covariance estimate
+                target_weights = self._optimize_mpt(list(portfolio), signals, risk_factor)
+            else:
+                # Modern Portfolio Theory (simplified)
+                # Higher risk profile = more weight to higher expected return assets
+                # Sort assets by expected return (using signal score as proxy)
+                sorted_assets = sorted(
+                    [(asset, signals.get(asset, {}).get('total_score', 0)) for asset in portfolio],
+                    key=lambda x: x[1], 
+                    reverse=True
+                )
             
-            # Allocate based on risk profile and ranking
-            base_allocation = 100 / len(portfolio)
+                # Allocate based on risk profile and ranking
+                base_allocation = 100 / len(portfolio)
             
-            for i, (asset, _) in enumerate(sorted_assets):
-                # Higher rank = higher allocation for high risk, lower for low risk
-                rank_factor = (len(sorted_assets) - i) / len(sorted_assets)
-                adjustment = (rank_factor - 0.5) * risk_factor * 20  # +/- 10% adjustment
-                target_weights[asset] = max(5, min(40, base_allocation + adjustment))
+                for i, (asset, _) in enumerate(sorted_assets):
+                    # Higher rank = higher allocation for high risk, lower for low risk
+                    rank_factor = (len(sorted_assets) - i) / len(sorted_assets)
+                    adjustment = (rank_factor - 0.5) * risk_factor * 20  # +/- 10% adjustment
+                    target_weights[asset] = max(5, min(40, base_allocation + adjustment))
             
         elif strategy == 'risk_parity':
-            # Risk Parity (simplified)
-            # Estimate volatility using signals
-            volatilities = {}
-            for asset in portfolio:
-                volatility = signals.get(asset, {}).get('volatility', 0.5)
-                # Normalize volatility
-                volatilities[asset] = max(0.1, min(2.0, volatility * 2))
+            if self.covariance is not None and self.covariance.covers(portfolio):
+                # Equal risk contribution on the shared covariance estimate, rescaled into the 5-40% box
+                weights = rescale_into_box(self._risk_parity_weights(tuple(portfolio)),
+                                           *box_bounds(len(portfolio), MIN_WEIGHT, MAX_WEIGHT))
+                for asset, weight in zip(portfolio, weights):
+                    target_weights[asset] = round(float(weight) * 100, 1)
+            else:
+                # Risk Parity (simplified)
+                # Estimate volatility using signals
+                volatilities = {}
+                for asset in portfolio:
+                    volatility = signals.get(asset, {}).get('volatility', 0.5)
+                    # Normalize volatility
+                    volatilities[asset] = max(0.1, min(2.0, volatility * 2))
             
-            # Inverse volatility weighting
-            total_inv_vol = sum(1/volatilities.get(asset, 1) for asset in portfolio)
+                # Inverse volatility weighting
+                total_inv_vol = sum(1/volatilities.get(asset, 1) for asset in portfolio)
             
-            for asset in portfolio:
-                inv_vol = 1 / volatilities.get(asset, 1)
-                weight = (inv_vol / total_inv_vol) * 100
-                target_weights[asset] = max(5, min(40, round(weight, 1)))
+                for asset in portfolio:
+                    inv_vol = 1 / volatilities.get(asset, 1)
+                    weight = (inv_vol / total_inv_vol) * 100
+                    target_weights[asset] = max(5, min(40, round(weight, 1)))
                 
         elif strategy == 'momentum':
             # Momentum-based strategy
@@ -273,16 +338,125 @@ class RebalanceEngine:
         
         return target_weights
     
-    def get_rebalance_recommendation(self, current_weights, signals, prices, risk_profile=50):
-        """Get actionable rebalance recommendation with justification"""
+    def _strategy_key(self, strategy):
+        """Engine strategy key for a requested strategy (unknown names run as tactical, as in apply_rebalance_strategy)"""
+        strategy = (strategy or 'tactical').lower()
+        return strategy if strategy in self.strategies else 'tactical'
+    
+    def get_strategy_targets(self, strategy, assets, signals, prices, risk_profile=50, signals_version=None):
+        """Target weights for one strategy, memoized when the caller knows the signals version.
+        
+        The covariance version is part of the key, so 'mpt' targets are
+        recomputed once per bar rather than per call. Prices only gate
+        apply_rebalance_strategy (no prices, no targets), so they are not
+        part of the key. Returns a fresh dict on every call.
+        """
+        if signals_version is None or not prices:
+            return self.apply_rebalance_strategy(assets, signals, prices, strategy=strategy, risk_profile=risk_profile)
+        
+        covariance_version = self.covariance.version if self.covariance is not None else None
+        key = (strategy, tuple(assets), signals_version, risk_profile, covariance_version)
+        with self._target_cache_lock:
+            cached = self.target_cache.get(key)
+            if cached is not None:
+                self.target_cache.move_to_end(key)
+                self._target_cache_hits += 1
+                return dict(cached)
+            self._target_cache_misses += 1
+        
+        target_weights = self.apply_rebalance_strategy(assets, signals, prices, strategy=strategy,
+                                                       risk_profile=risk_profile)
+        with self._target_cache_lock:
+            self.target_cache[key] = dict(target_weights)
+            while len(self.target_cache) > self.target_cache_size:
+                self.target_cache.popitem(last=False)
+        return target_weights
+    
+    def target_cache_stats(self):
+        with self._target_cache_lock:
+            total = self._target_cache_hits + self._target_cache_misses
+            return {
+                'hits': self._target_cache_hits,
+                'misses': self._target_cache_misses,
+                'hit_rate': round(self._target_cache_hits / total, 3) if total else 0.0,
+                'entries': len(self.target_cache)
+            }
+    
+    def _optimize_mpt(self, assets, signals, risk_factor):
+        """Blend of min-variance and max-Sharpe weights (percent), more max-Sharpe at higher risk"""
+        cov = self.covariance.matrix(assets)
+        # Signal-implied expected returns: alpha = IC x volatility x score
+        scores = np.array([signals.get(asset, {}).get('total_score', 0) for asset in assets], dtype=float)
+        expected_returns = self.signal_ic * np.sqrt(np.diag(cov)) * scores
+        weights = optimize(expected_returns, cov, risk_factor, MIN_WEIGHT, MAX_WEIGHT)
+        return {asset: round(float(weight) * 100, 1) for asset, weight in zip(assets, weights)}
+    
+    def _risk_parity_weights(self, assets):
+        """ERC weights for an asset tuple, warm-started from its previous solution"""
+        version = self.covariance.version
+        with self._target_cache_lock:
+            previous = self.erc_solutions.get(assets)
+        if previous is not None and previous[0] == version:
+            return previous[1]
+        
+        weights = equal_risk_contribution(self.covariance.matrix(assets),
+                                          start=previous[1] if previous is not None else None)
+        self._store_erc_solution(assets, version, weights)
+        return weights
+    
+    def _store_erc_solution(self, assets, version, weights):
+        with self._target_cache_lock:
+            self.erc_solutions[assets] = (version, weights)
+            self.erc_solutions.move_to_end(assets)
+            while len(self.erc_solutions) > self.target_cache_size:
+                self.erc_solutions.popitem(last=False)
+    
+    def prepare_risk_parity(self, asset_sets):
+        """Solve ERC for many asset tuples at once (same-size tuples share one batched solve)"""
+        if self.covariance is None:
+            return
+        version = self.covariance.version
+        with self._target_cache_lock:
+            previous = {assets: self.erc_solutions.get(assets) for assets in set(map(tuple, asset_sets))}
+        by_size = {}
+        for assets, solution in previous.items():
+            if self.covariance.covers(assets) and (solution is None or solution[0] != version):
+                by_size.setdefault(len(assets), []).append(assets)
+        
+        for groups in by_size.values():
+            covs = np.stack([self.covariance.matrix(assets) for assets in groups])
+            starts = None
+            if all(previous[assets] is not None for assets in groups):
+                starts = np.stack([previous[assets][1] for assets in groups])
+            for assets, weights in zip(groups, equal_risk_contribution_batch(covs, starts)):
+                self._store_erc_solution(assets, version, weights)
+    
+    def get_rebalance_recommendation(self, current_weights, signals, prices, risk_profile=50, strategy=None,
+                                     compare_strategies=False, signals_version=None):
+        """Get actionable rebalance recommendation with justification
+        
+        Only the requested strategy (default tactical) is evaluated unless
+        compare_strategies is set, in which case all strategies are scored
+        and the best one is recommended.
+        """
         try:
-            # Test different strategies
+            strategy_keys = list(self.strategies.keys()) if compare_strategies else [self._strategy_key(strategy)]
+            targets = [
+                self.get_strategy_targets(key, current_weights.keys(), signals, prices, risk_profile, signals_version)
+                for key in strategy_keys
+            ]
+            market_condition = self._market_condition(signals)
+            if len(targets) > 1 and current_weights and all(targets):
+                # Every candidate against the current weights in one array pass
+                current = self.asset_index.vectors(current_weights)
+                (best, max_drift, metrics), = self._evaluate_strategies(current, self.asset_index.vectors(*targets)[None])
+                return self._build_recommendation(current_weights, signals, strategy_keys[best],
+                                                  self._strategy_data(targets[best], max_drift, metrics),
+                                                  market_condition)
+            
+            # A single strategy costs less as plain dict arithmetic than as array setup
             strategy_results = {}
-            for strategy_key in self.strategies.keys():
-                target_weights = self.apply_rebalance_strategy(
-                    current_weights.keys(), signals, prices, strategy=strategy_key, risk_profile=risk_profile
-                )
-                
+            for strategy_key, target_weights in zip(strategy_keys, targets):
                 need_rebalance, max_drift, _ = self.calculate_rebalance_need(
                     current_weights, {k: v/100 for k, v in target_weights.items()}
                 )
@@ -300,54 +474,8 @@ class RebalanceEngine:
                 }
             
             # Find optimal strategy
-            best_strategy = max(strategy_results.items(), key=lambda x: x[1]['score'])
-            strategy_key = best_strategy[0]
-            strategy_data = best_strategy[1]
-            
-            # Generate recommendation
-            market_condition = "volatile" if any(abs(s.get('total_score', 0)) > 1 for s in signals.values()) else "stable"
-            action = "REBALANCE" if strategy_data['need_rebalance'] else "HOLD"
-            urgency = "HIGH" if strategy_data['max_drift'] > 0.1 else "MEDIUM" if strategy_data['max_drift'] > 0.05 else "LOW"
-            
-            justification = []
-            if strategy_data['need_rebalance']:
-                justification.append(f"Portfolio drift of {strategy_data['max_drift']*100:.1f}% exceeds threshold")
-                
-                # Add strategy-specific justification
-                if strategy_key == 'momentum':
-                    assets_momentum = [(k, signals.get(k, {}).get('momentum', 0)) for k in current_weights.keys()]
-                    positive_momentum = [a for a, m in assets_momentum if m > 0.5]
-                    negative_momentum = [a for a, m in assets_momentum if m < -0.5]
-                    
-                    if positive_momentum:
-                        justification.append(f"Positive momentum detected in {', '.join(positive_momentum)}")
-                    if negative_momentum:
-                        justification.append(f"Negative momentum detected in {', '.join(negative_momentum)}")
-                        
-                elif strategy_key == 'risk_parity':
-                    justification.append("Risk distribution is sub-optimal")
-                    
-                elif strategy_key == 'tactical':
-                    justification.append("Market signals suggest tactical repositioning")
-                    
-                justification.append(f"Expected optimization improvement: {strategy_data['metrics']['optimization_score']}/10")
-            else:
-                justification.append("Portfolio currently within acceptable drift parameters")
-            
-            return {
-                'recommendation': action,
-                'urgency': urgency,
-                'strategy': {
-                    'key': strategy_key,
-                    'name': self.strategies[strategy_key]['name'],
-                    'description': self.strategies[strategy_key]['description']
-                },
-                'target_weights': strategy_data['target_weights'],
-                'justification': justification,
-                'market_condition': market_condition,
-                'metrics': strategy_data['metrics'],
-                'timestamp': time.time()
-            }
+            strategy_key, strategy_data = max(strategy_results.items(), key=lambda x: x[1]['score'])
+            return self._build_recommendation(current_weights, signals, strategy_key, strategy_data, market_condition)
             
         except Exception as e:
             print(f"Error generating rebalance recommendation: {e}")
@@ -360,4 +488,127 @@ class RebalanceEngine:
                 'market_condition': "unknown",
                 'metrics': {},
                 'timestamp': time.time()
-            }
\ No newline at end of file
+            }
+    
+    def _strategy_data(self, target_weights, max_drift, metrics):
+        return {
+            'target_weights': target_weights,
+            'need_rebalance': max_drift > DRIFT_THRESHOLD,
+            'max_drift': max_drift,
+            'metrics': metrics,
+            'score': metrics['optimization_score']
+        }
+    
+    def _market_condition(self, signals):
+        return "volatile" if any(abs(s.get('total_score', 0)) > 1 for s in signals.values()) else "stable"
+    
+    def _build_recommendation(self, current_weights, signals, strategy_key, strategy_data, market_condition):
+        """Turn the winning strategy's evaluation into the recommendation payload"""
+        action = "REBALANCE" if strategy_data['need_rebalance'] else "HOLD"
+        urgency = "HIGH" if strategy_data['max_drift'] > 0.1 else "MEDIUM" if strategy_data['max_drift'] > 0.05 else "LOW"
+        
+        justification = []
+        if strategy_data['need_rebalance']:
+            justification.append(f"Portfolio drift of {strategy_data['max_drift']*100:.1f}% exceeds threshold")
+            
+            # Add strategy-specific justification
+            if strategy_key == 'momentum':
+                assets_momentum = [(k, signals.get(k, {}).get('momentum', 0)) for k in current_weights.keys()]
+                positive_momentum = [a for a, m in assets_momentum if m > 0.5]
+                negative_momentum = [a for a, m in assets_momentum if m < -0.5]
+                
+                if positive_momentum:
+                    justification.append(f"Positive momentum detected in {', '.join(positive_momentum)}")
+                if negative_momentum:
+                    justification.append(f"Negative momentum detected in {', '.join(negative_momentum)}")
+                    
+            elif strategy_key == 'risk_parity':
+                justification.append("Risk distribution is sub-optimal")
+                
+            elif strategy_key == 'tactical':
+                justification.append("Market signals suggest tactical repositioning")
+                
+            justification.append(f"Expected optimization improvement: {strategy_data['metrics']['optimization_score']}/10")
+        else:
+            justification.append("Portfolio currently within acceptable drift parameters")
+        
+        return {
+            'recommendation': action,
+            'urgency': urgency,
+            'strategy': {
+                'key': strategy_key,
+                'name': self.strategies[strategy_key]['name'],
+                'description': self.strategies[strategy_key]['description']
+            },
+            'target_weights': strategy_data['target_weights'],
+            'justification': justification,
+            'market_condition': market_condition,
+            'metrics': strategy_data['metrics'],
+            'timestamp': time.time()
+        }
+    
+    def get_rebalance_recommendations_batch(self, portfolios, signals, prices, compare_strategies=False,
+                                            signals_version=None):
+        """Recommendations for many portfolios that share the same signals and prices.
+        
+        portfolios maps an id to {'current_weights': {...}, 'risk_profile': 50,
+        'strategy': 'tactical'}. Strategy targets are computed once per (asset
+        order, risk_profile, strategy) group and drift is scored for the whole
+        group as one weights matrix; each result matches
+        get_rebalance_recommendation for that portfolio.
+        """
+        groups = {}
+        for portfolio_id, portfolio in portfolios.items():
+            strategy = None if compare_strategies else self._strategy_key(portfolio.get('strategy'))
+            key = (tuple(portfolio['current_weights'].keys()), portfolio.get('risk_profile', 50), strategy)
+            groups.setdefault(key, []).append(portfolio_id)
+        
+        if compare_strategies or any(strategy == 'risk_parity' for _, _, strategy in groups):
+            self.prepare_risk_parity(assets for assets, _, _ in groups)
+        
+        market_condition = self._market_condition(signals) if signals else "stable"
+        results = {}
+        for (assets, risk_profile, strategy), portfolio_ids in groups.items():
+            strategy_keys = [strategy] if strategy else list(self.strategies.keys())
+            try:
+                results.update(self._recommend_group(assets, risk_profile, strategy_keys, portfolio_ids, portfolios,
+                                                     signals, prices, market_condition, signals_version))
+            except Exception as e:
+                print(f"Error in batched recommendation, evaluating {len(portfolio_ids)} portfolios one by one: {e}")
+                for portfolio_id in portfolio_ids:
+                    results[portfolio_id] = self.get_rebalance_recommendation(
+                        portfolios[portfolio_id]['current_weights'], signals, prices, risk_profile=risk_profile,
+                        strategy=strategy, compare_strategies=compare_strategies, signals_version=signals_version
+                    )
+        
+        return {portfolio_id: results[portfolio_id] for portfolio_id in portfolios}
+    
+    def _recommend_group(self, assets, risk_profile, strategy_keys, portfolio_ids, portfolios, signals, prices,
+                         market_condition, signals_version=None):
+        """Evaluate the given strategies once for a group of portfolios holding the same assets"""
+        targets = [
+            self.get_strategy_targets(key, assets, signals, prices, risk_profile, signals_version)
+            for key in strategy_keys
+        ]
+        if not assets or not all(targets):
+            # Degenerate inputs take the single-portfolio path's early returns
+            return {
+                portfolio_id: self.get_rebalance_recommendation(
+                    portfolios[portfolio_id]['current_weights'], signals, prices, risk_profile=risk_profile,
+                    strategy=strategy_keys[0], compare_strategies=len(strategy_keys) > 1)
+                for portfolio_id in portfolio_ids
+            }
+        
+        layout = self.asset_index.layout(assets)
+        target = self.asset_index.vectors(*targets)  # strategies x assets, percents
+        current = np.zeros((len(portfolio_ids), target.shape[1]))  # portfolios x assets, fractions
+        current[:, layout] = [[portfolios[pid]['current_weights'][asset] for asset in assets] for pid in portfolio_ids]
+        
+        results = {}
+        evaluated = self._evaluate_strategies(current, np.broadcast_to(target, (len(portfolio_ids),) + target.shape))
+        for portfolio_id, (best, max_drift, metrics) in zip(portfolio_ids, evaluated):
+            results[portfolio_id] = self._build_recommendation(
+                portfolios[portfolio_id]['current_weights'], signals, strategy_keys[best],
+                self._strategy_data(dict(targets[best]), max_drift, metrics), market_condition
+            )
+        return results
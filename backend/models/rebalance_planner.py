@@ -0,0 +1,260 @@
+import numpy as np
+
+# Taker fee by trailing 30-day traded volume in USD: (minimum volume, rate)
+DEFAULT_FEE_TIERS = [(0, 0.0010), (50_000, 0.0008), (1_000_000, 0.0006), (10_000_000, 0.0004)]
+
+# Order book depth (USD) used by the square-root slippage curve
+DEFAULT_DEPTH = {'BTC': 50_000_000, 'ETH': 20_000_000, 'ADA': 2_000_000, 'DOT': 1_000_000, 'USDC': 100_000_000}
+
+EDGE_BUFFER = 1e-6  # Assets outside their band land just inside it, so the next drift check doesn't fire on rounding
+
+
+def fee_rate(fee_tiers, trailing_volume=0):
+    """Fee rate of the highest tier the trailing volume reaches"""
+    rate = fee_tiers[0][1]
+    for minimum, tier_rate in fee_tiers:
+        if trailing_volume >= minimum:
+            rate = tier_rate
+    return rate
+
+
+class SlippageCurve:
+    """Square-root market impact: an order of notional n pays n * (half_spread + impact * sqrt(n / depth))"""
+
+    def __init__(self, half_spread=0.0005, impact=0.1, depth=None, default_depth=1_000_000):
+        self.half_spread = half_spread
+        self.impact = max(impact, 1e-6)  # Some curvature keeps the cheapest trade set unique
+        self.depth = dict(DEFAULT_DEPTH if depth is None else depth)
+        self.default_depth = default_depth
+
+    def coefficient(self, asset):
+        """b in slippage(n) = half_spread * n + b * n^1.5"""
+        return self.impact / float(np.sqrt(self.depth.get(asset, self.default_depth)))
+
+    def cost(self, asset, notional):
+        notional = abs(notional)
+        return self.half_spread * notional + self.coefficient(asset) * notional ** 1.5
+
+
+class RebalancePlanner:
+    """Cheapest trade set that brings every asset back inside its drift band.
+
+    Each asset may end anywhere in target ± band (as a fraction of the
+    portfolio), so instead of trading every gap back to target the planner
+    minimizes total fees plus slippage over those ranges, subject to buys
+    being paid for by sells and available cash. Assets without a target
+    are sold out. Trades below the minimum order size are either dropped
+    (when the asset is already inside its band) or rounded up to the
+    minimum, and the rest of the plan is re-solved around them.
+    """
+
+    def __init__(self, drift_band=0.05, fee_tiers=None, slippage=None, min_order_value=10.0,
+                 min_order_amounts=None):
+        self.drift_band = drift_band  # Same 5% threshold calculate_rebalance_need uses
+        self.fee_tiers = fee_tiers or DEFAULT_FEE_TIERS
+        self.slippage = slippage or SlippageCurve()
+        self.min_order_value = min_order_value  # Exchange minimum notional per order
+        self.min_order_amounts = min_order_amounts or {}  # Per-asset minimum order size in units
+
+    @staticmethod
+    def _flows(lam, lo, hi, linear, curvature):
+        """Trade per asset whose marginal cost equals lam, clipped to its allowed range.
+
+        A trade of notional n has marginal cost linear + curvature * sqrt(n),
+        so at a price lam it is ((|lam| - linear) / curvature)^2 in the
+        direction of lam's sign.
+        """
+        lam = np.asarray(lam, dtype=float)[..., None]
+        size = (np.maximum(np.abs(lam) - linear, 0) / curvature) ** 2
+        return np.minimum(np.maximum(np.sign(lam) * size, lo), hi)
+
+    def _solve(self, lo, hi, linear, curvature, cash):
+        """Minimum-cost trades with lo <= x <= hi and 0 <= sum(x) <= cash.
+
+        The optimum trades every asset at a common marginal cost lam (zero
+        when cash alone can absorb the net flow). The total flow is
+        nondecreasing and piecewise quadratic in lam, so the exact lam is
+        found between its sorted breakpoints, as in project_to_box_simplex.
+        """
+        at_zero = np.clip(0.0, lo, hi)
+        net = at_zero.sum()
+        if 0 <= net <= cash:
+            return at_zero
+        goal = cash if net > cash else 0.0
+
+        def inverse(v):
+            return np.sign(v) * (linear + curvature * np.sqrt(np.abs(v)))
+
+        breakpoints = np.sort(np.concatenate([-linear, linear, inverse(lo), inverse(hi)]))
+        totals = self._flows(breakpoints, lo, hi, linear, curvature).sum(axis=1)
+        k = min(np.searchsorted(totals, goal), len(totals) - 1)  # First breakpoint with total >= goal
+        if k == 0 or totals[k] <= goal or totals[k] == totals[k - 1]:
+            return self._flows(breakpoints[k], lo, hi, linear, curvature)
+
+        # Between breakpoints k-1 and k every asset is clamped, idle or on one quadratic branch
+        left, right = breakpoints[k - 1], breakpoints[k]
+        middle = (left + right) / 2
+        unclipped = np.sign(middle) * (np.maximum(abs(middle) - linear, 0) / curvature) ** 2
+        moving = (unclipped > lo) & (unclipped < hi) & (np.abs(middle) > linear)
+        side = np.sign(middle)
+        constant = np.clip(unclipped, lo, hi)[~moving].sum()
+        scale = side / curvature[moving] ** 2  # flow_i = side * (lam - side * linear_i)^2 / curvature_i^2
+        shift = side * linear[moving]
+        a = scale.sum()
+        b = (-2 * scale * shift).sum()
+        c = (scale * shift ** 2).sum() + constant - goal
+        lam = left + (goal - totals[k - 1]) / (totals[k] - totals[k - 1]) * (right - left)
+        discriminant = b * b - 4 * a * c
+        if a != 0 and discriminant >= 0:
+            for root in ((-b + np.sqrt(discriminant)) / (2 * a), (-b - np.sqrt(discriminant)) / (2 * a)):
+                if left - 1e-12 <= root <= right + 1e-12:
+                    lam = root
+                    break
+        return self._flows(np.clip(lam, left, right), lo, hi, linear, curvature)
+
+    @staticmethod
+    def _feasible(lo, hi, cash):
+        return lo.sum() <= cash + 1e-9 and hi.sum() >= -1e-9
+
+    def _enforce_min_orders(self, lo, hi, held, minimum, linear, curvature, cash):
+        """Re-solve until no trade is below its minimum order, fixing one offender per pass"""
+        trades = self._solve(lo, hi, linear, curvature, cash)
+        for _ in range(len(lo)):
+            small = (np.abs(trades) > 1e-9) & (np.abs(trades) < minimum - 1e-9)
+            if not small.any():
+                break
+            i = np.flatnonzero(small)[np.argmin(np.abs(trades[small]))]
+
+            # Skip the trade if the band allows it, otherwise round it up to the minimum order
+            frozen_lo, frozen_hi = lo.copy(), hi.copy()
+            frozen_lo[i] = frozen_hi[i] = 0.0
+            forced_lo, forced_hi = lo.copy(), hi.copy()
+            if trades[i] > 0:
+                forced_lo[i] = max(lo[i], minimum[i])
+                forced_hi[i] = max(hi[i], forced_lo[i])
+            else:
+                forced_hi[i] = min(hi[i], -minimum[i])
+                forced_lo[i] = min(lo[i], forced_hi[i])
+            can_force = forced_lo[i] >= -held[i] - 1e-9 and self._feasible(forced_lo, forced_hi, cash)
+            can_skip = self._feasible(frozen_lo, frozen_hi, cash)
+
+            if can_skip and (lo[i] <= 0 <= hi[i] or not can_force):
+                lo, hi = frozen_lo, frozen_hi  # Inside the band, or dust too small to trade
+            elif can_force:
+                lo, hi = forced_lo, forced_hi
+            else:
+                break
+            trades = self._solve(lo, hi, linear, curvature, cash)
+
+        # Anything still under the minimum can't be placed
+        trades[np.abs(trades) < minimum - 1e-9] = 0.0
+        return trades
+
+    def plan(self, current_weights, target_weights, prices, cash=0, total_value=None, bands=None,
+             trailing_volume=0):
+        """Trade list in generate_rebalance_plan's format, largest trade first.
+
+        current_weights are fractions of the holdings, target_weights may be
+        fractions or percentages (they are normalized by their sum), and
+        total_value is the value of the holdings excluding cash. bands
+        overrides the drift band per asset.
+        """
+        if not current_weights or not target_weights or not prices:
+            return []
+        if total_value is None:
+            # Legacy callers only pass weights; size the plan the way the old planner did
+            total_value = sum(current_weights.get(asset, 0) * prices.get(asset, 0) for asset in current_weights)
+
+        assets = [asset for asset in dict.fromkeys(list(current_weights) + list(target_weights))
+                  if prices.get(asset, 0) > 0]
+        if not assets or total_value + cash <= 0:
+            return []
+
+        current_total = sum(current_weights.get(asset, 0) for asset in assets) or 1
+        target_total = sum(target_weights.get(asset, 0) for asset in assets) or 1
+        current = np.array([current_weights.get(asset, 0) / current_total for asset in assets])
+        target = np.array([target_weights.get(asset, 0) / target_total for asset in assets])
+        band = np.array([(bands or {}).get(asset, self.drift_band) if target_weights.get(asset, 0) > 0 else 0.0
+                         for asset in assets])
+        band = np.where(np.abs(current - target) > band, np.maximum(band - EDGE_BUFFER, 0), band)
+
+        portfolio_value = total_value + cash
+        held = current * total_value
+        lo = np.clip(target - band, 0, 1) * portfolio_value - held
+        hi = np.clip(target + band, 0, 1) * portfolio_value - held
+
+        fee = fee_rate(self.fee_tiers, trailing_volume)
+        linear = np.full(len(assets), fee + self.slippage.half_spread)
+        curvature = 1.5 * np.array([self.slippage.coefficient(asset) for asset in assets])
+        minimum = np.array([max(self.min_order_value, self.min_order_amounts.get(asset, 0) * prices[asset])
+                            for asset in assets])
+
+        trades = self._enforce_min_orders(lo, hi, held, minimum, linear, curvature, cash)
+
+        trade_plan = []
+        for asset, value in zip(assets, trades.tolist()):
+            if value == 0:
+                continue
+            slippage_cost = self.slippage.cost(asset, value)
+            trade_plan.append({
+                'asset': asset,
+                'action': "BUY" if value > 0 else "SELL",
+                'amount': abs(round(value / prices[asset], 8)),
+                'value': abs(round(value, 2)),
+                'current_allocation': round(current_weights.get(asset, 0) * 100, 2) if current_weights.get(asset) else 0,
+                'target_allocation': target_weights.get(asset, 0),
+                'price': prices[asset],
+                'fee': round(abs(value) * fee, 2),
+                'slippage': round(float(slippage_cost), 2)
+            })
+
+        return sorted(trade_plan, key=lambda x: abs(x['value']), reverse=True)
+
+    def plan_cost(self, trade_plan, trailing_volume=0):
+        """Fees plus slippage of any trade list in this format (e.g. to compare plans)"""
+        fee = fee_rate(self.fee_tiers, trailing_volume)
+        return sum(trade['value'] * fee + self.slippage.cost(trade['asset'], trade['value']) for trade in trade_plan)
+
+    @staticmethod
+    def apply_trades(holdings, trade_plan, cash=0):
+        """Holdings (units per asset) after filling a plan.
+
+        Sells settle first; their proceeds net of costs, plus cash, fund the
+        buys pro rata, and each buy also pays its own costs.
+        """
+        updated = dict(holdings)
+        proceeds = cash
+        buys = []
+        for trade in trade_plan:
+            costs = trade.get('fee', 0) + trade.get('slippage', 0)
+            if trade['action'] == 'SELL':
+                remaining = updated.get(trade['asset'], 0) - trade['amount']
+                sold = trade['amount'] if remaining > 0 else updated.get(trade['asset'], 0)
+                proceeds += sold * trade['price'] - costs
+                if remaining > 1e-12:
+                    updated[trade['asset']] = remaining
+                else:
+                    updated.pop(trade['asset'], None)
+            else:
+                buys.append((trade, costs))
+
+        spend = sum(trade['value'] for trade, _ in buys)
+        funded = min(1.0, proceeds / spend) if spend > 0 else 0.0
+        for trade, costs in buys:
+            bought = max(trade['value'] * funded - costs, 0) / trade['price']
+            if bought > 0:
+                updated[trade['asset']] = updated.get(trade['asset'], 0) + bought
+        return updated
+
+
+# Example usage
+if __name__ == "__main__":
+    planner = RebalancePlanner()
+    current = {'BTC': 0.45, 'ETH': 0.25, 'ADA': 0.10, 'DOT': 0.12, 'USDC': 0.08}
+    target = {'BTC': 35.0, 'ETH': 30.0, 'ADA': 15.0, 'DOT': 10.0, 'USDC': 10.0}
+    prices = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+
+    plan = planner.plan(current, target, prices, total_value=25000)
+    for trade in plan:
+        print(f"{trade['action']:4s} {trade['asset']:5s} ${trade['value']:>9,.2f}  cost ${trade['fee'] + trade['slippage']:.2f}")
+    print(f"💰 Total cost: ${planner.plan_cost(plan):.2f}")
@@ -1,69 +1,195 @@
+import copy
 import uuid
 import time
 import json
 import os
 import random
 import threading
-import requests
 from datetime import datetime
 
+from models.drift_scheduler import DriftScheduler
+from models.order_netting import OrderNettingBook
+from models.performance_rollup import PerformanceRollup
+from models.rebalance_planner import RebalancePlanner
+from services.account_store import open_account_store
+from services.persistence_scheduler import PersistenceScheduler
+from services.token_registry import TokenRegistry
+
 class VirtualAccountManager:
-    """Manages virtual user accounts, portfolios, and trading bots with persistent storage."""
+    """Manages virtual user accounts, portfolios, and trading bots with persistent storage.
+    
+    Every mutation is recorded as a small op while holding self._lock, so
+    persisting a change costs the same however much history the accounts
+    hold. Ops are buffered per dirty account and written in one batch at
+    most every `persist_interval` seconds (PersistenceScheduler). The
+    backend is a JSON snapshot plus journal (AccountJournal) or SQLite
+    (SQLiteAccountStore), chosen by `storage` or the ACCOUNT_STORE
+    environment variable.
+    """
     
-    def __init__(self):
+    def __init__(self, data_file=None, start_updates=True, token_registry=None, storage=None, persist_interval=1.0):
         self.accounts = {}
-        self.data_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'virtual_accounts.json')
+        self.bots = {}  # bot_id -> (user_id, bot), kept in step with the accounts' bot lists
+        self.bots_by_status = {'active': {}, 'stopped': {}}  # status -> {bot_id: (user_id, bot)}
+        self.drift_scheduler = DriftScheduler()  # Bots ordered by the price move that could breach their band
+        self.token_registry = token_registry or TokenRegistry()
+        self.data_file = data_file or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'virtual_accounts.json')
+        self._lock = threading.RLock()  # A mutation and its stored op are applied together
+        self.store = open_account_store(self.data_file, lambda: self.accounts, self._lock, storage)
+        self.persistence = PersistenceScheduler(self.store, self._lock, window=persist_interval)
+        self.rollup = PerformanceRollup()  # Raw performance records for 7 days, then daily, then weekly
         self.load_accounts()
         self.price_update_interval = 60  # seconds
-        self._start_price_updates()
+        self.last_netting_stats = {}  # Order netting summary of the latest bot tick
+        if start_updates:
+            self._start_price_updates()
         
     def load_accounts(self):
-        """Load accounts from JSON file."""
+        """Load accounts from the storage backend."""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    self.accounts = json.load(f)
+            with self._lock:
+                self.accounts = self.store.load()
+                self._rebuild_bot_index()
+                self.drift_scheduler.reset()
+                self._roll_up_histories()
+            if self.accounts:
                 print(f"Loaded {len(self.accounts)} virtual accounts from storage")
         except Exception as e:
             print(f"Error loading accounts: {e}")
             self.accounts = {}
+            self._rebuild_bot_index()
+    
+    def _roll_up_histories(self):
+        """Bring every stored history under the retention policy (histories saved before it existed)"""
+        now = time.time()
+        for user_id, account in self.accounts.items():
+            self._record_rollups([user_id, 'performance_history'], account.get('performance_history', []), now)
+            for bot in account.get('bots', []):
+                self._record_rollups([user_id, 'bots', bot['bot_id'], 'performance_history'],
+                                     bot.get('performance_history', []), now)
+    
+    def _record_rollups(self, path, history, now=None):
+        for start, stop, records in self.rollup.maintain(history, now):
+            self._record('splice', path=path, start=start, stop=stop, value=records)
+    
+    def _append_history(self, path, owner, record):
+        """Append a performance record (with self._lock held), rolling up whatever aged out"""
+        history = owner.setdefault('performance_history', [])
+        history.append(record)
+        self._record('append', path=path, value=record)
+        self._record_rollups(path, history)
+    
+    def _rebuild_bot_index(self):
+        self.bots = {}
+        self.bots_by_status = {'active': {}, 'stopped': {}}
+        for user_id, account in self.accounts.items():
+            for bot in account.get('bots', []):
+                self._index_bot(user_id, bot)
+    
+    def _index_bot(self, user_id, bot):
+        entry = (user_id, bot)
+        self.bots[bot['bot_id']] = entry
+        self.bots_by_status.setdefault(bot.get('status'), {})[bot['bot_id']] = entry
+    
+    def _set_bot_status(self, bot, status):
+        """Change a bot's status and move it between the status indexes"""
+        entry = self.bots_by_status.get(bot.get('status'), {}).pop(bot['bot_id'])
+        bot['status'] = status
+        self.bots_by_status.setdefault(status, {})[bot['bot_id']] = entry
+    
+    def _unindex_bot(self, bot):
+        self.bots.pop(bot['bot_id'], None)
+        self.bots_by_status.get(bot.get('status'), {}).pop(bot['bot_id'], None)
+    
+    def _find_bot(self, user_id, bot_id):
+        """A user's bot by id, or None"""
+        entry = self.bots.get(bot_id)
+        return entry[1] if entry is not None and entry[0] == user_id else None
             
     def save_accounts(self):
-        """Save accounts to JSON file."""
+        """Write a full snapshot now (changes are stored as they happen, so this is only needed on demand)."""
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            
-            with open(self.data_file, 'w') as f:
-                json.dump(self.accounts, f, indent=2)
+            self.persistence.flush()
+            self.store.compact()
             print(f"Saved {len(self.accounts)} virtual accounts to storage")
         except Exception as e:
             print(f"Error saving accounts: {e}")
+    
+    def export_accounts(self, path):
+        """Write every account to a JSON file (the format both storage backends import)."""
+        with self._lock:
+            data = json.dumps(self.accounts, indent=2)
+        with open(path, 'w') as f:
+            f.write(data)
+        print(f"Exported {len(self.accounts)} virtual accounts to {path}")
+    
+    def close(self):
+        """Write pending changes and close the store (also runs at interpreter exit)."""
+        self.persistence.close()
+        self.store.close()
+    
+    def _record(self, op, **fields):
+        """Queue a mutation just applied under self._lock for the next batched write"""
+        self.persistence.record({'op': op, **fields})
+
+    def _set_portfolio_value(self, user_id, bot, value):
+        """Revalue a bot (call with self._lock held); stop_bot credits this value after a restart"""
+        bot['portfolio_value'] = value
+        self._record('set', path=[user_id, 'bots', bot['bot_id'], 'portfolio_value'], value=value)
+    
+    def get_bot_performance(self, user_id, bot_id, since=None):
+        """A user's bot's performance snapshots at or after `since` (indexed read on SQLite); None if not theirs."""
+        with self._lock:
+            bot = self._find_bot(user_id, bot_id)
+            if bot is None:
+                return None
+            query = getattr(self.store, 'bot_performance', None)
+            if query is None:
+                return [dict(record) for record in bot.get('performance_history', [])
+                        if since is None or record['timestamp'] >= since]
+        self.persistence.flush()  # The store only sees batched changes
+        return query(bot_id, since)
+    
+    def get_active_bots(self):
+        """(user_id, bot) for every active bot.
+
+        Bots are detached copies without their performance_history on both
+        backends (an indexed read on SQLite), so callers can't mutate live
+        state; use get_bot_performance for the history.
+        """
+        query = getattr(self.store, 'active_bots', None)
+        if query is not None:
+            self.persistence.flush()
+            return query()
+        with self._lock:
+            return [(user_id, copy.deepcopy({key: value for key, value in bot.items() if key != 'performance_history'}))
+                    for user_id, bot in self.bots_by_status['active'].values()]
 
     def create_account(self, user_id, initial_balance=100000):
         """Creates a new virtual account for a user."""
-        if user_id in self.accounts:
-            return self.accounts[user_id]
-        
-        account_id = str(uuid.uuid4())
-        self.accounts[user_id] = {
-            'account_id': account_id,
-            'user_id': user_id,
-            'balance': initial_balance, # Virtual USD
-            'initial_balance': initial_balance, # Store initial balance for accurate PnL calculation
-            'portfolio': {}, # {'BTC': 1.5, 'ETH': 10}
-            'bots': [], # List of deployed bot configurations
-            'trade_history': [],
-            'performance_history': [{
-                'timestamp': time.time(),
-                'balance': initial_balance,
-                'portfolio_value': 0,
-                'total_value': initial_balance
-            }],
-            'created_at': time.time()
-        }
+        with self._lock:
+            if user_id in self.accounts:
+                return self.accounts[user_id]
+            
+            account_id = str(uuid.uuid4())
+            self.accounts[user_id] = {
+                'account_id': account_id,
+                'user_id': user_id,
+                'balance': initial_balance, # Virtual USD
+                'initial_balance': initial_balance, # Store initial balance for accurate PnL calculation
+                'portfolio': {}, # {'BTC': 1.5, 'ETH': 10}
+                'bots': [], # List of deployed bot configurations
+                'trade_history': [],
+                'performance_history': [{
+                    'timestamp': time.time(),
+                    'balance': initial_balance,
+                    'portfolio_value': 0,
+                    'total_value': initial_balance
+                }],
+                'created_at': time.time()
+            }
+            self._record('create_account', user_id=user_id, account=self.accounts[user_id])
         print(f"Virtual account created for user {user_id} with ID {account_id}")
-        self.save_accounts()
         return self.accounts[user_id]
 
     def get_account(self, user_id):
@@ -117,11 +243,17 @@ class VirtualAccountManager:
             }]
         }
         
-        account['bots'].append(bot)
-        account['balance'] -= allocated_fund
+        with self._lock:
+            if account['balance'] < allocated_fund:
+                raise ValueError("Insufficient funds to deploy bot.")
+            account['bots'].append(bot)
+            self._index_bot(user_id, bot)
+            account['balance'] -= allocated_fund
+            self._record('add_bot', user_id=user_id, bot=bot)
+            self._record('set', path=[user_id, 'balance'], value=account['balance'])
+        self.drift_scheduler.mark_due((user_id, bot_id), (user_id, bot))
         
         print(f"Bot {bot_id} deployed for user {user_id} with {allocated_fund} USD.")
-        self.save_accounts()
         return bot
 
     def _get_initial_allocation(self, strategy):
@@ -145,29 +277,35 @@ class VirtualAccountManager:
         if not account:
             return False
             
-        bot_to_stop = next((bot for bot in account['bots'] if bot['bot_id'] == bot_id), None)
+        bot_to_stop = self._find_bot(user_id, bot_id)
         
         if not bot_to_stop:
             return False
             
-        # Liquidate assets and return funds to main balance
-        liquidation_value = bot_to_stop.get('portfolio_value', 0)
-        account['balance'] += liquidation_value
-        bot_to_stop['status'] = 'stopped'
-        
-        # Record final performance snapshot with correct PnL calculation
-        bot_to_stop['performance_history'].append({
-            'timestamp': time.time(),
-            'value': liquidation_value,
-            'pnl': liquidation_value - bot_to_stop['allocated_fund'],
-            'pnl_percent': ((liquidation_value / bot_to_stop['allocated_fund']) - 1) * 100
-        })
-        
-        # Store liquidation value for potential resume
-        bot_to_stop['liquidation_value'] = liquidation_value
+        with self._lock:
+            # Liquidate assets and return funds to main balance
+            liquidation_value = bot_to_stop.get('portfolio_value', 0)
+            account['balance'] += liquidation_value
+            self._set_bot_status(bot_to_stop, 'stopped')
+            
+            # Record final performance snapshot with correct PnL calculation
+            record = {
+                'timestamp': time.time(),
+                'value': liquidation_value,
+                'pnl': liquidation_value - bot_to_stop['allocated_fund'],
+                'pnl_percent': ((liquidation_value / bot_to_stop['allocated_fund']) - 1) * 100
+            }
+            
+            # Store liquidation value for potential resume
+            bot_to_stop['liquidation_value'] = liquidation_value
+            
+            bot_path = [user_id, 'bots', bot_id]
+            self._record('set', path=[user_id, 'balance'], value=account['balance'])
+            self._record('set', path=bot_path + ['status'], value='stopped')
+            self._append_history(bot_path + ['performance_history'], bot_to_stop, record)
+            self._record('set', path=bot_path + ['liquidation_value'], value=liquidation_value)
         
         print(f"Bot {bot_id} stopped. {liquidation_value} USD returned to balance.")
-        self.save_accounts()
         return True
         
     def resume_bot(self, user_id, bot_id):
@@ -176,7 +314,7 @@ class VirtualAccountManager:
         if not account:
             return False
             
-        bot_to_resume = next((bot for bot in account['bots'] if bot['bot_id'] == bot_id), None)
+        bot_to_resume = self._find_bot(user_id, bot_id)
         
         if not bot_to_resume:
             return False
@@ -190,43 +328,54 @@ class VirtualAccountManager:
         # Check if account has enough balance
         if account['balance'] < allocation:
             return False, f"Insufficient balance to resume bot. Required: ${allocation}, Available: ${account['balance']}"
-            
-        # Deduct funds from balance
-        account['balance'] -= allocation
         
-        # Get current prices for proper asset allocation
+        # Get current prices for proper asset allocation (before any funds move)
         prices = self._get_current_prices()
         if not prices:
             return False, "Unable to get current prices for asset allocation."
         
-        # Get allocation weights and convert to actual amounts
-        allocation_weights = self._get_initial_allocation(bot_to_resume['strategy'])
-        bot_to_resume['assets'] = {}
-        
-        # Purchase assets according to weights with proper conversion
-        for asset, weight in allocation_weights.items():
-            if asset in prices and prices[asset] > 0:
-                # Calculate USD value for this asset
-                usd_value = allocation * weight
-                # Convert to actual cryptocurrency amount
-                crypto_amount = usd_value / prices[asset]
-                bot_to_resume['assets'][asset] = crypto_amount
-        
-        # Update bot status
-        bot_to_resume['status'] = 'active'
-        bot_to_resume['resumed_at'] = time.time()
-        
-        # Record resume event in performance history
-        bot_to_resume['performance_history'].append({
-            'timestamp': time.time(),
-            'value': allocation,
-            'event': 'resumed',
-            'pnl': 0,
-            'pnl_percent': 0
-        })
+        with self._lock:
+            if bot_to_resume['status'] != 'stopped' or account['balance'] < allocation:
+                return False, "Bot was resumed or the balance spent while prices were fetched."
+            
+            # Deduct funds from balance
+            account['balance'] -= allocation
+            
+            # Get allocation weights and convert to actual amounts
+            allocation_weights = self._get_initial_allocation(bot_to_resume['strategy'])
+            bot_to_resume['assets'] = {}
+            
+            # Purchase assets according to weights with proper conversion
+            for asset, weight in allocation_weights.items():
+                if asset in prices and prices[asset] > 0:
+                    # Calculate USD value for this asset
+                    usd_value = allocation * weight
+                    # Convert to actual cryptocurrency amount
+                    crypto_amount = usd_value / prices[asset]
+                    bot_to_resume['assets'][asset] = crypto_amount
+            
+            # Update bot status
+            self._set_bot_status(bot_to_resume, 'active')
+            bot_to_resume['resumed_at'] = time.time()
+            
+            # Record resume event in performance history
+            record = {
+                'timestamp': time.time(),
+                'value': allocation,
+                'event': 'resumed',
+                'pnl': 0,
+                'pnl_percent': 0
+            }
+            
+            bot_path = [user_id, 'bots', bot_id]
+            self._record('set', path=[user_id, 'balance'], value=account['balance'])
+            self._record('set', path=bot_path + ['assets'], value=bot_to_resume['assets'])
+            self._record('set', path=bot_path + ['status'], value='active')
+            self._record('set', path=bot_path + ['resumed_at'], value=bot_to_resume['resumed_at'])
+            self._append_history(bot_path + ['performance_history'], bot_to_resume, record)
+        self.drift_scheduler.mark_due((user_id, bot_id), (user_id, bot_to_resume))
         
         print(f"Bot {bot_id} resumed for user {user_id} with {allocation} USD.")
-        self.save_accounts()
         return True
 
     def delete_bot(self, user_id, bot_id):
@@ -235,7 +384,7 @@ class VirtualAccountManager:
         if not account:
             return False
             
-        bot_to_delete = next((bot for bot in account['bots'] if bot['bot_id'] == bot_id), None)
+        bot_to_delete = self._find_bot(user_id, bot_id)
         
         if not bot_to_delete:
             return False, "Bot not found."
@@ -243,16 +392,19 @@ class VirtualAccountManager:
         if bot_to_delete['status'] != 'stopped':
             return False, "Bot must be stopped before deletion."
             
-        account['bots'] = [bot for bot in account['bots'] if bot['bot_id'] != bot_id]
+        with self._lock:
+            account['bots'].remove(bot_to_delete)  # In place; no other bot's list entry moves or is copied
+            self._unindex_bot(bot_to_delete)
+            self._record('remove_bot', user_id=user_id, bot_id=bot_id)
+        self.drift_scheduler.forget((user_id, bot_id))
         
         print(f"Bot {bot_id} deleted permanently for user {user_id}.")
-        self.save_accounts()
         return True
 
     def execute_virtual_trade(self, user_id, bot_id, asset, action, amount, price):
         """Executes a virtual trade and updates the portfolio."""
         account = self.get_account(user_id)
-        bot = next((b for b in account['bots'] if b['bot_id'] == bot_id), None)
+        bot = self._find_bot(user_id, bot_id)
         
         if not account or not bot:
             return
@@ -270,23 +422,26 @@ class VirtualAccountManager:
             'value': trade_value,
             'timestamp': time.time()
         }
-        account['trade_history'].append(trade)
-        
-        # Update portfolio
-        if action.upper() == 'BUY':
-            bot['assets'][asset] = bot['assets'].get(asset, 0) + amount
-        elif action.upper() == 'SELL':
-            if bot['assets'].get(asset, 0) < amount:
-                print(f"Warning: Attempted to sell more {asset} than available.")
-                # Sell what's available
-                amount = bot['assets'].get(asset, 0)
+        with self._lock:
+            account['trade_history'].append(trade)
+            self._record('append', path=[user_id, 'trade_history'], value=trade)
             
-            bot['assets'][asset] = bot['assets'].get(asset, 0) - amount
-            if bot['assets'][asset] <= 0:
-                del bot['assets'][asset]
+            # Update portfolio
+            if action.upper() in ('BUY', 'SELL'):
+                if action.upper() == 'BUY':
+                    bot['assets'][asset] = bot['assets'].get(asset, 0) + amount
+                else:
+                    if bot['assets'].get(asset, 0) < amount:
+                        print(f"Warning: Attempted to sell more {asset} than available.")
+                        # Sell what's available
+                        amount = bot['assets'].get(asset, 0)
+                    
+                    bot['assets'][asset] = bot['assets'].get(asset, 0) - amount
+                    if bot['assets'][asset] <= 0:
+                        del bot['assets'][asset]
+                self._record('set', path=[user_id, 'bots', bot_id, 'assets'], value=bot['assets'])
         
         print(f"Trade executed for bot {bot_id}: {action} {amount} {asset} at ${price}")
-        self.save_accounts()
 
     def _start_price_updates(self):
         """Start background thread to update prices periodically."""
@@ -303,26 +458,25 @@ class VirtualAccountManager:
                 print(f"Error in price update worker: {e}")
                 time.sleep(10)  # Wait a bit before retrying
     
-    def _update_all_portfolios(self):
+    def _update_all_portfolios(self, prices=None):
         """Update values for all portfolios."""
         if not self.accounts:
             return
             
         # Get current prices
-        prices = self._get_current_prices()
         if not prices:
-            return
+            prices = self._get_current_prices()
+            if not prices:
+                return
             
         current_time = time.time()
         
-        for user_id, account in self.accounts.items():
-            # Update each active bot
-            total_portfolio_value = account['balance']
-            
-            for bot in account['bots']:
-                if bot['status'] != 'active':
-                    continue
-                    
+        # Portfolio values are recorded as set ops; repeated sets of a bot's value
+        # coalesce in the persistence scheduler, so a pass costs one write per flush.
+        with self._lock:
+            # Only active bots are valued; their values are summed per account
+            bot_values = {}
+            for user_id, bot in self.bots_by_status['active'].values():
                 # Calculate current portfolio value
                 portfolio_value = 0
                 for asset, amount in bot['assets'].items():
@@ -331,74 +485,65 @@ class VirtualAccountManager:
                         portfolio_value += asset_value
                 
                 # Update bot portfolio value
-                bot['portfolio_value'] = portfolio_value
+                self._set_portfolio_value(user_id, bot, portfolio_value)
                 
                 # Add to performance history (every hour)
                 if not bot['performance_history'] or (current_time - bot['performance_history'][-1]['timestamp']) > 3600:
                     # Correctly calculate PnL based on initial investment
                     pnl = portfolio_value - bot['allocated_fund']
                     pnl_percent = ((portfolio_value / bot['allocated_fund']) - 1) * 100 if bot['allocated_fund'] > 0 else 0
-                    bot['performance_history'].append({
+                    record = {
                         'timestamp': current_time,
                         'value': portfolio_value,
                         'pnl': pnl,
                         'pnl_percent': pnl_percent
-                    })
+                    }
+                    self._append_history([user_id, 'bots', bot['bot_id'], 'performance_history'], bot, record)
                 
-                total_portfolio_value += portfolio_value
+                bot_values[user_id] = bot_values.get(user_id, 0) + portfolio_value
             
-            # Update account performance history (every hour)
-            if not account['performance_history'] or (current_time - account['performance_history'][-1]['timestamp']) > 3600:
-                # Include total initial investment for accurate PnL calculation
-                total_initial_investment = account.get('initial_balance', 100000)
-                account['performance_history'].append({
-                    'timestamp': current_time,
-                    'balance': account['balance'],
-                    'portfolio_value': total_portfolio_value - account['balance'],
-                    'total_value': total_portfolio_value,
-                    'total_initial': total_initial_investment,
-                    'pnl': total_portfolio_value - total_initial_investment,
-                    'pnl_percent': ((total_portfolio_value / total_initial_investment) - 1) * 100 if total_initial_investment > 0 else 0
-                })
-          # Save accounts after updating
-        self.save_accounts()
-        
+            for user_id, account in self.accounts.items():
+                # Update account performance history (every hour)
+                if not account['performance_history'] or (current_time - account['performance_history'][-1]['timestamp']) > 3600:
+                    total_portfolio_value = account['balance'] + bot_values.get(user_id, 0)
+                    # Include total initial investment for accurate PnL calculation
+                    total_initial_investment = account.get('initial_balance', 100000)
+                    self.append_performance(user_id, {
+                        'timestamp': current_time,
+                        'balance': account['balance'],
+                        'portfolio_value': total_portfolio_value - account['balance'],
+                        'total_value': total_portfolio_value,
+                        'total_initial': total_initial_investment,
+                        'pnl': total_portfolio_value - total_initial_investment,
+                        'pnl_percent': ((total_portfolio_value / total_initial_investment) - 1) * 100 if total_initial_investment > 0 else 0
+                    })
+    
+    def append_performance(self, user_id, record):
+        """Add a snapshot to an account's performance history."""
+        with self._lock:
+            self._append_history([user_id, 'performance_history'], self.accounts[user_id], record)
+        
+        
+    def _tracked_tokens(self):
+        """Tokens with a fallback price plus every asset an active bot currently holds."""
+        tokens = set(self.token_registry.fallback_prices())
+        with self._lock:
+            for _, bot in self.bots_by_status['active'].values():
+                tokens.update(bot['assets'].keys())
+        return sorted(tokens)
+
     def _get_current_prices(self):
         """Get current cryptocurrency prices with proper fallbacks."""
-        try:
-            # Try to get real prices from CoinGecko API
-            url = "https://api.coingecko.com/api/v3/simple/price"
-            params = {
-                "ids": "bitcoin,ethereum,cardano,polkadot,usd-coin",
-                "vs_currencies": "usd"
-            }
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                prices = {
-                    'BTC': data.get('bitcoin', {}).get('usd', 109400),
-                    'ETH': data.get('ethereum', {}).get('usd', 2675),
-                    'ADA': data.get('cardano', {}).get('usd', 0.70),
-                    'DOT': data.get('polkadot', {}).get('usd', 4.12),
-                    'USDC': data.get('usd-coin', {}).get('usd', 1)
-                }
-                return prices
-            else:
-                # API failed - use fallback prices
-                print(f"API failed with status {response.status_code}, using fallback prices")
-                
-        except Exception as e:
-            print(f"Error fetching prices: {e}, using fallback prices")
-            
-        # Use current realistic fallback prices instead of outdated ones
-        fallback_prices = {
-            'BTC': 109400,  # Updated from 45000
-            'ETH': 2675,    # Updated from 3000  
-            'ADA': 0.70,    # Updated from 1.2
-            'DOT': 4.12,    # Updated from 25
-            'USDC': 1.00
-        }
+        tokens = self._tracked_tokens()
+        fallback_prices = self.token_registry.fallback_prices(tokens)
+        
+        # Batched simple/price requests via the shared token registry
+        prices = self.token_registry.fetch_prices(tokens)
+        if prices:
+            # Tokens missing from the response keep their fallback price
+            return {**fallback_prices, **prices}
+        
+        print("Error fetching prices, using fallback prices")
         
         # Add slight variation to simulate market movement (±0.5%)
         prices = {}
@@ -409,7 +554,12 @@ class VirtualAccountManager:
         return prices
 
     def update_bot_portfolios(self, rebalance_engine, signal_generator, prices=None):
-        """Periodically updates all active bots based on their strategies."""
+        """Periodically updates active bots based on their strategies.
+
+        Bots are pulled from the drift scheduler, so a tick only evaluates the
+        bots whose band prices may have crossed since their last check; the
+        others are revalued by _update_all_portfolios.
+        """
         if not self.accounts:
             return
             
@@ -417,77 +567,99 @@ class VirtualAccountManager:
             prices = self._get_current_prices()
             if not prices:
                 return
-            
-        for user_id, account in self.accounts.items():
-            if not account.get('bots'):
+        
+        # Signals are shared by every bot in this tick - generate them once
+        signals = signal_generator.generate_signals()
+        signals_version = getattr(signal_generator, 'signals_version', None)
+
+        # Only bots that prices may have pushed out of their drift band need a recommendation.
+        # A new signals or covariance version changes every target, so all bots are checked again.
+        covariance = getattr(rebalance_engine, 'covariance', None)
+        epoch = (signals_version, covariance.version if covariance is not None else None)
+        if self.drift_scheduler.advance(prices, epoch) or signals_version is None:
+            with self._lock:
+                candidates = [((user_id, bot_id), (user_id, bot))
+                              for bot_id, (user_id, bot) in self.bots_by_status['active'].items()]
+        else:
+            candidates = self.drift_scheduler.pop_due()
+
+        # All bots' trades go through one book so opposing flows cross before execution
+        book = OrderNettingBook(rebalance_engine.planner)
+        rebalancing = []
+        evaluated = 0
+
+        for key, (user_id, bot) in candidates:
+            if bot['status'] != 'active':
                 continue
+            evaluated += 1
+
+            print(f"Updating portfolio for bot {bot.get('bot_id')}...")
+            current_weights, total_value = self._bot_weights(bot, prices)
+            
+            # Fetch a recommendation for the bot's strategy (one strategy evaluation, memoized per signals version)
+            recommendation = rebalance_engine.get_rebalance_recommendation(
+                current_weights,
+                signals,
+                prices,
+                risk_profile=bot['risk_profile'],
+                strategy=bot['strategy'],
+                signals_version=signals_version
+            )
 
-            for bot in account['bots']:
-                if bot['status'] != 'active':
+            # Even if not rebalancing, update portfolio value based on current prices
+            with self._lock:
+                if self.bots.get(bot['bot_id'], (None, None))[1] is bot and bot['status'] == 'active':
+                    self._set_portfolio_value(user_id, bot, total_value)
+            target_weights = (recommendation or {}).get('target_weights') or {}
+            targets = {asset: weight / 100 for asset, weight in target_weights.items()}
+
+            if recommendation and recommendation.get('recommendation') == 'REBALANCE' and total_value > 0:
+                # Plan trades back inside the drift bands at the bot's current market value
+                plan = rebalance_engine.generate_rebalance_plan(
+                    current_weights, target_weights, prices, total_value=total_value)
+                if plan:
+                    book.add(key, plan)
+                    rebalancing.append((key, user_id, bot, targets))
                     continue
 
-                print(f"Updating portfolio for bot {bot.get('bot_id')}...")
-                
-                # Create a representation of the bot's current portfolio weights
-                current_weights = {}
-                total_value = 0
-                
-                # Calculate current total value
-                for asset, amount in bot['assets'].items():
-                    if asset in prices:
-                        asset_value = amount * prices[asset]
-                        total_value += asset_value
-                
-                # Calculate weights
-                if total_value > 0:
-                    for asset, amount in bot['assets'].items():
-                        if asset in prices:
-                            asset_value = amount * prices[asset]
-                            current_weights[asset] = asset_value / total_value
-                
-                # Fetch a recommendation for the bot's strategy
-                recommendation = rebalance_engine.get_rebalance_recommendation(
-                    current_weights,
-                    signal_generator.generate_signals(),
-                    prices,
-                    risk_profile=bot['risk_profile']
-                )
+            if targets:
+                self.drift_scheduler.schedule(key, current_weights, targets, (user_id, bot))
+            else:
+                self.drift_scheduler.mark_due(key, (user_id, bot))  # No usable targets, try again next tick
 
-                if recommendation and recommendation.get('recommendation') == 'REBALANCE':
-                    # Perform rebalancing - use allocated_fund instead of corrupted total_value to prevent astronomical amounts
-                    target_weights = recommendation['target_weights']
-                    self._rebalance_bot_portfolio(user_id, bot, current_weights, target_weights, prices, bot['allocated_fund'])
-                    
-                    # Update bot portfolio value to actual calculated value (no artificial impacts)
-                    recalculated_value = 0
-                    for asset, amount in bot['assets'].items():
-                        if asset in prices:
-                            recalculated_value += amount * prices[asset]
-                    bot['portfolio_value'] = recalculated_value
-                    
-                    # Log a trade for history with actual portfolio value
-                    self.execute_virtual_trade(user_id, bot['bot_id'], 'Portfolio', 'REBALANCE', 1, bot['portfolio_value'])
-                else:
-                    # Even if not rebalancing, update portfolio value based on current prices
-                    bot['portfolio_value'] = total_value
-        
-        # Save accounts after updating
-        self.save_accounts()
-    
-    def _rebalance_bot_portfolio(self, user_id, bot, current_weights, target_weights, prices, total_value):
-        """Rebalance a bot's portfolio according to target weights."""
-        if not prices or total_value <= 0:
-            return
-            
-        # Clear current assets
-        bot['assets'] = {}
-        
-        # Allocate according to target weights
-        for asset, weight in target_weights.items():
-            if asset in prices and prices[asset] > 0:
-                target_value = total_value * weight
-                amount = target_value / prices[asset]
-                if amount > 0:
-                    bot['assets'][asset] = amount
-                    
-        print(f"Rebalanced portfolio for bot {bot['bot_id']}") 
\ No newline at end of file
+        # Cross opposing trades between bots; only the net per asset reaches execution
+        fills, self.last_netting_stats = book.settle()
+        for key, user_id, bot, targets in rebalancing:
+            with self._lock:
+                # The bot may have been stopped or deleted while the tick was planning
+                entry = self.bots.get(bot['bot_id'])
+                if entry is None or entry[1] is not bot or bot['status'] != 'active':
+                    continue
+                self._rebalance_bot_portfolio(bot, fills[key], prices)
+                self._record('set', path=[user_id, 'bots', bot['bot_id'], 'assets'], value=bot['assets'])
+                self._set_portfolio_value(user_id, bot, bot['portfolio_value'])
+            self.drift_scheduler.schedule(key, self._bot_weights(bot, prices)[0], targets, (user_id, bot))
+
+            # Log a trade for history with actual portfolio value
+            self.execute_virtual_trade(user_id, bot['bot_id'], 'Portfolio', 'REBALANCE', 1, bot['portfolio_value'])
+
+        print(f"📋 Checked {evaluated} bots near their drift band, {len(self.drift_scheduler)} waiting on prices")
+        if rebalancing:
+            stats = self.last_netting_stats
+            print(f"🔁 Netted {stats['orders']} orders from {stats['bots']} bots into {stats['execution_orders']} "
+                  f"(crossed ${stats['crossed_value']:,.2f}, saved ${stats['cost_saved']:,.2f} in costs)")
+
+    def _bot_weights(self, bot, prices):
+        """Current weights (fractions of the priced holdings) and market value of a bot"""
+        values = {asset: amount * prices[asset] for asset, amount in bot['assets'].items() if asset in prices}
+        total_value = sum(values.values())
+        if total_value <= 0:
+            return {}, total_value
+        return {asset: value / total_value for asset, value in values.items()}, total_value
+
+    def _rebalance_bot_portfolio(self, bot, fills, prices):
+        """Apply a bot's netted fills and revalue it (no artificial impacts)."""
+        bot['assets'] = RebalancePlanner.apply_trades(bot['assets'], fills)
+        bot['portfolio_value'] = sum(amount * prices[asset] for asset, amount in bot['assets'].items()
+                                     if asset in prices)
+        print(f"Rebalanced portfolio for bot {bot['bot_id']}")
\ No newline at end of file
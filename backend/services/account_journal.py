@@ -0,0 +1,297 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# An op is {'op': <name>, ...}; see apply_op for the vocabulary
+Op = Dict[str, Any]
+
+
+def encode_op(op: Op) -> str:
+    """Compact JSON of an op, as journaled (encoding also freezes the values it references)"""
+    return json.dumps(op, separators=(',', ':'))
+
+
+# History lists: records are never changed once appended (rollups splice in new ones)
+HISTORY_KEYS = ('performance_history', 'trade_history')
+
+
+def snapshot_copy(node: Any) -> Any:
+    """Copy of everything in an accounts tree that is mutated in place, sharing the history records.
+
+    Balances, bot fields and asset amounts change in place, so dicts and
+    lists are copied; history lists only need a copy of their record
+    pointers. Cheap enough to take under the account lock, so the JSON
+    encoding can run outside it.
+    """
+    if isinstance(node, dict):
+        return {key: list(value) if key in HISTORY_KEYS and isinstance(value, list) else snapshot_copy(value)
+                for key, value in node.items()}
+    if isinstance(node, list):
+        return [snapshot_copy(item) for item in node]
+    return node
+
+
+def _resolve(accounts: Dict[str, Any], path: List[Any]):
+    """Container holding the last path element; list steps (an account's bots) match by bot_id.
+
+    Raises KeyError when a step no longer exists (e.g. the bot was removed).
+    """
+    node = accounts
+    for step in path[:-1]:
+        if isinstance(node, list):
+            node = next((item for item in node if item.get('bot_id') == step), None)
+            if node is None:
+                raise KeyError(step)
+        else:
+            node = node[step]
+    return node
+
+
+def apply_op(accounts: Dict[str, Any], op: Op) -> bool:
+    """Apply one journaled mutation to an accounts dict; False if its target no longer exists.
+
+    create_account  {'user_id', 'account'}      new account
+    add_bot         {'user_id', 'bot'}          append to the account's bots
+    remove_bot      {'user_id', 'bot_id'}       drop a bot
+    set             {'path', 'value'}           assign, e.g. path [user_id, 'bots', bot_id, 'status']
+    append          {'path', 'value'}           append to the list at path, e.g. a performance_history
+    splice          {'path', 'start', 'stop', 'value'}  replace list[start:stop] with value, e.g. a rollup
+
+    An op aimed at an account or bot that is gone (say a tick's fill
+    recorded after the bot was deleted) is logged and skipped, so one
+    stale record can't abort a whole recovery.
+    """
+    kind = op['op']
+    try:
+        if kind == 'create_account':
+            accounts[op['user_id']] = op['account']
+        elif kind == 'add_bot':
+            accounts[op['user_id']]['bots'].append(op['bot'])
+        elif kind == 'remove_bot':
+            account = accounts[op['user_id']]
+            account['bots'] = [bot for bot in account['bots'] if bot['bot_id'] != op['bot_id']]
+        elif kind == 'set':
+            _resolve(accounts, op['path'])[op['path'][-1]] = op['value']
+        elif kind == 'append':
+            _resolve(accounts, op['path']).setdefault(op['path'][-1], []).append(op['value'])
+        elif kind == 'splice':
+            _resolve(accounts, op['path'])[op['path'][-1]][op['start']:op['stop']] = op['value']
+        else:
+            raise ValueError(f"Unknown journal op: {kind}")
+    except KeyError as e:
+        logger.warning(f"Skipping {kind} op {op.get('seq', '')}: {e} no longer exists")
+        return False
+    return True
+
+
+class AccountJournal:
+    """Write-ahead journal of account mutations next to a periodic JSON snapshot.
+
+    The snapshot stays the plain accounts dict in ``data_file``. Every
+    mutation is appended to ``<data_file>.journal`` as one JSON line with
+    an increasing ``seq`` and written through to the OS immediately, so a
+    process crash loses nothing; fsync is batched every ``fsync_interval``
+    seconds (an OS crash can lose at most that window). Once the journal
+    holds ``compact_records`` records the background worker writes a new
+    snapshot and keeps only the journal tail after it.
+
+    ``<data_file>.meta`` lists the (seq, sha1) of the last two snapshots and
+    is written before the snapshot is swapped in, so recovery can tell
+    which journal records a snapshot on disk already contains whichever
+    step of a compaction was interrupted.
+    """
+
+    def __init__(self, data_file: str, source: Callable[[], Dict[str, Any]], lock, fsync_interval: float = 0.05,
+                 compact_records: int = 20000):
+        self.data_file = data_file
+        self.journal_file = f"{data_file}.journal"
+        self.meta_file = f"{data_file}.meta"
+        self.source = source  # Live accounts dict, read under lock when compacting
+        self.lock = lock  # Held by every mutation together with its append()
+        self.fsync_interval = fsync_interval
+        self.compact_records = compact_records
+        self.seq = 0
+        self.records = 0  # Journal records since the last snapshot
+        self.stats = {'appended': 0, 'fsyncs': 0, 'compactions': 0, 'replayed': 0, 'skipped': 0}
+        self._io_lock = threading.Lock()
+        self._compact_lock = threading.Lock()  # One compaction at a time (worker, save_accounts, exit)
+        self._handle = None
+        self._unsynced = False
+        self._compact_requested = threading.Event()
+        self._closed = threading.Event()
+        self._worker = None
+        self.before_snapshot = None  # Called under lock before a snapshot is taken, e.g. to write buffered ops
+        atexit.register(self.close)
+
+    # Recovery
+
+    def _read_meta(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.meta_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def load(self) -> Dict[str, Any]:
+        """Snapshot plus the journal records it doesn't contain yet"""
+        accounts, snapshot_seq = {}, 0
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'rb') as f:
+                raw = f.read()
+            accounts = json.loads(raw)
+            meta = self._read_meta()
+            digest = hashlib.sha1(raw).hexdigest()
+            match = next((entry for entry in meta if entry['sha1'] == digest), None)
+            if match is not None:
+                snapshot_seq = match['seq']
+            elif meta:
+                logger.warning("Account snapshot doesn't match its metadata, replaying the journal after it")
+                snapshot_seq = max(entry['seq'] for entry in meta)
+
+        self.seq, self.records = snapshot_seq, 0
+        if os.path.exists(self.journal_file):
+            valid_bytes = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Dropping a torn record at the end of {self.journal_file}")
+                        break
+                    valid_bytes += len(line)
+                    self.records += 1
+                    if op['seq'] > snapshot_seq:
+                        self.seq = op['seq']
+                        if apply_op(accounts, op):
+                            self.stats['replayed'] += 1
+                        else:
+                            self.stats['skipped'] += 1
+            if valid_bytes < os.path.getsize(self.journal_file):
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_bytes)
+        return accounts
+
+    # Appending
+
+    def _open(self):
+        if self._handle is None:
+            os.makedirs(os.path.dirname(self.journal_file) or '.', exist_ok=True)
+            self._handle = open(self.journal_file, 'ab')
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+        return self._handle
+
+    def append(self, op: Op) -> int:
+        """Journal one mutation (call with self.lock held, right after applying it)"""
+        return self.append_batch([op])
+
+    def append_batch(self, ops: List[Op]) -> int:
+        """Journal several mutations with a single write; returns the last seq"""
+        return self.append_encoded([encode_op(op) for op in ops])
+
+    def append_encoded(self, payloads: List[str]) -> int:
+        """append_batch for ops already encoded with encode_op"""
+        if not payloads:
+            return self.seq
+        with self._io_lock:
+            lines = []
+            for payload in payloads:
+                self.seq += 1
+                lines.append(f'{{"seq":{self.seq},{payload[1:]}')
+            handle = self._open()
+            handle.write(('\n'.join(lines) + '\n').encode())
+            handle.flush()  # Survives a process crash; fsync follows within fsync_interval
+            self._unsynced = True
+            self.records += len(payloads)
+            self.stats['appended'] += len(payloads)
+            seq = self.seq
+        if self.records >= self.compact_records:
+            self._compact_requested.set()
+        return seq
+
+    def sync(self):
+        """fsync everything appended so far"""
+        with self._io_lock:
+            if self._handle is not None and self._unsynced:
+                os.fsync(self._handle.fileno())
+                self._unsynced = False
+                self.stats['fsyncs'] += 1
+
+    def _run(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self.sync()
+                if self._compact_requested.is_set():
+                    self._compact_requested.clear()
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Account journal worker error: {e}")
+
+    # Compaction
+
+    @staticmethod
+    def _write_durably(path: str, data: bytes):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def compact(self):
+        """Write a snapshot of the live accounts and drop the journal records it contains"""
+        with self._compact_lock:
+            self._compact()
+
+    def _compact(self):
+        # Only the structural copy holds up mutations; encoding and writing happen after the lock is released
+        with self.lock:
+            if self.before_snapshot is not None:
+                self.before_snapshot()
+            accounts = snapshot_copy(self.source())
+            with self._io_lock:
+                seq = self.seq
+                offset = self._handle.tell() if self._handle is not None else 0
+        snapshot = json.dumps(accounts, indent=2).encode()
+
+        os.makedirs(os.path.dirname(self.data_file) or '.', exist_ok=True)
+        meta = self._read_meta()[-1:] + [{'seq': seq, 'sha1': hashlib.sha1(snapshot).hexdigest()}]
+        self._write_durably(self.meta_file, json.dumps(meta).encode())
+        self._write_durably(self.data_file, snapshot)
+
+        # Keep only what was appended while the snapshot was being written
+        with self._io_lock:
+            tail = b''
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+                with open(self.journal_file, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+            self._write_durably(self.journal_file, tail)
+            self.records = tail.count(b'\n')
+            self._unsynced = False
+            self.stats['compactions'] += 1
+
+    def close(self):
+        """Stop the worker and leave a fresh snapshot with an empty journal"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            if self.records:
+                self.compact()
+            self.sync()
+        except Exception as e:
+            logger.error(f"Error closing the account journal: {e}")
+        with self._io_lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
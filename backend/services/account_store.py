@@ -0,0 +1,351 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.account_journal import AccountJournal, Op
+
+logger = logging.getLogger(__name__)
+
+# Fields kept in real (queryable) columns; anything else a record carries goes to its `extra` JSON
+ACCOUNT_COLUMNS = ('account_id', 'balance', 'initial_balance', 'created_at')
+BOT_COLUMNS = ('strategy', 'risk_profile', 'status', 'allocated_fund', 'portfolio_value', 'created_at')
+TRADE_COLUMNS = ('trade_id', 'bot_id', 'asset', 'action', 'amount', 'price', 'value', 'timestamp')
+PERFORMANCE_COLUMNS = ('timestamp', 'value', 'balance', 'portfolio_value', 'total_value', 'pnl', 'pnl_percent')
+
+# List fields of an account or bot that live in their own table
+CHILD_LISTS = ('bots', 'trade_history', 'performance_history')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS accounts (
+    user_id TEXT PRIMARY KEY,
+    {', '.join(f'{column} {"TEXT" if column == "account_id" else "REAL"}' for column in ACCOUNT_COLUMNS)},
+    extra TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE TABLE IF NOT EXISTS bots (
+    bot_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES accounts(user_id),
+    position INTEGER NOT NULL,
+    strategy TEXT, risk_profile REAL, status TEXT, allocated_fund REAL, portfolio_value REAL, created_at REAL,
+    extra TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE INDEX IF NOT EXISTS bots_by_user ON bots(user_id, position);
+CREATE INDEX IF NOT EXISTS bots_by_status ON bots(status);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    trade_id TEXT, bot_id TEXT, asset TEXT, action TEXT, amount REAL, price REAL, value REAL, timestamp REAL,
+    extra TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE INDEX IF NOT EXISTS trades_by_user ON trades(user_id, timestamp);
+CREATE INDEX IF NOT EXISTS trades_by_bot ON trades(bot_id, timestamp);
+CREATE TABLE IF NOT EXISTS performance (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    bot_id TEXT,
+    timestamp REAL, value REAL, balance REAL, portfolio_value REAL, total_value REAL, pnl REAL, pnl_percent REAL,
+    extra TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE INDEX IF NOT EXISTS performance_by_bot ON performance(bot_id, timestamp);
+CREATE INDEX IF NOT EXISTS performance_by_user ON performance(user_id, bot_id, timestamp);
+"""
+
+
+def _split(record: Dict[str, Any], columns: Tuple[str, ...], skip: Tuple[str, ...] = ()) -> Tuple[List[Any], str]:
+    """Column values plus the extra JSON for everything else (explicit None values stay in extra)"""
+    values = [record.get(column) for column in columns]
+    extra = {key: value for key, value in record.items()
+             if key not in skip and (key not in columns or value is None)}
+    return values, json.dumps(extra, separators=(',', ':'))
+
+
+def _join(row: sqlite3.Row, columns: Tuple[str, ...], **fields) -> Dict[str, Any]:
+    record = dict(fields)
+    record.update((column, row[column]) for column in columns if row[column] is not None)
+    record.update(json.loads(row['extra']))
+    return record
+
+
+class SQLiteAccountStore:
+    """Accounts in SQLite: accounts, bots, trades and performance snapshots in their own indexed tables.
+
+    Drop-in for AccountJournal: the manager keeps working on its in-memory
+    accounts dict and hands every mutation op to ``append``, which applies
+    it to the tables in one transaction. The database runs in WAL mode with
+    synchronous=NORMAL, so a commit survives a process crash without an
+    fsync and readers never block the writer. Bots' last-N-hours
+    performance and the active bots are indexed reads (``bot_performance``,
+    ``active_bots``). JSON stays the import/export format: an empty
+    database imports ``json_file`` on first load.
+    """
+
+    def __init__(self, db_file: str, json_file: Optional[str] = None):
+        self.db_file = db_file
+        self.json_file = json_file
+        self.stats = {'appended': 0, 'imported': 0, 'checkpoints': 0}
+        self._write_lock = threading.Lock()
+        self._local = threading.local()  # One read connection per thread; WAL readers don't block the writer
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._closed = False
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # Writing
+
+    def _insert_account(self, conn: sqlite3.Connection, user_id: str, account: Dict[str, Any]):
+        values, extra = _split(account, ACCOUNT_COLUMNS, skip=('user_id',) + CHILD_LISTS)
+        conn.execute(f"INSERT INTO accounts (user_id, {', '.join(ACCOUNT_COLUMNS)}, extra) "
+                     f"VALUES (?{', ?' * len(ACCOUNT_COLUMNS)}, ?)", [user_id, *values, extra])
+        for bot in account.get('bots', []):
+            self._insert_bot(conn, user_id, bot)
+        self._insert_records(conn, 'trades', TRADE_COLUMNS, user_id, None, account.get('trade_history', []))
+        self._insert_records(conn, 'performance', PERFORMANCE_COLUMNS, user_id, None,
+                             account.get('performance_history', []))
+
+    def _insert_bot(self, conn: sqlite3.Connection, user_id: str, bot: Dict[str, Any]):
+        position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM bots WHERE user_id = ?",
+                                (user_id,)).fetchone()[0]
+        values, extra = _split(bot, BOT_COLUMNS, skip=('bot_id', 'performance_history'))
+        conn.execute(f"INSERT INTO bots (bot_id, user_id, position, {', '.join(BOT_COLUMNS)}, extra) "
+                     f"VALUES (?, ?, ?{', ?' * len(BOT_COLUMNS)}, ?)", [bot['bot_id'], user_id, position, *values, extra])
+        self._insert_records(conn, 'performance', PERFORMANCE_COLUMNS, user_id, bot['bot_id'],
+                             bot.get('performance_history', []))
+
+    @staticmethod
+    def _insert_records(conn: sqlite3.Connection, table: str, columns: Tuple[str, ...], user_id: str,
+                        bot_id: Optional[str], records: List[Dict[str, Any]]):
+        if not records:
+            return
+        # A trade's bot_id is one of its own columns; performance rows get their owner's
+        owner = ('user_id',) if table == 'trades' else ('user_id', 'bot_id')
+        head = [user_id] if table == 'trades' else [user_id, bot_id]
+        rows = []
+        for record in records:
+            values, extra = _split(record, columns)
+            rows.append([*head, *values, extra])
+        names = owner + columns + ('extra',)
+        conn.executemany(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", rows)
+
+    def _set(self, conn: sqlite3.Connection, path: List[Any], value: Any):
+        if len(path) == 2:
+            user_id, field = path
+            table, key, columns, where = 'accounts', 'user_id', ACCOUNT_COLUMNS, (user_id,)
+            bot_id = None
+        elif len(path) == 4 and path[1] == 'bots':
+            user_id, _, bot_id, field = path
+            table, key, columns, where = 'bots', 'bot_id', BOT_COLUMNS, (bot_id,)
+        else:
+            raise ValueError(f"Unsupported account path: {path}")
+
+        if field in CHILD_LISTS:
+            # Whole list replaced (e.g. a rolled-up history): rewrite that owner's rows
+            if field == 'bots':
+                conn.execute("DELETE FROM performance WHERE user_id = ? AND bot_id IS NOT NULL", (user_id,))
+                conn.execute("DELETE FROM bots WHERE user_id = ?", (user_id,))
+                for bot in value:
+                    self._insert_bot(conn, user_id, bot)
+            elif field == 'trade_history':
+                conn.execute("DELETE FROM trades WHERE user_id = ?", (user_id,))
+                self._insert_records(conn, 'trades', TRADE_COLUMNS, user_id, None, value)
+            else:
+                conn.execute("DELETE FROM performance WHERE user_id = ? AND bot_id IS ?", (user_id, bot_id))
+                self._insert_records(conn, 'performance', PERFORMANCE_COLUMNS, user_id, bot_id, value)
+        elif field in columns and value is not None:
+            conn.execute(f"UPDATE {table} SET {field} = ?, extra = json_remove(extra, ?) WHERE {key} = ?",
+                         (value, f'$."{field}"', *where))
+        else:
+            conn.execute(f"UPDATE {table} SET extra = json_set(extra, ?, json(?)) WHERE {key} = ?",
+                         (f'$."{field}"', json.dumps(value), *where))
+            if field in columns:
+                conn.execute(f"UPDATE {table} SET {field} = NULL WHERE {key} = ?", where)
+
+    @staticmethod
+    def _splice(conn: sqlite3.Connection, path: List[Any], start: int, stop: int, value: List[Dict[str, Any]]):
+        """Replace history rows start:stop (in list order) with fewer rows, reusing their ids to keep the order"""
+        if path[-1] != 'performance_history' or len(path) not in (2, 4):
+            raise ValueError(f"Unsupported account path: {path}")
+        user_id, bot_id = path[0], path[2] if len(path) == 4 else None
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM performance WHERE user_id = ? AND bot_id IS ? ORDER BY id LIMIT ? OFFSET ?",
+            (user_id, bot_id, stop - start, start))]
+        if len(value) > len(ids):
+            raise ValueError("A splice can't grow the stored history")
+        conn.executemany("DELETE FROM performance WHERE id = ?", [(row_id,) for row_id in ids])
+        names = ('id', 'user_id', 'bot_id') + PERFORMANCE_COLUMNS + ('extra',)
+        rows = []
+        for row_id, record in zip(ids, value):
+            values, extra = _split(record, PERFORMANCE_COLUMNS)
+            rows.append([row_id, user_id, bot_id, *values, extra])
+        conn.executemany(f"INSERT INTO performance ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", rows)
+
+    @staticmethod
+    def _require(conn: sqlite3.Connection, table: str, key: str, value: str):
+        """Reject an op whose account or bot is gone (a row for it would be orphaned)"""
+        if conn.execute(f"SELECT 1 FROM {table} WHERE {key} = ?", (value,)).fetchone() is None:
+            raise KeyError(value)
+
+    def _append(self, conn: sqlite3.Connection, path: List[Any], value: Dict[str, Any]):
+        if len(path) == 4:
+            self._require(conn, 'bots', 'bot_id', path[2])
+        else:
+            self._require(conn, 'accounts', 'user_id', path[0])
+        if path[-1] == 'trade_history' and len(path) == 2:
+            self._insert_records(conn, 'trades', TRADE_COLUMNS, path[0], None, [value])
+        elif path[-1] == 'performance_history' and len(path) in (2, 4):
+            self._insert_records(conn, 'performance', PERFORMANCE_COLUMNS, path[0],
+                                 path[2] if len(path) == 4 else None, [value])
+        else:
+            raise ValueError(f"Unsupported account path: {path}")
+
+    def _apply(self, conn: sqlite3.Connection, op: Op):
+        kind = op['op']
+        if kind == 'create_account':
+            self._insert_account(conn, op['user_id'], op['account'])
+        elif kind == 'add_bot':
+            self._insert_bot(conn, op['user_id'], op['bot'])
+        elif kind == 'remove_bot':
+            conn.execute("DELETE FROM performance WHERE bot_id = ?", (op['bot_id'],))
+            conn.execute("DELETE FROM bots WHERE bot_id = ?", (op['bot_id'],))
+        elif kind == 'set':
+            self._set(conn, op['path'], op['value'])
+        elif kind == 'append':
+            self._append(conn, op['path'], op['value'])
+        elif kind == 'splice':
+            self._splice(conn, op['path'], op['start'], op['stop'], op['value'])
+        else:
+            raise ValueError(f"Unknown journal op: {kind}")
+
+    def append(self, op: Op) -> int:
+        """Apply one mutation op (see apply_op) to the tables, committed on return"""
+        return self.append_batch([op])
+
+    def append_encoded(self, payloads: List[str]) -> int:
+        """append_batch for ops encoded with encode_op"""
+        return self.append_batch([json.loads(payload) for payload in payloads])
+
+    def append_batch(self, ops: List[Op]) -> int:
+        """Apply several mutation ops in one transaction"""
+        with self._write_lock, self._conn:
+            self._conn.execute('BEGIN')
+            for op in ops:
+                self._apply(self._conn, op)
+            self.stats['appended'] += len(ops)
+            return self.stats['appended']
+
+    # Reading
+
+    def _read_all(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        accounts = {}
+        for row in conn.execute("SELECT * FROM accounts ORDER BY rowid"):
+            account = _join(row, ACCOUNT_COLUMNS, user_id=row['user_id'])
+            account.update(bots=[], trade_history=[], performance_history=[])
+            accounts[row['user_id']] = account
+        bots = {}
+        for row in conn.execute("SELECT * FROM bots ORDER BY user_id, position"):
+            bot = _join(row, BOT_COLUMNS, bot_id=row['bot_id'])
+            bot['performance_history'] = []
+            accounts[row['user_id']]['bots'].append(bot)
+            bots[row['bot_id']] = bot
+        for row in conn.execute("SELECT * FROM trades ORDER BY id"):
+            accounts[row['user_id']]['trade_history'].append(_join(row, TRADE_COLUMNS))
+        for row in conn.execute("SELECT * FROM performance ORDER BY id"):
+            owner = bots[row['bot_id']] if row['bot_id'] is not None else accounts[row['user_id']]
+            owner['performance_history'].append(_join(row, PERFORMANCE_COLUMNS))
+        return accounts
+
+    def load(self) -> Dict[str, Any]:
+        """All accounts as the manager's nested dict, importing the JSON file into an empty database"""
+        empty = self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM accounts)").fetchone()[0]
+        if empty and self.json_file and os.path.exists(self.json_file):
+            self.import_json(self.json_file)
+        with self._write_lock:
+            return self._read_all(self._conn)
+
+    def bot_performance(self, bot_id: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """A bot's performance snapshots, oldest first, optionally only those at or after `since`"""
+        rows = self._reader().execute(
+            "SELECT * FROM performance WHERE bot_id = ? AND timestamp >= ? ORDER BY timestamp, id",
+            (bot_id, since if since is not None else float('-inf')))
+        return [_join(row, PERFORMANCE_COLUMNS) for row in rows]
+
+    def active_bots(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """(user_id, bot) for every active bot; bots come without their performance history"""
+        rows = self._reader().execute("SELECT * FROM bots WHERE status = 'active' ORDER BY user_id, position")
+        return [(row['user_id'], _join(row, BOT_COLUMNS, bot_id=row['bot_id'])) for row in rows]
+
+    # Import / export
+
+    def import_json(self, path: str) -> int:
+        """Replace the database contents with the accounts in a JSON file; returns how many were imported"""
+        with open(path, 'r') as f:
+            accounts = json.load(f)
+        with self._write_lock, self._conn:
+            self._conn.execute('BEGIN')
+            for table in ('performance', 'trades', 'bots', 'accounts'):
+                self._conn.execute(f"DELETE FROM {table}")
+            for user_id, account in accounts.items():
+                self._insert_account(self._conn, user_id, account)
+        self.stats['imported'] += len(accounts)
+        logger.info(f"Imported {len(accounts)} accounts from {path} into {self.db_file}")
+        return len(accounts)
+
+    def export_json(self, path: str):
+        """Write every account to a JSON file in the format import_json and AccountJournal read"""
+        with self._write_lock:
+            accounts = self._read_all(self._conn)
+        AccountJournal._write_durably(path, json.dumps(accounts, indent=2).encode())
+
+    # Maintenance
+
+    def sync(self):
+        """Checkpoint the WAL into the database file (fsyncs both)"""
+        with self._write_lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.stats['checkpoints'] += 1
+
+    def compact(self):
+        self.sync()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.sync()
+        except sqlite3.Error as e:
+            logger.error(f"Error checkpointing the account database: {e}")
+        with self._write_lock:
+            self._closed = True
+            self._conn.close()
+
+
+def open_account_store(data_file: str, source: Callable[[], Dict[str, Any]], lock, backend: Optional[str] = None):
+    """Storage backend for VirtualAccountManager: 'journal' (JSON snapshot + journal, the default) or 'sqlite'.
+
+    ``backend`` defaults to the ACCOUNT_STORE environment variable. The
+    SQLite database sits next to the JSON file (same name, .db suffix) and
+    imports it the first time it is opened.
+    """
+    backend = (backend or os.environ.get('ACCOUNT_STORE') or 'journal').lower()
+    if backend == 'sqlite':
+        return SQLiteAccountStore(f"{os.path.splitext(data_file)[0]}.db", json_file=data_file)
+    if backend == 'journal':
+        return AccountJournal(data_file, source, lock)
+    raise ValueError(f"Unknown account store: {backend}")
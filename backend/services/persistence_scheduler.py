@@ -0,0 +1,174 @@
+import atexit
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List
+
+from services.account_journal import Op, encode_op
+
+logger = logging.getLogger(__name__)
+
+# The store itself is unavailable (disk, locked database): keep the ops pending and retry
+TRANSIENT_ERRORS = (OSError, sqlite3.OperationalError)
+
+
+class PersistenceScheduler:
+    """Buffers account mutation ops per dirty account and writes them to the store in batches.
+
+    ``record`` encodes the op right away (the values it references keep
+    changing) and appends it to the account's pending ops; a later ``set``
+    of the same path replaces the earlier one, since only the last value
+    matters. A worker writes everything pending as one batch (one journal
+    write or one SQLite transaction) at most once per ``window`` seconds,
+    starting a window after the first change. ``window=0`` writes
+    through on every record. ``close`` (registered with atexit) flushes
+    synchronously, so only a hard crash can lose the last window.
+
+    ``lock`` is the manager lock mutations hold while recording; flushes
+    take it too, so a store snapshot never sees a change that is still
+    waiting to be written.
+
+    If the store rejects a batch, the flush retries it one account and
+    then one op at a time: ops the store rejects on their own are
+    quarantined (logged, counted and kept in ``quarantine``) so the rest
+    still commit and later flushes aren't stuck on them. Only
+    TRANSIENT_ERRORS leave the ops pending for the next flush.
+    """
+
+    def __init__(self, store, lock, window: float = 1.0):
+        self.store = store
+        self.lock = lock
+        self.window = window
+        self._pending: "OrderedDict[str, List[str]]" = OrderedDict()  # user_id -> encoded ops in order
+        self._set_index: Dict[tuple, int] = {}  # (user_id, path) -> position of its latest set op
+        self._dirty = threading.Event()
+        self._closed = threading.Event()
+        self._worker = None
+        self.recorded = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+        self.accounts_flushed = 0
+        self.retries = 0  # Extra store writes made while isolating rejected ops
+        self.quarantined = 0
+        self.quarantine = deque(maxlen=100)  # Latest (encoded op, error) pairs the store rejected
+        if hasattr(store, 'before_snapshot'):
+            store.before_snapshot = self.flush
+        atexit.register(self.close)
+
+    def record(self, op: Op):
+        """Queue one op (call with lock held, right after applying the mutation)"""
+        user_id = op['user_id'] if 'user_id' in op else op['path'][0]
+        payload = encode_op(op)
+        with self.lock:
+            ops = self._pending.setdefault(user_id, [])
+            if op['op'] == 'set':
+                key = (user_id, tuple(op['path']))
+                previous = self._set_index.get(key)
+                if previous is not None:
+                    ops[previous] = None  # Superseded; dropped at flush
+                    self.coalesced += 1
+                self._set_index[key] = len(ops)
+            ops.append(payload)
+            self.recorded += 1
+        if self.window <= 0 or self._closed.is_set():
+            self.flush()
+            return
+        self._dirty.set()
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def flush(self) -> int:
+        """Write every pending op now; returns how many were written"""
+        with self.lock:
+            if not self._pending:
+                self._dirty.clear()
+                return 0
+            ops = [op for account_ops in self._pending.values() for op in account_ops if op is not None]
+            accounts = len(self._pending)
+            try:
+                self.store.append_encoded(ops)  # Under lock: a snapshot can't land between the swap and the write
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                logger.warning(f"Store rejected a batch of {len(ops)} account ops ({e}), isolating the bad ones")
+                ops = self._write_separately()
+            self._pending.clear()
+            self._set_index.clear()
+            self._dirty.clear()
+            self.written += len(ops)
+            self.flushes += 1
+            self.accounts_flushed += accounts
+        return len(ops)
+
+    def _write_separately(self) -> List[str]:
+        """Write pending ops account by account, quarantining single ops the store rejects"""
+        written = []
+        try:
+            for user_id in list(self._pending):
+                account_ops = [op for op in self._pending[user_id] if op is not None]
+                try:
+                    self._write(account_ops)
+                    written += account_ops
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception:
+                    for op in account_ops:
+                        try:
+                            self._write([op])
+                            written.append(op)
+                        except TRANSIENT_ERRORS:
+                            raise
+                        except Exception as e:
+                            logger.error(f"Quarantined an account op the store rejected ({e}): {op}")
+                            self.quarantine.append((op, str(e)))
+                            self.quarantined += 1
+                del self._pending[user_id]  # Written or quarantined; a retry must not write it twice
+        finally:
+            self._set_index = {key: position for key, position in self._set_index.items() if key[0] in self._pending}
+        return written
+
+    def _write(self, ops: List[str]):
+        self.retries += 1
+        self.store.append_encoded(ops)
+
+    @property
+    def pending(self) -> int:
+        with self.lock:
+            return sum(1 for ops in self._pending.values() for op in ops if op is not None)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._dirty.wait()
+            if self._closed.wait(self.window):  # Let the rest of the burst join this batch
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing account changes: {e}")
+                self._closed.wait(self.window)
+
+    def close(self):
+        """Stop the worker and write whatever is pending"""
+        self._closed.set()
+        self._dirty.set()  # Wake the worker so it sees the close
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing account changes on shutdown: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'window_seconds': self.window,
+            'recorded': self.recorded,
+            'written': self.written,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'accounts_flushed': self.accounts_flushed,
+            'pending': self.pending,
+            'quarantined': self.quarantined,
+            # Each flush is one store write where writing through would have made one per op
+            'writes_avoided': self.recorded - self.flushes - self.retries - self.pending - self.quarantined
+        }
@@ -3,28 +3,25 @@ import time
 import logging
 from typing import Dict, List, Optional
 
+from services.token_registry import TokenRegistry
+
 logger = logging.getLogger(__name__)
 
+# CoinGecko's market_chart resolution for 2-90 day ranges; coarser stores would thin the charts
+CHART_BAR_INTERVAL = 3600
+
 class PriceService:
-    def __init__(self):
+    def __init__(self, price_store=None, token_registry=None):
         self.base_url = "https://api.coingecko.com/api/v3"
+        self.price_store = price_store  # Optional PriceHistoryStore (hourly bars) for historical data
+        self.token_registry = token_registry or TokenRegistry()
         self.cache = {}
         self.cache_timeout = 60  # Cache prices for 60 seconds
         self.last_update = 0
         
     def _get_coin_id(self, token: str) -> str:
         """Map token symbols to CoinGecko IDs"""
-        token_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'ADA': 'cardano',
-            'DOT': 'polkadot',
-            'USDC': 'usd-coin',
-            'SOL': 'solana',
-            'AVAX': 'avalanche-2',
-            'DOGE': 'dogecoin'
-        }
-        return token_map.get(token.upper(), token.lower())
+        return self.token_registry.coin_id(token)
     
     def get_latest_prices(self, tokens: List[str]) -> Dict[str, float]:
         """Get latest prices for multiple tokens"""
@@ -34,41 +31,18 @@ class PriceService:
         if current_time - self.last_update < self.cache_timeout:
             return {token: self.cache.get(token, 0.0) for token in tokens}
         
-        try:
-            # Convert tokens to CoinGecko IDs
-            coin_ids = [self._get_coin_id(token) for token in tokens]
-            ids_param = ','.join(coin_ids)
-            
-            # Make API request
-            url = f"{self.base_url}/simple/price"
-            params = {
-                'ids': ids_param,
-                'vs_currencies': 'usd'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            # Process response
-            data = response.json()
-            prices = {}
-            
-            for token in tokens:
-                coin_id = self._get_coin_id(token)
-                if coin_id in data:
-                    prices[token] = data[coin_id]['usd']
-                    self.cache[token] = data[coin_id]['usd']
-            
-            self.last_update = current_time
-            return prices
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching prices: {e}")
+        # One simple/price request per chunk of ids; failed chunks are logged and skipped
+        prices = self.token_registry.fetch_prices(tokens)
+        if not prices:
             # Return cached prices if available, otherwise return 0
             return {token: self.cache.get(token, 0.0) for token in tokens}
+        
+        self.cache.update(prices)
+        self.last_update = current_time
+        return prices
     
-    def get_historical_data(self, token: str, days: int = 7) -> Dict:
-        """Get historical price data for a token"""
+    def _fetch_market_chart(self, token: str, days: int) -> Optional[Dict]:
+        """Fetch a CoinGecko market_chart payload, or None on failure"""
         try:
             coin_id = self._get_coin_id(token)
             url = f"{self.base_url}/coins/{coin_id}/market_chart"
@@ -79,18 +53,27 @@ class PriceService:
             
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
-            
-            data = response.json()
-            return {
-                'prices': data['prices'],
-                'market_caps': data['market_caps'],
-                'total_volumes': data['total_volumes']
-            }
+            return response.json()
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching historical data: {e}")
+            return None
+    
+    def get_historical_data(self, token: str, days: int = 7) -> Dict:
+        """Get historical price data for a token"""
+        if self.price_store is not None and self.price_store.bar_interval <= CHART_BAR_INTERVAL:
+            rows = self.price_store.get_history(token, days, self._fetch_market_chart)
+            return self.price_store.to_market_chart(rows)
+        
+        data = self._fetch_market_chart(token, days)
+        if not data:
             return {
                 'prices': [],
                 'market_caps': [],
                 'total_volumes': []
-            } 
\ No newline at end of file
+            }
+        return {
+            'prices': data['prices'],
+            'market_caps': data['market_caps'],
+            'total_volumes': data['total_volumes']
+        }
@@ -0,0 +1,233 @@
+import math
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# A fetcher takes (token, days) and returns a CoinGecko market_chart payload or None
+MarketChartFetcher = Callable[[str, int], Optional[Dict]]
+
+
+class PriceHistoryStore:
+    """Persistent per-token bar history, stored as raw float64 rows and read through memory maps.
+
+    Each token lives in ``<root>/<TOKEN>.f8`` (``<TOKEN>.<n>.f8`` after
+    its n-th backfill) with one row per bar:
+    (bar timestamp, price, market cap, total volume). Reads are zero-copy
+    views of the mapped file; top-ups only request the bars after the last
+    one on disk and append them. A read asking for more days than are
+    stored fetches the whole range once and backfills the head (the file
+    is rewritten and swapped in, so open views stay valid). Reads and
+    fetches are sized in days; ``bar_interval`` sets how many bars a day
+    holds (daily bars for signals, hourly ones for charts).
+    """
+
+    COLUMNS = ('timestamp', 'price', 'market_cap', 'total_volume')
+
+    def __init__(self, root: Optional[str] = None, bar_interval: int = DAY, refresh_interval: int = 300):
+        # Daily bars keep the original directory; other bar sizes get their own
+        default_dir = 'price_history' if bar_interval == DAY else f'price_history_{bar_interval}s'
+        self.root = root or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', default_dir)
+        self.bar_interval = bar_interval
+        self.refresh_interval = refresh_interval  # Minimum seconds between top-ups of the forming bar
+        self._maps = {}
+        self._generations = {}  # token -> generation of its current file
+        self._last_refresh = {}
+        self._backfilled = {}  # token -> most days a head backfill already asked upstream for
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _file(self, token: str, generation: int) -> str:
+        name = f"{token}.f8" if generation == 0 else f"{token}.{generation}.f8"
+        return os.path.join(self.root, name)
+
+    def _generation(self, token: str) -> int:
+        """Current file generation for a token, found on disk the first time it is asked for"""
+        token = token.upper()
+        if token not in self._generations:
+            found = []
+            for name in os.listdir(self.root):
+                stem = name[:-3] if name.endswith('.f8') else None
+                if stem == token:
+                    found.append(0)
+                elif stem and stem.startswith(f"{token}.") and stem[len(token) + 1:].isdigit():
+                    found.append(int(stem[len(token) + 1:]))
+            self._generations[token] = max(found, default=0)
+            for generation in found:
+                if generation < self._generations[token]:
+                    self._discard(self._file(token, generation))
+        return self._generations[token]
+
+    def _path(self, token: str) -> str:
+        return self._file(token.upper(), self._generation(token))
+
+    @staticmethod
+    def _discard(path: str):
+        """Delete a superseded file; one still mapped somewhere (Windows) is left for a later open"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _lock(self, token: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(token.upper(), threading.Lock())
+
+    def bar_timestamp(self, ts: float) -> float:
+        return float(int(ts // self.bar_interval) * self.bar_interval)
+
+    def bars(self, days: int) -> int:
+        """Number of bars in a window of `days`"""
+        return max(1, int(round(days * DAY / self.bar_interval)))
+
+    def read(self, token: str) -> np.ndarray:
+        """All stored bars for a token as an (n, 4) read-only memory-mapped view"""
+        token = token.upper()
+        cached = self._maps.get(token)
+        if cached is not None:
+            return cached
+
+        path = self._path(token)
+        row_bytes = len(self.COLUMNS) * 8
+        if not os.path.exists(path) or os.path.getsize(path) < row_bytes:
+            return np.empty((0, len(self.COLUMNS)))
+
+        rows = os.path.getsize(path) // row_bytes
+        view = np.memmap(path, dtype=np.float64, mode='r', shape=(rows, len(self.COLUMNS)))
+        self._maps[token] = view
+        return view
+
+    def _write(self, token: str, rows: np.ndarray, overwrite_last: bool):
+        """Append rows, optionally replacing the last stored bar first"""
+        path = self._path(token)
+        self._maps.pop(token.upper(), None)  # Invalidate the old mapping; the file size changes
+        row_bytes = len(self.COLUMNS) * 8
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            if overwrite_last:
+                f.seek(-row_bytes, os.SEEK_END)
+            else:
+                f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+
+    def _replace(self, token: str, rows: np.ndarray):
+        """Rewrite a token's history into its next file generation (bars were added before the first stored one).
+
+        Views handed out earlier may still map the current file, and Windows
+        refuses to replace or delete a mapped file, so the rows go to a new
+        file that later reads switch to; the old one is removed if nothing
+        holds it.
+        """
+        token = token.upper()
+        old_path = self._path(token)
+        generation = self._generation(token) + 1
+        path = self._file(token, generation)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+        os.replace(tmp, path)  # Nothing maps the new generation yet
+        self._generations[token] = generation
+        self._maps.pop(token, None)
+        self._discard(old_path)
+
+    def _to_rows(self, data: Dict) -> np.ndarray:
+        """Bucket a market_chart payload into one row per bar (last sample in a bar wins)"""
+        caps = {int(ts): value for ts, value in data.get('market_caps', [])}
+        volumes = {int(ts): value for ts, value in data.get('total_volumes', [])}
+
+        bars = {}
+        for ts, price in data.get('prices', []):
+            if price is None:
+                continue
+            bar = self.bar_timestamp(ts / 1000)
+            bars[bar] = (bar, price, caps.get(int(ts), np.nan), volumes.get(int(ts), np.nan))
+
+        if not bars:
+            return np.empty((0, len(self.COLUMNS)))
+        return np.array([bars[bar] for bar in sorted(bars)], dtype=np.float64)
+
+    def top_up(self, token: str, fetch: MarketChartFetcher, days: int) -> bool:
+        """Fetch only the bars missing from the last `days`; returns False if the upstream call failed"""
+        stored = self.read(token)
+        now = time.time()
+        current_bar = self.bar_timestamp(now)
+        first_bar = last_bar = None
+        backfill = False
+
+        if len(stored):
+            first_bar, last_bar = stored[0, 0], stored[-1, 0]
+            # Fewer days stored than asked for; upstream may simply not have more, so only ask once per range
+            backfill = (first_bar > current_bar - (self.bars(days) - 1) * self.bar_interval
+                        and days > self._backfilled.get(token.upper(), 0))
+            if backfill:
+                fetch_days = days  # One request covers both the head and the tail
+            elif last_bar >= current_bar and now - self._last_refresh.get(token.upper(), 0) < self.refresh_interval:
+                return True  # Up to date, and the forming bar was refreshed recently
+            else:
+                # Include the last stored bar so it gets its final (closing) value
+                fetch_days = min(days, math.ceil((current_bar - last_bar + self.bar_interval) / DAY))
+        else:
+            fetch_days = days
+
+        data = fetch(token, max(1, fetch_days))
+        if not data:
+            return False
+
+        rows = self._to_rows(data)
+        if backfill or last_bar is None:
+            self._backfilled[token.upper()] = days
+        if backfill:
+            head = rows[rows[:, 0] < first_bar]
+            tail = rows[rows[:, 0] >= last_bar]
+            if len(head):
+                kept = np.array(stored[:-1] if len(tail) and tail[0, 0] == last_bar else stored)
+                self._replace(token, np.vstack([head, kept, tail]))
+                logger.info(f"Stored {len(head)} earlier and {len(tail)} new bars for {token} (backfill)")
+                self._last_refresh[token.upper()] = now
+                return True
+            rows = tail
+        elif last_bar is not None:
+            rows = rows[rows[:, 0] >= last_bar]
+        if len(rows):
+            overwrite_last = last_bar is not None and rows[0, 0] == last_bar
+            self._write(token, rows, overwrite_last)
+            logger.info(f"Stored {len(rows)} bars for {token} ({'top-up' if last_bar is not None else 'initial load'})")
+        self._last_refresh[token.upper()] = now
+        return True
+
+    def get_history(self, token: str, days: int, fetch: Optional[MarketChartFetcher] = None) -> np.ndarray:
+        """The bars covering the last `days` for a token, topped up from upstream first when a fetcher is given.
+
+        If the upstream call fails the stored (possibly stale) bars are served.
+        """
+        with self._lock(token):
+            if fetch is not None:
+                try:
+                    self.top_up(token, fetch, days)
+                except Exception as e:
+                    logger.error(f"Price history top-up failed for {token}: {e}")
+            return self.read(token)[-self.bars(days):]
+
+    def to_frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """DataFrame with a 'price' column indexed by bar time"""
+        return pd.DataFrame(
+            {'price': rows[:, 1]},
+            index=pd.to_datetime(rows[:, 0], unit='s').rename('timestamp')
+        )
+
+    def to_market_chart(self, rows: np.ndarray) -> Dict[str, List]:
+        """Stored bars in CoinGecko market_chart shape ([ms, value] pairs)"""
+        ms = (rows[:, 0] * 1000).tolist()
+        return {
+            'prices': [list(pair) for pair in zip(ms, rows[:, 1].tolist())],
+            'market_caps': [list(pair) for pair in zip(ms, rows[:, 2].tolist())],
+            'total_volumes': [list(pair) for pair in zip(ms, rows[:, 3].tolist())]
+        }
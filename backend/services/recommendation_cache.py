@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A computer takes (risk_profile, current_weights) and returns a recommendation
+RecommendationComputer = Callable[[int, Dict[str, float]], Any]
+
+
+class RecommendationCache:
+    """Rebalance recommendations keyed by (risk profile bucket, current weights, signals version).
+
+    Risk profiles are snapped to the nearest multiple of ``bucket_size``
+    (clamped to 0-100) and computed at that profile, so the whole slider
+    range maps onto a small set of entries that can all be warmed after a
+    refresh. Concurrent requests for the same missing key share one
+    computation. ``publish`` drops everything when new market data lands.
+    """
+
+    def __init__(self, bucket_size: int = 5, max_entries: int = 256):
+        self.bucket_size = bucket_size
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by publish so computations started before it aren't stored
+        self.signals_version = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.warmed = 0
+
+    def bucket(self, risk_profile: float) -> int:
+        """Representative profile of the bucket a risk profile falls in"""
+        profile = min(100, max(0, risk_profile))
+        return int(min(100, round(profile / self.bucket_size) * self.bucket_size))
+
+    def profiles(self) -> range:
+        """Every bucket's representative profile"""
+        return range(0, 101, self.bucket_size)
+
+    @staticmethod
+    def weights_key(current_weights: Dict[str, float]) -> Hashable:
+        # Asset order is part of the key: target weights follow it
+        return tuple(current_weights.items())
+
+    def key(self, risk_profile: float, current_weights: Dict[str, float], signals_version: Any) -> Tuple:
+        return self.bucket(risk_profile), self.weights_key(current_weights), signals_version
+
+    def publish(self, signals_version: Any = None):
+        """New market data: drop every entry and ignore computations still running on the old data"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.signals_version = signals_version
+
+    def put(self, risk_profile: float, current_weights: Dict[str, float], signals_version: Any, recommendation: Any):
+        with self._lock:
+            self._store(self.key(risk_profile, current_weights, signals_version), recommendation)
+
+    def _store(self, key: Tuple, recommendation: Any):
+        self._entries[key] = recommendation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, risk_profile: float, current_weights: Dict[str, float], signals_version: Any,
+            compute: RecommendationComputer) -> Any:
+        """Cached recommendation, computing it (once, however many callers ask at the same time) on a miss"""
+        key = self.key(risk_profile, current_weights, signals_version)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            recommendation = compute(key[0], dict(current_weights))
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if generation == self._generation:
+                self._store(key, recommendation)
+            self._inflight.pop(key, None)
+        future.set_result(recommendation)
+        return recommendation
+
+    def warm(self, current_weights: Dict[str, float], signals_version: Any, compute: RecommendationComputer,
+             profiles: Optional[Iterable[int]] = None) -> int:
+        """Fill the cache for every bucket (or the given profiles); returns how many were computed"""
+        computed = 0
+        for profile in profiles if profiles is not None else self.profiles():
+            with self._lock:
+                cached = self.key(profile, current_weights, signals_version) in self._entries
+            if cached:
+                continue
+            try:
+                self.get(profile, current_weights, signals_version, compute)
+                computed += 1
+            except Exception as e:
+                logger.warning(f"Warming the risk profile {profile} recommendation failed: {e}")
+        with self._lock:
+            self.warmed += computed
+        return computed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'warmed': self.warmed,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'signals_version': self.signals_version
+            }
@@ -0,0 +1,129 @@
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+# Symbol -> (CoinGecko id, fallback USD price used when the API is unreachable)
+DEFAULT_TOKENS = {
+    'BTC': ('bitcoin', 109400),
+    'ETH': ('ethereum', 2675),
+    'ADA': ('cardano', 0.70),
+    'DOT': ('polkadot', 4.12),
+    'USDC': ('usd-coin', 1.00),
+    'SOL': ('solana', None),
+    'AVAX': ('avalanche-2', None),
+    'DOGE': ('dogecoin', None)
+}
+
+
+class TokenRegistry:
+    """Shared symbol <-> CoinGecko id map with batched spot-price requests.
+
+    The signal, price and account paths all resolve ids here instead of
+    keeping their own maps. fetch_prices packs up to ``chunk_size`` ids into
+    each simple/price call, so a 500-token universe costs two requests.
+    """
+
+    def __init__(self, tokens: Optional[Dict[str, tuple]] = None, base_url: str = COINGECKO_API,
+                 chunk_size: int = 250, timeout: int = 10):
+        self.base_url = base_url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._ids = {}
+        self._symbols = {}
+        self._fallback_prices = {}
+        self._lock = threading.Lock()
+        for symbol, (coin_id, fallback_price) in (tokens or DEFAULT_TOKENS).items():
+            self.register(symbol, coin_id, fallback_price)
+
+    def register(self, symbol: str, coin_id: str, fallback_price: Optional[float] = None):
+        """Add or update a token; the last registration of a symbol wins"""
+        symbol = symbol.upper()
+        with self._lock:
+            self._ids[symbol] = coin_id
+            self._symbols[coin_id] = symbol
+            if fallback_price is not None:
+                self._fallback_prices[symbol] = fallback_price
+
+    def coin_id(self, symbol: str) -> str:
+        """CoinGecko id for a symbol (unknown symbols fall back to the lower-cased symbol)"""
+        return self._ids.get(symbol.upper(), symbol.lower())
+
+    def symbol(self, coin_id: str) -> Optional[str]:
+        return self._symbols.get(coin_id)
+
+    def symbols(self) -> List[str]:
+        return list(self._ids.keys())
+
+    def fallback_prices(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Known fallback prices for the given symbols (default: all registered)"""
+        symbols = self.symbols() if symbols is None else [s.upper() for s in symbols]
+        return {s: self._fallback_prices[s] for s in symbols if s in self._fallback_prices}
+
+    def load_top_markets(self, count: int = 500, vs_currency: str = 'usd') -> Dict[str, float]:
+        """Register the top `count` coins by market cap (250 per call) and return their prices.
+
+        Symbols that are already registered keep their mapping, so tickers
+        shared by several coins resolve to the larger one.
+        """
+        prices = {}
+        per_page = 250
+        for page in range(1, (count + per_page - 1) // per_page + 1):
+            try:
+                response = requests.get(f"{self.base_url}/coins/markets", params={
+                    'vs_currency': vs_currency,
+                    'order': 'market_cap_desc',
+                    'per_page': min(per_page, count - (page - 1) * per_page),
+                    'page': page
+                }, timeout=self.timeout)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error loading market list page {page}: {e}")
+                break
+
+            for coin in response.json():
+                symbol = coin['symbol'].upper()
+                if symbol not in self._ids:
+                    self.register(symbol, coin['id'])
+                if self.coin_id(symbol) == coin['id'] and coin.get('current_price') is not None:
+                    prices[symbol] = coin['current_price']
+
+        logger.info(f"Token registry holds {len(self._ids)} tokens")
+        return prices
+
+    def fetch_prices(self, symbols: Iterable[str], vs_currency: str = 'usd') -> Dict[str, float]:
+        """Spot prices for many symbols with one simple/price request per chunk of ids.
+
+        Symbols missing from the response (or from a failed chunk) are left
+        out; callers decide how to fall back.
+        """
+        by_id = {}
+        for symbol in symbols:
+            by_id.setdefault(self.coin_id(symbol), []).append(symbol)
+        ids = list(by_id.keys())
+
+        prices = {}
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            try:
+                response = requests.get(f"{self.base_url}/simple/price", params={
+                    'ids': ','.join(chunk),
+                    'vs_currencies': vs_currency
+                }, timeout=self.timeout)
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching prices for {len(chunk)} tokens: {e}")
+                continue
+
+            for coin_id in chunk:
+                price = data.get(coin_id, {}).get(vs_currency)
+                if price is not None:
+                    for symbol in by_id[coin_id]:
+                        prices[symbol] = price
+        return prices
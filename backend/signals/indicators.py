@@ -0,0 +1,261 @@
+import math
+from collections import deque
+
+import numpy as np
+
+DEFAULT_WINDOWS = {'mean_reversion': 14, 'momentum': 14, 'volatility': 14, 'breakout': 20}
+DEFAULT_SCORE_WEIGHTS = {'mean_reversion': 0.3, 'momentum': 0.3, 'volatility': 0.2, 'breakout': 0.2}
+
+
+def mean_reversion_signal(current_price, sma):
+    """Map price deviation from its SMA to a mean reversion signal"""
+    deviation = (current_price - sma) / sma
+
+    if deviation > 0.05:  # 5% above SMA
+        return -1  # Overbought, likely to revert down
+    elif deviation < -0.05:  # 5% below SMA
+        return 1   # Oversold, likely to revert up
+    else:
+        return deviation * 10  # Scaled signal between -0.5 and 0.5
+
+
+def relative_strength_index(avg_gain, avg_loss):
+    """RSI from average gain/loss, with the same zero-loss guard as the pandas path"""
+    if avg_loss == 0:
+        avg_loss = 0.0001  # Avoid division by zero
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def momentum_signal(last_rsi):
+    """Convert RSI to signal (-1 to 1)"""
+    if np.isnan(last_rsi):
+        return 0
+
+    if last_rsi > 70:
+        return -1  # Overbought
+    elif last_rsi < 30:
+        return 1   # Oversold
+    else:
+        return (50 - last_rsi) / 20  # Scaled signal
+
+
+def volatility_signal(current_vol):
+    """Map daily return volatility to a risk signal"""
+    if np.isnan(current_vol):
+        return 0
+
+    # Higher volatility = higher risk = negative signal
+    # Lower volatility = lower risk = positive signal
+    if current_vol > 0.05:  # High volatility (5%+ daily)
+        return -1
+    elif current_vol < 0.01:  # Very low volatility (1% daily)
+        return 1
+    else:
+        return (0.03 - current_vol) / 0.02  # Scaled signal
+
+
+def breakout_signal(current_price, current_sma, current_std):
+    """Map price position relative to the Bollinger Bands to a breakout signal"""
+    current_upper = current_sma + 2 * current_std
+    current_lower = current_sma - 2 * current_std
+
+    if np.isnan(current_upper) or np.isnan(current_lower):
+        return 0
+
+    if current_price > current_upper:
+        return 1   # Bullish breakout
+    elif current_price < current_lower:
+        return -1  # Bearish breakdown
+    else:
+        # Position within bands (-1 to 1)
+        band_position = (current_price - current_sma) / (current_upper - current_sma)
+        return max(-1, min(1, band_position))
+
+
+class RollingWindow:
+    """Fixed-size window with O(1) push and running mean/variance (sliding Welford)"""
+
+    RESYNC_INTERVAL = 1000  # Recompute from scratch periodically to stop float drift
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._nonzero = 0  # Values != 0 in the window, so an all-zero window is exactly 0
+        self._same_run = 0  # Trailing run of identical values, so a flat window has exactly 0 std
+        self._run_before_last = 0  # _same_run as it was before the newest value, for replace_last
+        self._pushes = 0
+
+    @property
+    def full(self):
+        return len(self.values) >= self.size
+
+    def push(self, value):
+        value = float(value)
+        self._run_before_last = self._same_run
+        if self.values and value == self.values[-1]:
+            self._same_run += 1
+        else:
+            self._same_run = 1
+        if value != 0:
+            self._nonzero += 1
+
+        if len(self.values) < self.size:
+            self.values.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(self.values)
+            self._m2 += delta * (value - self.mean)
+        else:
+            old = self.values.popleft()
+            self.values.append(value)
+            if old != 0:
+                self._nonzero -= 1
+            old_mean = self.mean
+            self.mean += (value - old) / self.size
+            self._m2 += (value - old) * (value - self.mean + old - old_mean)
+
+        self._pushes += 1
+        if self._pushes % self.RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def replace_last(self, value):
+        """Swap the newest value for another in O(1), e.g. when a forming bar is repriced"""
+        value = float(value)
+        old = self.values[-1]
+        self.values[-1] = value
+        self._nonzero += (value != 0) - (old != 0)
+        if len(self.values) > 1 and value == self.values[-2]:
+            self._same_run = self._run_before_last + 1
+        else:
+            self._same_run = 1
+
+        old_mean = self.mean
+        self.mean += (value - old) / len(self.values)
+        self._m2 += (value - old) * (value - self.mean + old - old_mean)
+
+        self._pushes += 1
+        if self._pushes % self.RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def _resync(self):
+        n = len(self.values)
+        self.mean = math.fsum(self.values) / n
+        self._m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+
+    def current_mean(self):
+        if self._nonzero == 0:
+            return 0.0
+        if self._same_run >= len(self.values):
+            return self.values[-1]
+        return self.mean
+
+    def current_std(self):
+        """Sample standard deviation (ddof=1), matching pandas rolling().std()"""
+        n = len(self.values)
+        if n < 2:
+            return float('nan')
+        if self._same_run >= n:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (n - 1))
+
+
+class IndicatorState:
+    """Incremental per-token indicator state: O(1) update per new price bar.
+
+    Produces the same signals as SignalGenerator.calculate_mean_reversion,
+    calculate_momentum, calculate_volatility and calculate_breakout over the
+    full history, without rebuilding pandas rolling windows.
+    """
+
+    def __init__(self, windows=None):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.count = 0
+        self.last_price = None
+        self.last_timestamp = None
+        self.prev_price = None  # The bar before the latest, which replace() keeps
+        self.prev_timestamp = None
+        self._sma = RollingWindow(self.windows['mean_reversion'])
+        self._gains = RollingWindow(self.windows['momentum'])
+        self._losses = RollingWindow(self.windows['momentum'])
+        self._returns = RollingWindow(self.windows['volatility'])
+        self._bands = RollingWindow(self.windows['breakout'])
+
+    @classmethod
+    def from_series(cls, prices, windows=None):
+        """Seed a state from a price series (timestamps taken from its index)"""
+        state = cls(windows)
+        for timestamp, price in zip(prices.index, prices.values):
+            state.update(price, timestamp)
+        return state
+
+    def update(self, price, timestamp=None):
+        """Push one new price bar"""
+        price = float(price)
+        if self.last_price is not None:
+            delta = price - self.last_price
+            self._gains.push(max(delta, 0.0))
+            self._losses.push(max(-delta, 0.0))
+            self._returns.push(price / self.last_price - 1)
+
+        self._sma.push(price)
+        self._bands.push(price)
+        self.prev_price, self.prev_timestamp = self.last_price, self.last_timestamp
+        self.last_price = price
+        self.last_timestamp = timestamp
+        self.count += 1
+
+    def replace(self, price, timestamp=None):
+        """Reprice the latest bar (it was still forming when pushed) in O(1)"""
+        if self.count == 0:
+            return self.update(price, timestamp)
+        price = float(price)
+        if self.prev_price is not None:
+            delta = price - self.prev_price
+            self._gains.replace_last(max(delta, 0.0))
+            self._losses.replace_last(max(-delta, 0.0))
+            self._returns.replace_last(price / self.prev_price - 1)
+
+        self._sma.replace_last(price)
+        self._bands.replace_last(price)
+        self.last_price = price
+        self.last_timestamp = timestamp
+
+    def mean_reversion(self):
+        if self.count < self.windows['mean_reversion']:
+            return 0
+        return mean_reversion_signal(np.float64(self.last_price), np.float64(self._sma.current_mean()))
+
+    def rsi(self):
+        if self.count <= self.windows['momentum']:
+            return float('nan')
+        return relative_strength_index(np.float64(self._gains.current_mean()), np.float64(self._losses.current_mean()))
+
+    def momentum(self):
+        if self.count <= self.windows['momentum']:
+            return 0
+        return momentum_signal(self.rsi())
+
+    def volatility(self):
+        if self.count <= self.windows['volatility']:
+            return 0
+        return volatility_signal(np.float64(self._returns.current_std()))
+
+    def breakout(self):
+        if self.count <= self.windows['breakout']:
+            return 0
+        return breakout_signal(
+            np.float64(self.last_price),
+            np.float64(self._bands.current_mean()),
+            np.float64(self._bands.current_std())
+        )
+
+    def signals(self):
+        """Raw (uncleaned) signal values for the latest bar"""
+        return {
+            'mean_reversion': self.mean_reversion(),
+            'momentum': self.momentum(),
+            'volatility': self.volatility(),
+            'breakout': self.breakout()
+        }
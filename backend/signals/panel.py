@@ -0,0 +1,190 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from signals.indicators import DEFAULT_WINDOWS, DEFAULT_SCORE_WEIGHTS
+
+SIGNAL_KEYS = ('mean_reversion', 'momentum', 'volatility', 'breakout')
+MIN_BARS = 20  # generate_signals falls back to default signals below this much history
+
+
+# Signal mappings, shared by the last-bar and full-history paths
+
+def _mean_reversion_from(price, sma):
+    deviation = (price - sma) / sma
+    return np.where(deviation > 0.05, -1.0, np.where(deviation < -0.05, 1.0, deviation * 10))
+
+
+def _momentum_from(avg_gain, avg_loss):
+    avg_loss = np.where(avg_loss == 0, 0.0001, avg_loss)  # Avoid division by zero
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    signal = np.where(rsi > 70, -1.0, np.where(rsi < 30, 1.0, (50 - rsi) / 20))
+    return np.where(np.isnan(rsi), 0.0, signal)
+
+
+def _volatility_from(vol):
+    signal = np.where(vol > 0.05, -1.0, np.where(vol < 0.01, 1.0, (0.03 - vol) / 0.02))
+    return np.where(np.isnan(vol), 0.0, signal)
+
+
+def _breakout_from(price, sma, std):
+    upper = sma + 2 * std
+    lower = sma - 2 * std
+    position = (price - sma) / (upper - sma)
+    # A flat window gives 0/0; the scalar path's max(-1, min(1, nan)) resolves that to 1
+    position = np.where(np.isnan(position), 1.0, np.clip(position, -1, 1))
+    signal = np.where(price > upper, 1.0, np.where(price < lower, -1.0, position))
+    return np.where(np.isnan(upper) | np.isnan(lower), 0.0, signal)
+
+
+def _combine(raw, weights):
+    """Clean raw signals and derive total_score and ml_confidence (works for any array shape)"""
+    # Clean signals: NaN/inf -> 0, clamp between -2 and 2
+    signals = {key: np.clip(np.where(np.isfinite(values), values, 0.0), -2, 2) for key, values in raw.items()}
+
+    total_score = sum(signals[key] * weights[key] for key in weights.keys())
+
+    # ML confidence: higher when signals agree and are strong
+    stacked = np.stack([signals[key] for key in SIGNAL_KEYS], axis=-1)
+    alignment_bonus = np.maximum(0, 0.25 - stacked.std(axis=-1))
+    strength_bonus = np.minimum(0.15, np.abs(stacked.mean(axis=-1)) * 0.1)
+    ml_confidence = np.clip(0.7 + alignment_bonus + strength_bonus, 0.3, 0.95)
+
+    return {**signals, 'total_score': total_score, 'ml_confidence': ml_confidence}
+
+
+def compute_panel_signals(panel, windows=None, weights=None):
+    """Compute all four signals, total_score and ml_confidence for every row of a tokens x bars panel.
+
+    Returns a dict of 1-D arrays (one entry per token), matching what
+    SignalGenerator.generate_signals computes token by token.
+    """
+    windows = windows or DEFAULT_WINDOWS
+    weights = weights or DEFAULT_SCORE_WEIGHTS
+    panel = np.asarray(panel, dtype=float)
+    n_tokens, n_bars = panel.shape
+    price = panel[:, -1]
+    zeros = np.zeros(n_tokens)
+
+    raw = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = windows['mean_reversion']
+        raw['mean_reversion'] = _mean_reversion_from(price, panel[:, -w:].mean(axis=1)) if n_bars >= w else zeros
+
+        w = windows['momentum']
+        if n_bars > w:
+            delta = np.diff(panel[:, -(w + 1):], axis=1)
+            raw['momentum'] = _momentum_from(np.clip(delta, 0, None).mean(axis=1),
+                                             np.clip(-delta, 0, None).mean(axis=1))
+        else:
+            raw['momentum'] = zeros
+
+        w = windows['volatility']
+        if n_bars > w:
+            tail = panel[:, -(w + 1):]
+            raw['volatility'] = _volatility_from((tail[:, 1:] / tail[:, :-1] - 1).std(axis=1, ddof=1))
+        else:
+            raw['volatility'] = zeros
+
+        w = windows['breakout']
+        if n_bars > w:
+            tail = panel[:, -w:]
+            raw['breakout'] = _breakout_from(price, tail.mean(axis=1), tail.std(axis=1, ddof=1))
+        else:
+            raw['breakout'] = zeros
+
+    return _combine(raw, weights)
+
+
+class RollingStats:
+    """Full-history rolling intermediates for a price panel, memoized per window.
+
+    Every array is tokens x bars and holds, at bar t, the statistic over the
+    window ending at t (NaN where the window isn't complete yet). Grid
+    searches that revisit a window size reuse the cached arrays.
+    """
+
+    def __init__(self, panel):
+        self.panel = np.asarray(panel, dtype=float)
+        self._cache = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.delta = np.diff(self.panel, axis=1)
+            self.returns = self.panel[:, 1:] / self.panel[:, :-1] - 1
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @staticmethod
+    def _rolling(values, window, reducer, offset):
+        """Apply reducer over trailing windows; result at bar t covers values ending at t"""
+        n_tokens, n_bars = values.shape[0], values.shape[1] + offset
+        out = np.full((n_tokens, n_bars), np.nan)
+        if values.shape[1] >= window:
+            out[:, window - 1 + offset:] = reducer(sliding_window_view(values, window, axis=1))
+        return out
+
+    def sma(self, window):
+        return self._memo(('sma', window), lambda: self._rolling(self.panel, window, lambda v: v.mean(axis=-1), 0))
+
+    def std(self, window):
+        return self._memo(('std', window),
+                          lambda: self._rolling(self.panel, window, lambda v: v.std(axis=-1, ddof=1), 0))
+
+    def avg_gain(self, window):
+        return self._memo(('gain', window), lambda: self._rolling(
+            np.clip(self.delta, 0, None), window, lambda v: v.mean(axis=-1), 1))
+
+    def avg_loss(self, window):
+        return self._memo(('loss', window), lambda: self._rolling(
+            np.clip(-self.delta, 0, None), window, lambda v: v.mean(axis=-1), 1))
+
+    def return_vol(self, window):
+        return self._memo(('vol', window), lambda: self._rolling(
+            self.returns, window, lambda v: v.std(axis=-1, ddof=1), 1))
+
+    def raw_signals(self, windows):
+        """Uncleaned signal histories, zero wherever the scalar path's length guard would return 0"""
+        return self._memo(('raw',) + tuple(sorted(windows.items())), lambda: self._raw_signals(windows))
+
+    def _raw_signals(self, windows):
+        panel = self.panel
+        n_bars = panel.shape[1]
+        bar_count = np.arange(1, n_bars + 1)[None, :]
+
+        def guarded(values, enough):
+            return np.where(enough, values, 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = windows['mean_reversion']
+            mean_reversion = guarded(_mean_reversion_from(panel, self.sma(w)), bar_count >= w)
+            w = windows['momentum']
+            momentum = guarded(_momentum_from(self.avg_gain(w), self.avg_loss(w)), bar_count > w)
+            w = windows['volatility']
+            volatility = guarded(_volatility_from(self.return_vol(w)), bar_count > w)
+            w = windows['breakout']
+            breakout = guarded(_breakout_from(panel, self.sma(w), self.std(w)), bar_count > w)
+
+        return {'mean_reversion': mean_reversion, 'momentum': momentum,
+                'volatility': volatility, 'breakout': breakout}
+
+
+def compute_signal_history(panel, windows=None, weights=None, stats=None):
+    """Signals for every token at every bar, using only data up to that bar.
+
+    Returns a dict of tokens x bars arrays with the same keys as
+    compute_panel_signals. Bars with less than MIN_BARS of history carry
+    generate_signals' default signals. Pass a RollingStats to share rolling
+    intermediates between calls.
+    """
+    windows = windows or DEFAULT_WINDOWS
+    weights = weights or DEFAULT_SCORE_WEIGHTS
+    stats = stats or RollingStats(panel)
+
+    history = _combine(stats.raw_signals(windows), weights)
+
+    warmup = np.arange(stats.panel.shape[1]) < MIN_BARS - 1
+    for key in SIGNAL_KEYS + ('total_score',):
+        history[key][:, warmup] = 0.0
+    history['ml_confidence'][:, warmup] = 0.5
+    return history
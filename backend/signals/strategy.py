@@ -4,31 +4,110 @@ import requests
 import random
 import time
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
+from signals.indicators import (
+    DEFAULT_WINDOWS, DEFAULT_SCORE_WEIGHTS, IndicatorState,
+    mean_reversion_signal, momentum_signal, volatility_signal, breakout_signal
+)
+from signals.panel import SIGNAL_KEYS, compute_panel_signals
+from services.synthetic_market import SyntheticMarket
+from services.token_registry import TokenRegistry
+
+# Base prices for realistic simulation
+MOCK_BASE_PRICES = {
+    'BTC': 45000,
+    'ETH': 3000,
+    'ADA': 1.20,
+    'DOT': 25.0,
+    'USDC': 1.00
+}
+
+class SignalSnapshotCache:
+    """Per-token signal snapshots keyed by (token, last bar timestamp, indicator params)"""
+
+    def __init__(self, bar_interval=86400):
+        self.bar_interval = bar_interval  # Daily bars by default
+        self._snapshots = {}  # (token, params) -> (bar_timestamp, signals)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bar_timestamp(self, ts):
+        """Floor a timestamp (epoch seconds or datetime) to the start of its bar"""
+        if isinstance(ts, datetime):
+            ts = pd.Timestamp(ts).timestamp()  # Naive times are UTC, as fetched frames are
+        return int(ts // self.bar_interval) * self.bar_interval
+
+    def current_bar(self):
+        """Timestamp of the bar that is currently forming"""
+        return self.bar_timestamp(time.time())
+
+    def get(self, token, params, bar_ts):
+        """Return cached signals for the token if they were computed on this bar"""
+        with self._lock:
+            snapshot = self._snapshots.get((token, params))
+            if snapshot is None or snapshot[0] < bar_ts:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return snapshot[1]
+
+    def put(self, token, params, bar_ts, signals):
+        """Store the signals computed from data whose last bar is bar_ts"""
+        with self._lock:
+            self._snapshots[(token, params)] = (bar_ts, signals)
+
+    def invalidate(self, token=None):
+        """Drop snapshots for one token, or all of them"""
+        with self._lock:
+            if token is None:
+                self._snapshots.clear()
+            else:
+                for key in [k for k in self._snapshots if k[0] == token]:
+                    del self._snapshots[key]
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._snapshots)
+            }
+
 class SignalGenerator:
-    def __init__(self, tokens=None):
+    def __init__(self, tokens=None, price_store=None, token_registry=None):
         self.tokens = tokens or ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+        self.price_store = price_store  # Optional PriceHistoryStore backing fetch_price_data
+        self.token_registry = token_registry or TokenRegistry()  # Symbol -> CoinGecko id
         self.signals = {}
         self.use_real_data = True  # Toggle for real vs mock data
+        self.mock_seed = None  # Seed for deterministic synthetic data (None = fresh randomness)
+        self.mock_correlation = 0.6  # Pairwise correlation between non-stable assets in mock data
         self.api_timeout = 5  # Timeout for API calls
+        self.concurrent_fetch = True  # Fetch token histories in parallel
+        self.max_fetch_workers = 8
+        self.fetch_deadline = 8  # Seconds for the whole batch before falling back to mock data
+        self.history_days = 60  # More data for better signals
+        self.indicator_windows = dict(DEFAULT_WINDOWS)
+        self.score_weights = dict(DEFAULT_SCORE_WEIGHTS)
+        self.snapshot_cache = SignalSnapshotCache()
+        self.use_incremental_indicators = True  # Stream new bars into per-token state instead of re-rolling pandas windows
+        self.indicator_states = {}
+        self._indicator_lock = threading.Lock()  # generate_signals runs on the refresh thread and request threads
+        self.panel_min_tokens = 16  # Switch to the vectorized panel path for batches at least this large
+        self.signals_version = 0  # Bumped whenever generate_signals publishes different signal values
+        self._signals_fingerprint = None
     
-    def fetch_price_data(self, token, days=30):
-        """Fetch historical price data from CoinGecko API with fallback"""
-        if not self.use_real_data:
-            return self._generate_mock_price_data(token, days)
-            
+    def _fetch_market_chart(self, token, days):
+        """Fetch a CoinGecko market_chart payload, or None on failure"""
         try:
-            # Map tokens to CoinGecko IDs
-            token_map = {
-                'BTC': 'bitcoin',
-                'ETH': 'ethereum', 
-                'ADA': 'cardano',
-                'DOT': 'polkadot',
-                'USDC': 'usd-coin'
-            }
-            
-            coin_id = token_map.get(token.upper(), token.lower())
+            coin_id = self.token_registry.coin_id(token)
             endpoint = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
             params = {
                 'vs_currency': 'usd',
@@ -39,68 +118,112 @@ class SignalGenerator:
             response = requests.get(endpoint, params=params, timeout=self.api_timeout)
             
             if response.status_code == 200:
-                data = response.json()
-                prices = [price[1] for price in data['prices']]
-                timestamps = [datetime.fromtimestamp(price[0]/1000) for price in data['prices']]
-                
-                df = pd.DataFrame({
-                    'price': prices,
-                    'timestamp': timestamps
-                }).set_index('timestamp')
-                
-                print(f"✅ Real data fetched for {token}: {len(prices)} data points")
-                return df
-            else:
-                print(f"⚠️ API error for {token}: {response.status_code}")
-                return self._generate_mock_price_data(token, days)
+                return response.json()
+            print(f"⚠️ API error for {token}: {response.status_code}")
                 
         except requests.exceptions.Timeout:
-            print(f"⏰ API timeout for {token}, using mock data")
-            return self._generate_mock_price_data(token, days)
+            print(f"⏰ API timeout for {token}")
         except Exception as e:
-            print(f"❌ API error for {token}: {e}, using mock data")
-            return self._generate_mock_price_data(token, days)
+            print(f"❌ API error for {token}: {e}")
+        return None
     
-    def _generate_mock_price_data(self, token, days=30):
-        """Generate realistic mock price data for fallback"""
-        # Base prices for realistic simulation
-        base_prices = {
-            'BTC': 45000,
-            'ETH': 3000,
-            'ADA': 1.20,
-            'DOT': 25.0,
-            'USDC': 1.00
-        }
+    def fetch_price_data(self, token, days=30):
+        """Fetch historical price data from CoinGecko API with fallback"""
+        if not self.use_real_data:
+            return self._generate_mock_price_data(token, days)
         
-        base_price = base_prices.get(token, 100)
+        if self.price_store is not None:
+            # Serve from the local history store, fetching only the missing tail bars
+            rows = self.price_store.get_history(token, days, self._fetch_market_chart)
+            if len(rows):
+                print(f"✅ Stored data served for {token}: {len(rows)} data points")
+                return self.price_store.to_frame(rows)
+            print(f"⚠️ No stored data for {token}, using mock data")
+            return self._fallback_price_data(token, days)
         
-        # Generate dates
-        today = datetime.now()
-        dates = [today - timedelta(days=i) for i in range(days)]
-        dates.reverse()
+        data = self._fetch_market_chart(token, days)
+        if not data:
+            print(f"📊 Falling back to mock data for {token}")
+            return self._fallback_price_data(token, days)
         
-        # Generate realistic price movement with trend and volatility
-        prices = []
-        current_price = base_price
-        
-        for i in range(days):
-            # Add trend (slight upward bias for crypto)
-            trend = 0.001 if token != 'USDC' else 0
-            
-            # Add random walk with volatility
-            volatility = 0.05 if token != 'USDC' else 0.001
-            change = np.random.normal(trend, volatility)
-            
-            current_price = current_price * (1 + change)
-            prices.append(max(0.01, current_price))  # Prevent negative prices
+        prices = [price[1] for price in data['prices']]
+        timestamps = pd.to_datetime([price[0] for price in data['prices']], unit='ms')  # Naive UTC, like the store
         
         df = pd.DataFrame({
-            'price': prices
-        }, index=dates)
+            'price': prices,
+            'timestamp': timestamps
+        }).set_index('timestamp')
+        
+        # CoinGecko adds a 'now' sample to the day's 00:00 one; keep one price per bar (the last), as the store does
+        df = df.groupby(df.index.floor(f"{self.snapshot_cache.bar_interval}s")).last()
         
-        print(f"📊 Mock data generated for {token}: {len(prices)} data points")
+        print(f"✅ Real data fetched for {token}: {len(df)} bars")
         return df
     
+    def fetch_price_data_batch(self, tokens, days=30):
+        """Fetch price data for several tokens concurrently under one global deadline"""
+        if not self.use_real_data:
+            return self._generate_mock_price_frames(tokens, days)
+        if not self.concurrent_fetch or len(tokens) <= 1:
+            return {token: self.fetch_price_data(token, days) for token in tokens}
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.max_fetch_workers, len(tokens)))
+        futures = {token: executor.submit(self.fetch_price_data, token, days) for token in tokens}
+        done, _ = wait(futures.values(), timeout=self.fetch_deadline)
+        # Don't block on stragglers - they fall back to mock data below
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        frames = {}
+        for token, future in futures.items():
+            if future in done:
+                try:
+                    frames[token] = future.result()
+                    continue
+                except Exception as e:
+                    print(f"❌ Fetch failed for {token}: {e}, using mock data")
+            else:
+                print(f"⏰ Fetch deadline missed for {token}, using mock data")
+            frames[token] = self._fallback_price_data(token, days)
+        return frames
+    
+    def _mock_market_params(self, tokens):
+        """Per-token drift/volatility and correlation for the synthetic market"""
+        stable = np.array([token == 'USDC' for token in tokens])
+        # Add trend (slight upward bias for crypto) and random walk volatility
+        drift = np.where(stable, 0.0, 0.001)
+        volatility = np.where(stable, 0.001, 0.05)
+        # Volatile assets move together; the stablecoin doesn't
+        correlation = np.where(np.outer(~stable, ~stable), self.mock_correlation, 0.0)
+        np.fill_diagonal(correlation, 1.0)
+        return {'drift': drift, 'volatility': volatility, 'correlation': correlation}
+    
+    def _generate_mock_price_data(self, token, days=30):
+        """Generate realistic mock price data for fallback"""
+        market = SyntheticMarket.for_token(token, self.mock_seed)
+        df = market.generate_frames([token], days, MOCK_BASE_PRICES, **self._mock_market_params([token]))[token]
+        
+        print(f"📊 Mock data generated for {token}: {len(df)} data points")
+        return df
+    
+    def _fallback_price_data(self, token, days=30):
+        """Mock data standing in for a failed or late fetch, tagged so signals computed from it aren't cached"""
+        df = self._generate_mock_price_data(token, days)
+        df.attrs['fallback'] = True
+        return df
+    
+    @staticmethod
+    def is_fallback(df):
+        """Whether a fetched frame is mock data standing in for real history"""
+        return df is not None and df.attrs.get('fallback', False)
+    
+    def _generate_mock_price_frames(self, tokens, days=30):
+        """Generate correlated mock price data for several tokens in one vectorized draw"""
+        market = SyntheticMarket(seed=self.mock_seed)
+        frames = market.generate_frames(tokens, days, MOCK_BASE_PRICES, **self._mock_market_params(tokens))
+        
+        print(f"📊 Mock data generated for {len(tokens)} tokens: {days} data points each")
+        return frames
+    
     def calculate_mean_reversion(self, prices, window=14):
         """Calculate mean reversion signal using SMA"""
         if len(prices) < window:
@@ -109,14 +232,7 @@ class SignalGenerator:
         sma = prices.rolling(window=window).mean().iloc[-1]
         current_price = prices.iloc[-1]
         
-        deviation = (current_price - sma) / sma
-        
-        if deviation > 0.05:  # 5% above SMA
-            return -1  # Overbought, likely to revert down
-        elif deviation < -0.05:  # 5% below SMA
-            return 1   # Oversold, likely to revert up
-        else:
-            return deviation * 10  # Scaled signal between -0.5 and 0.5
+        return mean_reversion_signal(current_price, sma)
     
     def calculate_momentum(self, prices, window=14):
         """Calculate RSI-based momentum signal"""
@@ -138,18 +254,7 @@ class SignalGenerator:
             rs = avg_gain / avg_loss
             rsi = 100 - (100 / (1 + rs))
             
-            last_rsi = rsi.iloc[-1]
-            
-            if np.isnan(last_rsi):
-                return 0
-            
-            # Convert RSI to signal (-1 to 1)
-            if last_rsi > 70:
-                return -1  # Overbought
-            elif last_rsi < 30:
-                return 1   # Oversold
-            else:
-                return (50 - last_rsi) / 20  # Scaled signal
+            return momentum_signal(rsi.iloc[-1])
                 
         except Exception as e:
             print(f"RSI calculation error: {e}")
@@ -164,19 +269,7 @@ class SignalGenerator:
             # Calculate rolling volatility
             returns = prices.pct_change().dropna()
             volatility = returns.rolling(window=window).std()
-            current_vol = volatility.iloc[-1]
-            
-            if np.isnan(current_vol):
-                return 0
-            
-            # Higher volatility = higher risk = negative signal
-            # Lower volatility = lower risk = positive signal
-            if current_vol > 0.05:  # High volatility (5%+ daily)
-                return -1
-            elif current_vol < 0.01:  # Very low volatility (1% daily)
-                return 1
-            else:
-                return (0.03 - current_vol) / 0.02  # Scaled signal
+            return volatility_signal(volatility.iloc[-1])
                 
         except Exception as e:
             print(f"Volatility calculation error: {e}")
@@ -191,25 +284,7 @@ class SignalGenerator:
             sma = prices.rolling(window=window).mean()
             std = prices.rolling(window=window).std()
             
-            upper_band = sma + 2 * std
-            lower_band = sma - 2 * std
-            
-            current_price = prices.iloc[-1]
-            current_upper = upper_band.iloc[-1]
-            current_lower = lower_band.iloc[-1]
-            current_sma = sma.iloc[-1]
-            
-            if np.isnan(current_upper) or np.isnan(current_lower):
-                return 0
-            
-            if current_price > current_upper:
-                return 1   # Bullish breakout
-            elif current_price < current_lower:
-                return -1  # Bearish breakdown
-            else:
-                # Position within bands (-1 to 1)
-                band_position = (current_price - current_sma) / (current_upper - current_sma)
-                return max(-1, min(1, band_position))
+            return breakout_signal(prices.iloc[-1], sma.iloc[-1], std.iloc[-1])
                 
         except Exception as e:
             print(f"Breakout calculation error: {e}")
@@ -243,16 +318,62 @@ class SignalGenerator:
             print(f"ML confidence calculation error: {e}")
             return 0.5
     
+    def _indicator_params(self):
+        """Hashable description of everything that shapes a token's signals"""
+        return (
+            self.history_days,
+            self.use_real_data,
+            tuple(sorted(self.indicator_windows.items())),
+            tuple(sorted(self.score_weights.items()))
+        )
+    
     def generate_signals(self):
         """Generate comprehensive trading signals for all tokens"""
         results = {}
+        params = self._indicator_params()
+        current_bar = self.snapshot_cache.current_bar()
+        windows = self.indicator_windows
         
+        # Reuse this bar's snapshots instead of re-fetching and recomputing
+        cached = {}
         for token in self.tokens:
+            snapshot = self.snapshot_cache.get(token, params, current_bar)
+            if snapshot is not None:
+                cached[token] = snapshot
+        
+        # Get price data (real or mock) for everything that missed the cache in one batch
+        missing = [token for token in self.tokens if token not in cached]
+        frames = self.fetch_price_data_batch(missing, days=self.history_days) if missing else {}
+        
+        # Large batches go through one vectorized pass over an aligned price panel
+        min_bars = max(20, max(windows.values()) + 1)
+        panel_tokens = [t for t in missing if frames.get(t) is not None and len(frames[t]) >= min_bars]
+        panel_results = {}
+        if len(panel_tokens) >= self.panel_min_tokens:
+            try:
+                panel_results = self._generate_signals_from_frames(panel_tokens, frames)
+                for token in panel_tokens:
+                    if self.is_fallback(frames[token]):
+                        continue  # Retry upstream next time rather than pin mock signals for the bar
+                    bar_ts = self.snapshot_cache.bar_timestamp(frames[token].index[-1])
+                    self.snapshot_cache.put(token, params, bar_ts, panel_results[token])
+                print(f"✅ Vectorized signals generated for {len(panel_tokens)} tokens")
+            except Exception as e:
+                print(f"❌ Vectorized signal generation failed: {e}, falling back to per-token path")
+                panel_results = {}
+        
+        for token in self.tokens:
+            if token in cached:
+                results[token] = cached[token]
+                continue
+            if token in panel_results:
+                results[token] = panel_results[token]
+                continue
+            
             try:
                 print(f"🔍 Generating signals for {token}...")
                 
-                # Get price data (real or mock)
-                df = self.fetch_price_data(token, days=60)  # More data for better signals
+                df = frames.get(token)
                 
                 if df is None or len(df) < 20:
                     print(f"⚠️ Insufficient data for {token}, using default signals")
@@ -260,21 +381,22 @@ class SignalGenerator:
                     continue
                 
                 # Calculate individual signals
-                mean_reversion = self.calculate_mean_reversion(df['price'])
-                momentum = self.calculate_momentum(df['price'])
-                volatility = self.calculate_volatility(df['price'])
-                breakout = self.calculate_breakout(df['price'])
+                if self.use_incremental_indicators:
+                    with self._indicator_lock:
+                        raw_signals = self._update_indicator_state(token, df['price']).signals()
+                else:
+                    raw_signals = {
+                        'mean_reversion': self.calculate_mean_reversion(df['price'], windows['mean_reversion']),
+                        'momentum': self.calculate_momentum(df['price'], windows['momentum']),
+                        'volatility': self.calculate_volatility(df['price'], windows['volatility']),
+                        'breakout': self.calculate_breakout(df['price'], windows['breakout'])
+                    }
                 
                 # Clean signals (handle NaN)
-                signals_dict = {
-                    'mean_reversion': self._clean_signal(mean_reversion),
-                    'momentum': self._clean_signal(momentum),
-                    'volatility': self._clean_signal(volatility),
-                    'breakout': self._clean_signal(breakout)
-                }
+                signals_dict = {key: self._clean_signal(value) for key, value in raw_signals.items()}
                 
                 # Calculate total score with weights
-                weights = {'mean_reversion': 0.3, 'momentum': 0.3, 'volatility': 0.2, 'breakout': 0.2}
+                weights = self.score_weights
                 total_score = sum(signals_dict[key] * weights[key] for key in weights.keys())
                 
                 # Calculate ML confidence
@@ -286,6 +408,9 @@ class SignalGenerator:
                     'ml_confidence': round(ml_confidence, 3),
                     'timestamp': time.time()
                 }
+                if not self.is_fallback(df):
+                    self.snapshot_cache.put(token, params, self.snapshot_cache.bar_timestamp(df.index[-1]),
+                                            results[token])
                 
                 print(f"✅ {token} signals: Score={total_score:.2f}, Confidence={ml_confidence:.2f}")
                 
@@ -293,9 +418,82 @@ class SignalGenerator:
                 print(f"❌ Error generating signals for {token}: {e}")
                 results[token] = self._get_default_signals()
         
+        self._publish_signals(results)
+        return results
+    
+    def _publish_signals(self, results):
+        """Store the latest signals and bump signals_version if any value changed"""
+        fingerprint = tuple(
+            (token, tuple(values.get(key) for key in SIGNAL_KEYS + ('total_score', 'ml_confidence')))
+            for token, values in results.items()
+        )
+        if fingerprint != self._signals_fingerprint:
+            self._signals_fingerprint = fingerprint
+            self.signals_version += 1
         self.signals = results
+    
+    def generate_signals_from_panel(self, tokens, panel):
+        """Vectorized signals for an aligned tokens x bars price panel, in generate_signals' per-token format"""
+        panel = np.asarray(panel, dtype=float)
+        if panel.ndim != 2 or panel.shape[1] < 20:
+            return {token: self._get_default_signals() for token in tokens}
+        
+        arrays = compute_panel_signals(panel, self.indicator_windows, self.score_weights)
+        now = time.time()
+        
+        results = {}
+        for i, token in enumerate(tokens):
+            results[token] = {
+                **{key: float(arrays[key][i]) for key in SIGNAL_KEYS},
+                'total_score': round(float(arrays['total_score'][i]), 3),
+                'ml_confidence': round(float(arrays['ml_confidence'][i]), 3),
+                'timestamp': now
+            }
         return results
     
+    def _generate_signals_from_frames(self, tokens, frames):
+        """Align fetched histories on their most recent bars and run the panel path"""
+        # Indicators only look at the last window+1 bars, so trimming to a common tail is lossless
+        length = min(len(frames[token]) for token in tokens)
+        panel = np.vstack([frames[token]['price'].to_numpy(dtype=float)[-length:] for token in tokens])
+        return self.generate_signals_from_panel(tokens, panel)
+    
+    def _bar_prices(self, prices):
+        """One price per bar (the last sample in it, as the price store keeps them), keyed by bar start"""
+        seconds = prices.index.values.astype('datetime64[s]').astype(np.int64)
+        bars = seconds // self.snapshot_cache.bar_interval * self.snapshot_cache.bar_interval
+        last_in_bar = np.append(bars[1:] != bars[:-1], True)
+        return bars[last_in_bar], prices.to_numpy(dtype=float)[last_in_bar]
+    
+    def _update_indicator_state(self, token, prices):
+        """Advance the token's indicator state by the bars it hasn't seen, reseeding if history changed.
+
+        States are keyed on bar timestamps. The latest bar may still be
+        forming (its sample moves on every fetch), so it is repriced rather
+        than appended; the bar before it must match or the state is reseeded.
+        Call with self._indicator_lock held.
+        """
+        if not isinstance(prices.index, pd.DatetimeIndex) or not prices.index.is_monotonic_increasing:
+            state = IndicatorState.from_series(prices, self.indicator_windows)
+            self.indicator_states[token] = state
+            return state
+        
+        bars, values = self._bar_prices(prices)
+        state = self.indicator_states.get(token)
+        if state is not None and state.windows == self.indicator_windows and state.prev_timestamp is not None:
+            # Bars up to the state's previous one are settled; everything after it is taken from this series
+            settled = int(np.searchsorted(bars, state.prev_timestamp))
+            if (settled + 1 < len(bars) and bars[settled] == state.prev_timestamp
+                    and values[settled] == state.prev_price):
+                state.replace(values[settled + 1], bars[settled + 1])
+                for timestamp, price in zip(bars[settled + 2:], values[settled + 2:]):
+                    state.update(price, timestamp)
+                return state
+        
+        state = IndicatorState.from_series(pd.Series(values, index=bars), self.indicator_windows)
+        self.indicator_states[token] = state
+        return state
+    
     def _clean_signal(self, signal):
         """Clean and validate signal values"""
         if signal is None or np.isnan(signal) or np.isinf(signal):
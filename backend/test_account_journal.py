@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+
+import pytest
+
+from models.rebalance_engine import RebalanceEngine
+from models.virtual_account import VirtualAccountManager
+from services.account_journal import AccountJournal
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00, 'WBTC': 109400, 'LINK': 14.0}
+
+
+def make_manager(path):
+    manager = VirtualAccountManager(data_file=str(path), start_updates=False, storage='journal')
+    manager._get_current_prices = lambda: dict(PRICES)
+    return manager
+
+
+def reopen(manager):
+    manager.close()
+    return make_manager(manager.data_file)
+
+
+def exercise(manager):
+    """A mix of every journaled mutation"""
+    manager.create_account('alice', initial_balance=50000)
+    manager.create_account('bob')
+    first = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    second = manager.deploy_bot('alice', 'momentum', 75, 5000)
+    third = manager.deploy_bot('bob', 'shannon', 25, 20000)
+    manager._update_all_portfolios(prices=PRICES)
+    manager.execute_virtual_trade('alice', first['bot_id'], 'BTC', 'BUY', 0.01, PRICES['BTC'])
+    manager.execute_virtual_trade('alice', first['bot_id'], 'ETH', 'SELL', 1e9, PRICES['ETH'])
+    manager.stop_bot('alice', second['bot_id'])
+    manager.delete_bot('alice', second['bot_id'])
+    manager.stop_bot('bob', third['bot_id'])
+    manager.resume_bot('bob', third['bot_id'])
+    manager.append_performance('bob', {'timestamp': 1.0, 'total_value': 100000})
+
+
+def test_replaying_the_journal_reproduces_the_accounts(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    exercise(manager)
+    manager.persistence.flush()
+    manager.store.sync()
+    assert not os.path.exists(manager.data_file)  # Nothing but journal records so far
+
+    # Simulate a crash: drop the handle without compacting
+    manager.store._closed.set()
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    assert restored.store.stats['replayed'] == manager.store.stats['appended']
+    assert restored.accounts == manager.accounts
+
+
+def test_save_accounts_writes_a_plain_snapshot_and_empties_the_journal(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    exercise(manager)
+    manager.save_accounts()
+
+    with open(manager.data_file) as f:
+        assert json.load(f) == manager.accounts
+    assert os.path.getsize(manager.store.journal_file) == 0
+    assert reopen(manager).accounts == manager.accounts
+
+
+def test_records_survive_an_interrupted_compaction(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    manager.persistence.flush()
+    manager.store.sync()
+    with open(manager.store.journal_file, 'rb') as f:
+        old_journal = f.read()
+
+    # Snapshot written, but the crash hit before the journal was trimmed
+    manager.save_accounts()
+    manager.stop_bot('alice', bot['bot_id'])
+    manager.persistence.flush()
+    manager.store.sync()
+    with open(manager.store.journal_file, 'rb') as f:
+        tail = f.read()
+    with open(manager.store.journal_file, 'wb') as f:
+        f.write(old_journal + tail)
+    manager.store._closed.set()
+
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    account = restored.accounts['alice']
+    assert len(account['bots']) == 1 and account['bots'][0]['status'] == 'stopped'
+    assert account['balance'] == pytest.approx(manager.accounts['alice']['balance'])
+
+
+def test_compaction_encodes_outside_the_account_lock(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    assets_before = dict(bot['assets'])
+    encode = json.dumps
+    traded = []
+
+    def slow_dumps(value, **kwargs):
+        if kwargs.get('indent') == 2:
+            # A trade (in-place asset update) from another thread must not wait for the encoding
+            worker = threading.Thread(target=lambda: traded.append(
+                manager.execute_virtual_trade('alice', bot['bot_id'], 'BTC', 'BUY', 0.01, PRICES['BTC'])))
+            worker.start()
+            worker.join(timeout=5)
+            assert traded, "trade blocked behind the snapshot encoding"
+        return encode(value, **kwargs)
+
+    monkeypatch.setattr('services.account_journal.json.dumps', slow_dumps)
+    manager.save_accounts()
+    monkeypatch.undo()
+
+    with open(manager.data_file) as f:
+        snapshot = json.load(f)
+    assert snapshot['alice']['bots'][0]['assets'] == assets_before  # As of the copy, not mid-trade
+    assert snapshot['alice']['trade_history'] == manager.accounts['alice']['trade_history'][:-1]
+
+    # The trade is in the journal tail after the snapshot's seq
+    manager.persistence.flush()
+    manager.store.sync()
+    manager.store._closed.set()
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    assert restored.accounts == manager.accounts
+
+
+def test_a_torn_last_record_is_dropped(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    manager.persistence.flush()
+    manager.store.sync()
+    manager.store._closed.set()
+    with open(manager.store.journal_file, 'ab') as f:
+        f.write(b'{"seq": 2, "op": "set", "pa')
+
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    assert list(restored.accounts) == ['alice']
+    restored.create_account('bob')
+    assert set(reopen(restored).accounts) == {'alice', 'bob'}
+
+
+def test_a_legacy_snapshot_without_journal_loads(tmp_path):
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps({'alice': {'user_id': 'alice', 'balance': 1.0, 'bots': []}}))
+    journal = AccountJournal(str(path), dict, None)
+    assert journal.load() == {'alice': {'user_id': 'alice', 'balance': 1.0, 'bots': []}}
+    journal.close()
+
+
+class InterruptedTickEngine(RebalanceEngine):
+    """Always rebalances into USDC; `interrupt` runs while the tick is still planning"""
+
+    def __init__(self, interrupt):
+        super().__init__()
+        self.interrupt = interrupt
+
+    def get_rebalance_recommendation(self, current_weights, signals, prices, **kwargs):
+        return {'recommendation': 'REBALANCE', 'target_weights': {'USDC': 100.0}}
+
+    def generate_rebalance_plan(self, *args, **kwargs):
+        plan = super().generate_rebalance_plan(*args, **kwargs)
+        self.interrupt()
+        return plan
+
+
+class StaticSignals:
+    signals_version = None
+
+    def generate_signals(self):
+        return {}
+
+
+@pytest.mark.parametrize('action', ['stop_bot', 'delete_bot'])
+def test_a_bot_stopped_or_deleted_during_a_tick_is_not_rebalanced(tmp_path, action):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    kept = manager.deploy_bot('alice', 'momentum', 50, 10000)
+    assets, kept_assets = dict(bot['assets']), dict(kept['assets'])
+
+    def interrupt():
+        if bot['status'] == 'active':
+            manager.stop_bot('alice', bot['bot_id'])
+            if action == 'delete_bot':
+                manager.delete_bot('alice', bot['bot_id'])
+
+    manager.update_bot_portfolios(InterruptedTickEngine(interrupt), StaticSignals(), prices=PRICES)
+    assert bot['assets'] == assets  # Liquidated by stop_bot, not traded by the tick
+    assert kept['assets'] != kept_assets
+    manager.persistence.flush()
+    manager.store.sync()
+    manager.store._closed.set()  # Crash: only the journal
+
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    assert restored.store.stats['skipped'] == 0
+    bots = {bot['bot_id']: bot for bot in restored.accounts['alice']['bots']}
+    assert bots[kept['bot_id']]['assets'] == kept['assets']
+    if action == 'stop_bot':
+        assert bots[bot['bot_id']]['status'] == 'stopped'
+    else:
+        assert bot['bot_id'] not in bots
+
+
+def test_records_for_a_removed_bot_are_skipped_on_replay(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    manager.stop_bot('alice', bot['bot_id'])
+    manager.delete_bot('alice', bot['bot_id'])
+    with manager._lock:  # A stale op, as a tick that raced the delete would have stored
+        manager._record('set', path=['alice', 'bots', bot['bot_id'], 'assets'], value={'USDC': 1.0})
+        manager._record('append', path=['ghost', 'trade_history'], value={'trade_id': 't1'})
+    manager.create_account('bob')
+    manager.persistence.flush()
+    manager.store.sync()
+    manager.store._closed.set()
+
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    assert set(restored.accounts) == {'alice', 'bob'} and restored.accounts['alice']['bots'] == []
+    assert restored.store.stats['skipped'] == 2
@@ -0,0 +1,139 @@
+import json
+import time
+
+import pytest
+
+from models.virtual_account import VirtualAccountManager
+from services.account_journal import AccountJournal
+from services.account_store import SQLiteAccountStore, open_account_store
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00, 'WBTC': 109400, 'LINK': 14.0}
+
+
+def make_manager(path):
+    manager = VirtualAccountManager(data_file=str(path), start_updates=False, storage='sqlite')
+    manager._get_current_prices = lambda: dict(PRICES)
+    return manager
+
+
+def test_tables_reproduce_the_accounts(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice', initial_balance=50000)
+    manager.create_account('bob')
+    first = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    second = manager.deploy_bot('alice', 'momentum', 75, 5000)
+    third = manager.deploy_bot('bob', 'shannon', 25, 20000)
+    manager._update_all_portfolios(prices=PRICES)
+    manager.execute_virtual_trade('alice', first['bot_id'], 'BTC', 'BUY', 0.01, PRICES['BTC'])
+    manager.stop_bot('alice', second['bot_id'])
+    manager.delete_bot('alice', second['bot_id'])
+    manager.stop_bot('bob', third['bot_id'])
+    manager.resume_bot('bob', third['bot_id'])
+    manager.append_performance('bob', {'timestamp': 1.0, 'total_value': 100000, 'note': None})
+    manager.close()
+
+    restored = make_manager(tmp_path / 'accounts.json')
+    assert restored.accounts == manager.accounts
+    assert restored.accounts['alice']['bots'][0]['status'] == 'active'
+
+
+def test_an_empty_database_imports_the_json_file_and_exports_it_back(tmp_path):
+    accounts = {'alice': {'user_id': 'alice', 'account_id': 'a1', 'balance': 100.0, 'portfolio': {},
+                          'bots': [{'bot_id': 'b1', 'status': 'stopped', 'assets': {'BTC': 0.1},
+                                    'performance_history': [{'timestamp': 5.0, 'value': 9.0, 'event': 'resumed'}]}],
+                          'trade_history': [{'trade_id': 't1', 'bot_id': 'b1', 'timestamp': 4.0}],
+                          'performance_history': []}}
+    (tmp_path / 'accounts.json').write_text(json.dumps(accounts))
+
+    store = SQLiteAccountStore(str(tmp_path / 'accounts.db'), json_file=str(tmp_path / 'accounts.json'))
+    assert store.load() == accounts and store.stats['imported'] == 1
+    store.export_json(str(tmp_path / 'export.json'))
+    assert json.loads((tmp_path / 'export.json').read_text()) == accounts
+    assert store._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    store.close()
+
+
+def test_indexed_queries(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    kept = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    stopped = manager.deploy_bot('alice', 'momentum', 50, 10000)
+    manager.stop_bot('alice', stopped['bot_id'])
+    now = time.time()
+    with manager._lock:
+        for hours in (48, 30, 12, 1):
+            record = {'timestamp': now - hours * 3600, 'value': float(hours)}
+            manager._record('append', path=['alice', 'bots', kept['bot_id'], 'performance_history'], value=record)
+
+    recent = manager.get_bot_performance('alice', kept['bot_id'], since=now - 86400)
+    assert [record['value'] for record in recent] == [12.0, 1.0, 10000]
+    assert manager.get_bot_performance('bob', kept['bot_id']) is None
+    assert [bot['bot_id'] for _, bot in manager.get_active_bots()] == [kept['bot_id']]
+    plan = manager.store._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM performance WHERE bot_id = ? AND timestamp >= ?", ('x', 0)).fetchall()
+    assert 'performance_by_bot' in str([tuple(row) for row in plan])
+    manager.store.close()
+
+
+@pytest.mark.parametrize('storage', ['journal', 'sqlite'])
+def test_valuations_survive_a_restart(tmp_path, storage):
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False, storage=storage)
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    crashed = {asset: price / 2 for asset, price in PRICES.items()}
+    for _ in range(3):  # Repeated revaluations coalesce into one write per flush
+        manager._update_all_portfolios(prices=crashed)
+    value = bot['portfolio_value']
+    assert value == pytest.approx(5000, rel=0.01)
+    assert dict(manager.get_active_bots())['alice']['portfolio_value'] == value
+    assert manager.persistence.stats()['coalesced'] >= 2
+    manager.close()
+
+    restored = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                     storage=storage)
+    assert restored.accounts['alice']['bots'][0]['portfolio_value'] == value
+    balance = restored.accounts['alice']['balance']
+    restored.stop_bot('alice', bot['bot_id'])  # Before any valuation pass: credits the stored value
+    assert restored.accounts['alice']['balance'] == pytest.approx(balance + value)
+    restored.close()
+
+
+@pytest.mark.parametrize('storage', ['journal', 'sqlite'])
+def test_active_bots_are_detached_copies_on_both_backends(tmp_path, storage):
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False, storage=storage)
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+
+    [(user_id, active)] = manager.get_active_bots()
+    assert user_id == 'alice' and 'performance_history' not in active
+    assert active == {key: value for key, value in bot.items() if key != 'performance_history'}
+    active['assets']['BTC'] = 0.0
+    active['status'] = 'stopped'
+    assert bot['assets']['BTC'] > 0 and bot['status'] == 'active'
+    assert manager.get_bot_performance('alice', bot['bot_id']) == bot['performance_history']
+    manager.close()
+
+
+def test_records_for_a_missing_bot_or_account_are_rejected(tmp_path):
+    store = SQLiteAccountStore(str(tmp_path / 'accounts.db'))
+    store.append({'op': 'create_account', 'user_id': 'alice',
+                  'account': {'user_id': 'alice', 'balance': 1.0, 'bots': [], 'trade_history': []}})
+    for path in (['alice', 'bots', 'gone', 'performance_history'], ['ghost', 'trade_history']):
+        with pytest.raises(KeyError):
+            store.append({'op': 'append', 'path': path, 'value': {'timestamp': 1.0}})
+    assert store.load()['alice']['trade_history'] == []
+    store.close()
+
+
+def test_backend_selection(tmp_path, monkeypatch):
+    monkeypatch.delenv('ACCOUNT_STORE', raising=False)
+    data_file = str(tmp_path / 'accounts.json')
+    journal = open_account_store(data_file, dict, None)
+    assert isinstance(journal, AccountJournal)
+    journal.close()
+    monkeypatch.setenv('ACCOUNT_STORE', 'sqlite')
+    store = open_account_store(data_file, dict, None)
+    assert isinstance(store, SQLiteAccountStore) and store.db_file.endswith('accounts.db')
+    store.close()
+    with pytest.raises(ValueError):
+        open_account_store(data_file, dict, None, backend='postgres')
@@ -0,0 +1,91 @@
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+
+from models.asset_index import AssetIndex
+from models.rebalance_engine import RebalanceEngine, SCORE_MARGIN
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00, 'SOL': 150.0}
+
+
+def test_vectors_share_columns_across_asset_orders():
+    index = AssetIndex(['BTC', 'ETH'])
+    current, target = index.vectors({'USDC': 0.2, 'BTC': 0.8}, {'BTC': 0.5, 'ETH': 0.3, 'ADA': 0.2})
+
+    assert index.positions == {'BTC': 0, 'ETH': 1, 'USDC': 2, 'ADA': 3}
+    assert current.tolist() == [0.8, 0.0, 0.2, 0.0]
+    assert target.tolist() == [0.5, 0.3, 0.0, 0.2]
+    assert np.abs(current - target).sum() / 2 == pytest.approx(0.5)
+    assert index.to_dict(current - target, ['USDC', 'ADA']) == {'USDC': 0.2, 'ADA': -0.2}
+
+
+def test_vectors_of_reordered_dicts_with_the_same_assets():
+    index = AssetIndex()
+    vectors = index.vectors({'BTC': 1.0, 'ETH': 2.0}, {'ETH': 4.0, 'BTC': 3.0})
+    assert vectors.tolist() == [[1.0, 2.0], [3.0, 4.0]]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_unrounded_scores_stay_within_the_shortlist_margin(seed):
+    rng = np.random.default_rng(seed)
+    engine = RebalanceEngine()
+    drift_sum = rng.uniform(0, 2, 2000)
+    adds_stablecoin = rng.random(2000) < 0.5
+    approx = engine._optimization_scores(drift_sum, adds_stablecoin)
+    exact = [engine._metrics_from_drift(d, a)['optimization_score']
+             for d, a in zip(drift_sum.tolist(), adds_stablecoin.tolist())]
+    assert np.abs(approx - exact).max() < SCORE_MARGIN / 2
+
+
+class ReweightedEngine(RebalanceEngine):
+    """A different impact model: the array scores must follow it without being edited"""
+
+    @staticmethod
+    def _impacts(adds_stablecoin):
+        impacts = RebalanceEngine._impacts(adds_stablecoin)
+        impacts['expected_return_impact'] = 0.5 if adds_stablecoin else -0.4
+        impacts['sharpe_impact'] = 0.3 if adds_stablecoin else -0.1
+        return impacts
+
+
+def test_array_scores_follow_the_metric_model():
+    engine = ReweightedEngine()
+    drift_sum = np.linspace(0, 0.02, 50)
+    for adds_stablecoin in (True, False):
+        approx = engine._optimization_scores(drift_sum, np.full(50, adds_stablecoin))
+        exact = [engine._metrics_from_drift(d, adds_stablecoin)['optimization_score'] for d in drift_sum.tolist()]
+        assert np.abs(approx - exact).max() < SCORE_MARGIN / 2
+
+
+def test_rebalance_metrics_use_the_shared_asset_index():
+    engine = RebalanceEngine(asset_index=AssetIndex(['BTC', 'ETH', 'USDC']))
+    metrics = engine.calculate_rebalance_metrics({'BTC': 0.6, 'SOL': 0.4}, {'BTC': 50, 'USDC': 50})
+    assert metrics['drift_reduction'] == pytest.approx(100.0)  # |0.6-0.5| + 0.4 + 0.5
+    assert 'SOL' in engine.asset_index.positions
+    assert metrics == engine._metrics_from_drift(1.0, True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_matches_single_recommendations(seed):
+    rng = np.random.default_rng(seed)
+    signals = {asset: {'total_score': float(rng.uniform(-1, 1)), 'momentum': float(rng.uniform(-1, 1)),
+                       'mean_reversion': float(rng.uniform(-1, 1)), 'volatility': float(rng.uniform(0, 1))}
+               for asset in PRICES}
+    portfolios = {}
+    for i in range(60):
+        assets = list(rng.choice(list(PRICES), int(rng.integers(2, 6)), replace=False))
+        portfolios[f"bot_{i}"] = {'current_weights': dict(zip(assets, rng.dirichlet(np.ones(len(assets))).tolist())),
+                                  'risk_profile': int(rng.choice([25, 50, 75]))}
+
+    engine = RebalanceEngine()
+    with redirect_stdout(io.StringIO()):
+        batch = engine.get_rebalance_recommendations_batch(portfolios, signals, PRICES, compare_strategies=True)
+        for portfolio_id, portfolio in portfolios.items():
+            single = engine.get_rebalance_recommendation(portfolio['current_weights'], signals, PRICES,
+                                                         risk_profile=portfolio['risk_profile'],
+                                                         compare_strategies=True)
+            for key in ('recommendation', 'urgency', 'strategy', 'target_weights', 'justification'):
+                assert batch[portfolio_id][key] == single[key]
+            assert batch[portfolio_id]['metrics'] == pytest.approx(single['metrics'])
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from models.backtest_engine import BacktestEngine, warmup_bars
+from models.rebalance_engine import RebalanceEngine
+from services.synthetic_market import SyntheticMarket
+from signals.panel import MIN_BARS, compute_panel_signals, compute_signal_history
+
+TOKENS = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+WINDOWS = {'mean_reversion': 7, 'momentum': 10, 'volatility': 14, 'breakout': 30}
+
+
+def make_panel(bars=120, seed=3):
+    market = SyntheticMarket(seed=seed, drift=[0.001, 0.001, 0.001, 0.001, 0.0],
+                             volatility=[0.04, 0.05, 0.06, 0.06, 0.001], correlation=0.5)
+    return market.generate(len(TOKENS), bars, [45000, 3000, 1.2, 25.0, 1.0])
+
+
+class FixedTargets(RebalanceEngine):
+    """Always targets the same weights (percent), whatever the signals say"""
+
+    def __init__(self, targets):
+        super().__init__()
+        self.targets = targets
+
+    def apply_rebalance_strategy(self, tokens, signals, prices, strategy=None, risk_profile=50):
+        return dict(self.targets)
+
+
+@pytest.mark.parametrize('windows', [None, WINDOWS])
+def test_signal_history_matches_the_last_bar_path_at_every_bar(windows):
+    panel = make_panel()
+    history = compute_signal_history(panel, windows)
+    for t in range(MIN_BARS - 1, panel.shape[1]):
+        expected = compute_panel_signals(panel[:, :t + 1], windows)
+        for key, values in expected.items():
+            np.testing.assert_allclose(history[key][:, t], values, rtol=1e-9, atol=1e-9, err_msg=f"{key} at {t}")
+
+
+def test_equity_turnover_and_fees_follow_the_trades():
+    warmup = warmup_bars()
+    panel = np.ones((2, warmup + 5))
+    panel[1, warmup + 1:] = 2.0  # The second asset doubles on the first bar after entry
+    backtester = BacktestEngine(FixedTargets({'A': 50, 'B': 50}), fee_rate=0.001, initial_value=100000)
+
+    result = backtester.run(['A', 'B'], panel)
+    # Entry: buy everything, paying fees on the full notional
+    assert result['equity_curve'][0] == pytest.approx(99900)
+    # Doubling drifts the weights to 1/3 vs 2/3: trade a third of 149,850 back to 50/50
+    after = 149850 - 149850 / 3 * 0.001
+    np.testing.assert_allclose(result['equity_curve'][1:], after)
+    np.testing.assert_allclose(result['turnover_curve'], [1.0, 1 / 3, 0, 0, 0])
+    assert result['rebalances'] == 2
+    assert result['fees_paid'] == pytest.approx(100 + 149850 / 3 * 0.001, abs=0.01)
+    assert result['total_return'] == pytest.approx((after / 100000 - 1) * 100, abs=0.01)
+    assert result['max_drawdown'] == 0
+
+
+def test_drift_inside_the_band_does_not_trade():
+    warmup = warmup_bars()
+    panel = np.ones((2, warmup + 3))
+    panel[1, warmup + 1:] = 1.1  # Weights drift to 47.6/52.4, inside the 5% band
+    result = BacktestEngine(FixedTargets({'A': 50, 'B': 50}), fee_rate=0.001).run(['A', 'B'], panel)
+    assert result['rebalances'] == 1 and result['fees_paid'] == pytest.approx(100)
+    assert result['equity_curve'][-1] == pytest.approx(99900 * 1.05)
+
+
+def test_custom_windows_set_the_warmup():
+    panel = make_panel(bars=80)
+    results = BacktestEngine().run_all(TOKENS, panel, strategies=['tactical'], windows=WINDOWS)
+    assert len(results['tactical']['equity_curve']) == 80 - warmup_bars(WINDOWS) == 80 - 31
+    assert len(BacktestEngine().run(TOKENS, panel)['equity_curve']) == 80 - warmup_bars()
+    with pytest.raises(ValueError):
+        BacktestEngine().run(TOKENS, panel[:, :31], windows=WINDOWS)
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from models.covariance import EWMACovariance
+from models.rebalance_engine import RebalanceEngine
+from services.synthetic_market import SyntheticMarket
+from signals.strategy import SignalGenerator
+
+TOKENS = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+DAY = 86400
+
+
+def make_panel(bars=60, seed=3):
+    market = SyntheticMarket(seed=seed, drift=0.0, volatility=[0.03, 0.04, 0.05, 0.05, 0.001], correlation=0.6)
+    return market.generate(len(TOKENS), bars, [45000, 3000, 1.2, 25.0, 1.0])
+
+
+def seeded(panel, min_bars=20):
+    covariance = EWMACovariance(TOKENS, min_bars=min_bars)
+    covariance.seed(panel, [(panel.shape[1] - 1) * DAY])
+    return covariance
+
+
+def test_seed_folds_every_closed_bar():
+    panel = make_panel()
+    covariance = seeded(panel)
+    assert covariance.updates == panel.shape[1] - 2  # First bar has no return, last is still forming
+    assert covariance.ready and covariance.covers(['BTC', 'USDC']) and not covariance.covers(['SOL'])
+
+    vols = covariance.volatility(TOKENS)
+    assert vols[-1] < 0.01 < vols[0]  # Stablecoin is flat next to BTC
+    matrix = covariance.matrix(['ETH', 'BTC'])
+    assert matrix[0, 1] == matrix[1, 0] > 0
+    assert np.all(np.linalg.eigvalsh(covariance.matrix(TOKENS)) > 0)
+
+
+def test_observe_moves_the_estimate_only_when_a_new_bar_starts():
+    panel = make_panel()
+    covariance = seeded(panel)
+    cov, version, updates = covariance.cov.copy(), covariance.version, covariance.updates
+    bar_start = (panel.shape[1] - 1) * DAY
+
+    # Repricing the forming bar replaces the pending close and leaves the estimate alone
+    for offset, move in ((600, 1.05), (3600, 0.9), (DAY - 1, 1.2)):
+        covariance.observe({token: price * move for token, price in zip(TOKENS, panel[:, -1])}, bar_start + offset)
+        assert covariance.version == version and covariance.updates == updates
+        np.testing.assert_array_equal(covariance.cov, cov)
+
+    # The first snapshot in the next bar closes the forming bar at its last price (x1.2)
+    covariance.observe(dict(zip(TOKENS, panel[:, -1])), bar_start + DAY)
+    assert covariance.version == version + 1 and covariance.updates == updates + 1
+
+    expected = EWMACovariance(TOKENS)
+    expected.seed(np.column_stack([panel[:, :-1], panel[:, -1] * 1.2, panel[:, -1]]))
+    np.testing.assert_allclose(covariance.cov, expected.cov, rtol=1e-12)
+    np.testing.assert_allclose(covariance.mean, expected.mean, rtol=1e-12)
+
+    # Late snapshots from an older bar are ignored
+    covariance.observe({token: 1.0 for token in TOKENS}, bar_start)
+    np.testing.assert_array_equal(covariance._pending, panel[:, -1])
+
+
+def test_missing_prices_keep_the_pending_close():
+    panel = make_panel()
+    covariance = seeded(panel)
+    bar_start = (panel.shape[1] - 1) * DAY
+    covariance.observe({'BTC': panel[0, -1] * 1.1}, bar_start + 60)
+    assert covariance._pending[0] == panel[0, -1] * 1.1
+    np.testing.assert_array_equal(covariance._pending[1:], panel[1:, -1])
+
+
+def test_seed_from_frames_uses_the_common_tail():
+    panel = make_panel()
+    index = pd.date_range('2024-01-01', periods=panel.shape[1], freq='D')
+    frames = {token: pd.DataFrame({'price': panel[i]}, index=index) for i, token in enumerate(TOKENS)}
+    frames['BTC'] = frames['BTC'].iloc[10:]
+
+    covariance = EWMACovariance(TOKENS)
+    assert covariance.seed_from_frames(frames)
+    expected = EWMACovariance(TOKENS)
+    expected.seed(panel[:, 10:])
+    np.testing.assert_allclose(covariance.cov, expected.cov)
+    assert covariance._current_bar == int(index[-1].timestamp() // DAY)
+
+    assert not EWMACovariance(TOKENS).seed_from_frames(dict(frames, USDC=None))
+
+
+def test_fallback_frames_never_seed_the_estimate():
+    """With CoinGecko down every frame is mock data; the estimate must stay un-ready until real history arrives"""
+    generator = SignalGenerator(TOKENS)
+    generator._fetch_market_chart = lambda token, days: None
+    frames = generator.fetch_price_data_batch(TOKENS, days=60)
+    assert all(SignalGenerator.is_fallback(frame) for frame in frames.values())
+
+    covariance = EWMACovariance(TOKENS)
+    assert not covariance.seed_from_frames(frames)
+    assert not covariance.ready and covariance.updates == 0 and covariance.version == 0
+
+    # One mock frame among real ones is enough to wait for the next refresh
+    panel = make_panel()
+    index = pd.date_range('2024-01-01', periods=panel.shape[1], freq='D')
+    real = {token: pd.DataFrame({'price': panel[i]}, index=index) for i, token in enumerate(TOKENS)}
+    assert not covariance.seed_from_frames(dict(real, BTC=frames['BTC']))
+    assert not covariance.ready
+
+    assert covariance.seed_from_frames(real)
+    assert covariance.ready
+
+
+def test_mpt_targets_are_recomputed_when_the_covariance_version_changes():
+    panel = make_panel()
+    covariance = seeded(panel)
+    engine = RebalanceEngine(covariance=covariance)
+    signals = {token: {'total_score': score} for token, score in zip(TOKENS, [0.8, 0.2, -0.4, 0.1, 0.0])}
+    prices = dict(zip(TOKENS, panel[:, -1]))
+
+    first = engine.get_strategy_targets('mpt', TOKENS, signals, prices, 75, signals_version=1)
+    assert engine.get_strategy_targets('mpt', TOKENS, signals, prices, 75, signals_version=1) == first
+    assert engine.target_cache_stats()['hits'] == 1
+
+    # Same bar: the covariance version is unchanged, so the memo still applies
+    covariance.observe({token: price * 1.5 for token, price in prices.items()}, (panel.shape[1] - 1) * DAY + 60)
+    engine.get_strategy_targets('mpt', TOKENS, signals, prices, 75, signals_version=1)
+    assert engine.target_cache_stats() == {'hits': 2, 'misses': 1, 'hit_rate': 0.667, 'entries': 1}
+
+    # New bar: the x1.5 close shifts the estimate and the targets are recomputed from it
+    covariance.observe(prices, panel.shape[1] * DAY)
+    second = engine.get_strategy_targets('mpt', TOKENS, signals, prices, 75, signals_version=1)
+    stats = engine.target_cache_stats()
+    assert (stats['misses'], stats['entries']) == (2, 2)
+    assert second == engine.apply_rebalance_strategy(TOKENS, signals, prices, strategy='mpt', risk_profile=75)
+    assert second != first
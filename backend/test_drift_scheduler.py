@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+import pytest
+
+from models.drift_scheduler import DriftScheduler, breach_move
+
+BAND = 0.05
+
+
+def random_weights(rng, n):
+    weights = rng.dirichlet(np.ones(n))
+    targets = np.clip(weights + rng.uniform(-BAND, BAND, n), 0, None)
+    return weights, targets / targets.sum()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_no_price_move_below_the_breach_move_leaves_the_band(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(2000):
+        n = int(rng.integers(2, 7))
+        weights, targets = random_weights(rng, n)
+        move = breach_move(dict(enumerate(weights)), dict(enumerate(targets)), BAND)
+        if move == 0 or math.isinf(move):
+            continue
+
+        log_returns = rng.uniform(-move, move, n)
+        log_returns[rng.integers(n)] = rng.choice([-move, move])  # At least one asset moves the full amount
+        moved = weights * np.exp(log_returns * (1 - 1e-9))
+        assert np.abs(moved / moved.sum() - targets).max() <= BAND + 1e-12
+
+
+def test_breach_move_is_tight_for_two_assets():
+    weights, targets = {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 0.5, 'ETH': 0.5}
+    move = breach_move(weights, targets, BAND)
+    moved = 0.5 * math.exp(2 * move * 1.001)
+    assert moved / (moved + 0.5) - 0.5 > BAND
+    assert breach_move({'BTC': 0.6, 'ETH': 0.4}, targets, BAND) == 0.0
+
+
+def test_only_bots_past_their_deadline_are_due():
+    scheduler = DriftScheduler(BAND)
+    prices = {'BTC': 100.0, 'ETH': 100.0}
+    assert scheduler.advance(prices, epoch=1)
+    scheduler.schedule('near', {'BTC': 0.54, 'ETH': 0.46}, {'BTC': 0.5, 'ETH': 0.5})
+    scheduler.schedule('far', {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 0.5, 'ETH': 0.5})
+
+    assert not scheduler.advance({'BTC': 103.0, 'ETH': 100.0}, epoch=1)
+    assert [key for key, _ in scheduler.pop_due()] == ['near']
+    assert not scheduler.advance({'BTC': 100.0, 'ETH': 100.0}, epoch=1)
+    assert scheduler.pop_due() == []  # The clock only moves forward, even when prices come back
+    assert len(scheduler) == 1
+
+
+def test_new_epoch_or_price_universe_rebuilds():
+    scheduler = DriftScheduler(BAND)
+    prices = {'BTC': 100.0, 'ETH': 100.0}
+    scheduler.advance(prices, epoch=1)
+    scheduler.schedule('bot', {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 0.5, 'ETH': 0.5})
+
+    assert scheduler.advance(prices, epoch=2) and len(scheduler) == 0
+    scheduler.schedule('bot', {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 0.5, 'ETH': 0.5})
+    assert scheduler.advance(dict(prices, ADA=0.7), epoch=2)
+
+
+def test_mark_due_and_forget():
+    scheduler = DriftScheduler(BAND)
+    scheduler.advance({'BTC': 100.0, 'ETH': 100.0}, epoch=1)
+    scheduler.schedule('bot', {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 0.5, 'ETH': 0.5}, payload='old')
+    scheduler.mark_due('bot', payload='resumed')
+    scheduler.mark_due('gone')
+    scheduler.forget('gone')
+
+    assert scheduler.pop_due() == [('bot', 'resumed')]
+    assert len(scheduler) == 0
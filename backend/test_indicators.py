@@ -0,0 +1,217 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from signals.indicators import IndicatorState
+from signals.strategy import SignalGenerator
+
+WINDOWS = {'mean_reversion': 14, 'momentum': 14, 'volatility': 14, 'breakout': 20}
+
+
+def random_walk(n, volatility, seed, start=100.0):
+    rng = np.random.default_rng(seed)
+    prices = start * np.cumprod(1 + rng.normal(0.001, volatility, n))
+    index = pd.date_range('2024-01-01', periods=n, freq='D')
+    return pd.Series(np.maximum(prices, 0.01), index=index)
+
+
+def pandas_signals(generator, prices):
+    return {
+        'mean_reversion': generator.calculate_mean_reversion(prices, WINDOWS['mean_reversion']),
+        'momentum': generator.calculate_momentum(prices, WINDOWS['momentum']),
+        'volatility': generator.calculate_volatility(prices, WINDOWS['volatility']),
+        'breakout': generator.calculate_breakout(prices, WINDOWS['breakout'])
+    }
+
+
+def assert_signals_match(expected, actual):
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+
+
+@pytest.mark.parametrize('volatility,seed', [(0.05, 1), (0.02, 2), (0.001, 3), (0.12, 4)])
+def test_streaming_matches_pandas_every_bar(volatility, seed):
+    generator = SignalGenerator()
+    prices = random_walk(300, volatility, seed)
+    state = IndicatorState(WINDOWS)
+
+    for i, (timestamp, price) in enumerate(prices.items()):
+        state.update(price, timestamp)
+        assert_signals_match(pandas_signals(generator, prices.iloc[:i + 1]), state.signals())
+
+
+def test_flat_and_zero_loss_windows_match_pandas():
+    generator = SignalGenerator()
+    index = pd.date_range('2024-01-01', periods=60, freq='D')
+    flat = pd.Series(1.0, index=index)
+    rising = pd.Series(np.linspace(100, 160, 60), index=index)
+
+    for prices in (flat, rising):
+        state = IndicatorState.from_series(prices, WINDOWS)
+        assert_signals_match(pandas_signals(generator, prices), state.signals())
+
+
+def test_generate_signals_incremental_matches_pandas_path():
+    prices = random_walk(60, 0.05, 7)
+    frame = pd.DataFrame({'price': prices})
+
+    results = {}
+    for incremental in (True, False):
+        generator = SignalGenerator(['BTC'])
+        generator.use_incremental_indicators = incremental
+        generator.fetch_price_data_batch = lambda tokens, days=30: {token: frame for token in tokens}
+        results[incremental] = generator.generate_signals()['BTC']
+
+    for key in ('mean_reversion', 'momentum', 'volatility', 'breakout', 'total_score', 'ml_confidence'):
+        assert results[True][key] == pytest.approx(results[False][key], abs=1e-9)
+
+
+def test_state_advances_only_new_bars():
+    generator = SignalGenerator(['BTC'])
+    prices = random_walk(80, 0.05, 11)
+
+    state = generator._update_indicator_state('BTC', prices.iloc[:60])
+    assert generator._update_indicator_state('BTC', prices) is state
+    assert state.count == 80
+    assert_signals_match(pandas_signals(generator, prices), state.signals())
+
+
+def test_panel_path_matches_per_token_path():
+    tokens = [f'T{i}' for i in range(20)]
+    frames = {token: pd.DataFrame({'price': random_walk(60, 0.001 + 0.01 * i, 100 + i)})
+              for i, token in enumerate(tokens)}
+    frames['T0'] = pd.DataFrame({'price': pd.Series(1.0, index=frames['T1'].index)})  # flat series
+
+    results = {}
+    for panel_min_tokens in (1, 10_000):
+        generator = SignalGenerator(tokens)
+        generator.panel_min_tokens = panel_min_tokens
+        generator.use_incremental_indicators = False
+        generator.fetch_price_data_batch = lambda batch, days=30: {token: frames[token] for token in batch}
+        results[panel_min_tokens] = generator.generate_signals()
+
+    for token in tokens:
+        for key in ('mean_reversion', 'momentum', 'volatility', 'breakout', 'total_score', 'ml_confidence'):
+            assert results[1][token][key] == pytest.approx(results[10_000][token][key], abs=1e-9), (token, key)
+
+
+@pytest.mark.parametrize('volatility,seed', [(0.05, 21), (0.001, 22)])
+def test_repricing_the_forming_bar_matches_pandas(volatility, seed):
+    generator = SignalGenerator()
+    prices = random_walk(200, volatility, seed)
+    forming = prices * (1 + np.random.default_rng(seed).normal(0, volatility, len(prices)))
+    forming.iloc[::7] = prices.iloc[::7]  # Some reprices land on the same value (flat-run bookkeeping)
+    state = IndicatorState(WINDOWS)
+
+    for i, timestamp in enumerate(prices.index):
+        state.update(forming.iloc[i], timestamp)
+        provisional = pd.concat([prices.iloc[:i], forming.iloc[i:i + 1]])
+        assert_signals_match(pandas_signals(generator, provisional), state.signals())
+        state.replace(prices.iloc[i], timestamp)
+        assert_signals_match(pandas_signals(generator, prices.iloc[:i + 1]), state.signals())
+
+
+def test_a_forming_sample_is_repriced_instead_of_reseeding():
+    """Live histories end with a 'now' sample whose timestamp and price move on every fetch"""
+    generator = SignalGenerator(['BTC'])
+    closes = random_walk(90, 0.05, 31)
+    rng = np.random.default_rng(32)
+
+    state = None
+    for day in range(60, 63):
+        for minutes in (5, 65, 600):
+            now = closes.index[day] + pd.Timedelta(minutes=minutes)
+            live = pd.concat([closes.iloc[day - 59:day + 1],
+                              pd.Series([closes.iloc[day] * (1 + rng.normal(0, 0.02))], index=[now])])
+            updated = generator._update_indicator_state('BTC', live)
+            assert state is None or updated is state
+            state = updated
+
+            # Indicators run on one price per bar: the 'now' sample stands in for its bar's 00:00 sample
+            per_bar = pd.concat([closes.iloc[:day], live.iloc[-1:]])
+            assert_signals_match(pandas_signals(generator, per_bar), state.signals())
+    assert state.count == 62  # Seeded with 60 bars, then one new bar per day
+
+
+def test_concurrent_generate_signals_share_indicator_state_safely():
+    tokens = ['BTC', 'ETH', 'ADA']
+    frames = {token: pd.DataFrame({'price': random_walk(60, 0.03, 40 + i)}) for i, token in enumerate(tokens)}
+    generator = SignalGenerator(tokens)
+    generator.fetch_price_data_batch = lambda batch, days=30: {token: frames[token] for token in batch}
+    expected = generator.generate_signals()
+
+    results, errors = [], []
+
+    def worker():
+        try:
+            for _ in range(20):
+                generator.snapshot_cache.invalidate()
+                results.append(generator.generate_signals())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    for result in results:
+        for token in tokens:
+            assert result[token]['total_score'] == expected[token]['total_score']
+
+
+def market_chart_with_a_forming_sample(days, seed, now_offset_hours=15):
+    """CoinGecko daily payload: one 00:00 UTC sample per day plus a 'now' sample later in the current day"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01').value // 10**6  # ms
+    stamps = [start + day * 86400 * 1000 for day in range(days)]
+    stamps.append(stamps[-1] + now_offset_hours * 3600 * 1000)
+    prices = 100 * np.cumprod(1 + rng.normal(0.001, 0.04, len(stamps)))
+    return {'prices': [[ts, price] for ts, price in zip(stamps, prices.tolist())]}
+
+
+@pytest.fixture(params=['UTC', 'America/New_York'])
+def local_timezone(request, monkeypatch):
+    """Bars must come out the same whatever the machine's timezone (local-time math shifts midnight samples)"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip('needs time.tzset')
+    monkeypatch.setenv('TZ', request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_fetched_history_is_one_utc_price_per_bar(local_timezone):
+    payload = market_chart_with_a_forming_sample(60, 51)
+    generator = SignalGenerator(['BTC'])
+    generator._fetch_market_chart = lambda token, days: payload
+
+    frame = generator.fetch_price_data('BTC', 60)
+    assert len(frame) == 60
+    assert list(frame.index) == list(pd.date_range('2024-01-01', periods=60, freq='D'))
+    assert frame['price'].iloc[-1] == payload['prices'][-1][1]  # The 'now' sample stands for the forming bar
+    assert frame['price'].iloc[-2] == payload['prices'][-3][1]
+
+
+def test_every_signal_path_agrees_on_a_payload_with_two_samples_in_the_current_bar(local_timezone):
+    tokens = [f'T{i}' for i in range(16)]
+    payloads = {token: market_chart_with_a_forming_sample(60, 60 + i) for i, token in enumerate(tokens)}
+
+    results = {}
+    for path in ('incremental', 'pandas', 'panel'):
+        generator = SignalGenerator(tokens)
+        generator.concurrent_fetch = False
+        generator._fetch_market_chart = lambda token, days: payloads[token]
+        generator.use_incremental_indicators = path == 'incremental'
+        generator.panel_min_tokens = len(tokens) if path == 'panel' else 10_000
+        results[path] = generator.generate_signals()
+
+    for token in tokens:
+        for key in ('mean_reversion', 'momentum', 'volatility', 'breakout', 'total_score', 'ml_confidence'):
+            assert results['incremental'][token][key] == pytest.approx(results['pandas'][token][key], abs=1e-9)
+            assert results['panel'][token][key] == pytest.approx(results['pandas'][token][key], abs=1e-9)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from models.monte_carlo import MonteCarloEvaluator
+
+WEIGHTS = {'BTC': 0.32, 'ETH': 0.28, 'ADA': 0.18, 'DOT': 0.12, 'USDC': 0.10}
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+SIGNALS = {asset: {'total_score': score, 'momentum': score, 'mean_reversion': -score, 'volatility': 0.4}
+           for asset, score in zip(WEIGHTS, [0.4, 0.1, -0.3, 0.0, 0.0])}
+
+
+def test_every_strategy_gets_distributions_and_impacts():
+    result = MonteCarloEvaluator(n_paths=500, horizon=20).evaluate(WEIGHTS, SIGNALS, PRICES, seed=1)
+
+    assert set(result['strategies']) == {'shannon', 'threshold', 'mpt', 'risk_parity', 'momentum', 'tactical'}
+    assert result['hold']['turnover']['mean'] == 0 and result['hold']['rebalances'] == 0
+    for summary in result['strategies'].values():
+        for key in ('total_return', 'annual_volatility', 'max_drawdown', 'turnover', 'sharpe_ratio'):
+            distribution = summary[key]
+            assert distribution['p5'] <= distribution['p50'] <= distribution['p95']
+        assert summary['max_drawdown']['p5'] >= 0
+        assert sum(summary['target_weights'].values()) == pytest.approx(100, abs=0.5)
+        assert set(summary['impact']) == {'total_return', 'annual_volatility', 'max_drawdown', 'sharpe_ratio'}
+
+
+def test_seeded_runs_repeat():
+    evaluator = MonteCarloEvaluator(n_paths=300, horizon=10)
+    first = evaluator.evaluate(WEIGHTS, SIGNALS, PRICES, strategies=['tactical'], seed=3)
+    second = evaluator.evaluate(WEIGHTS, SIGNALS, PRICES, strategies=['tactical'], seed=3)
+    assert first['strategies'] == second['strategies']
+
+
+def test_simulation_matches_a_path_by_path_loop():
+    evaluator = MonteCarloEvaluator(fee_rate=0.002, threshold=0.05)
+    rng = np.random.default_rng(0)
+    growth = np.exp(rng.normal(0, 0.05, (15, 3, 40)))  # bars x assets x paths
+    current, target = np.array([0.5, 0.3, 0.2]), np.array([0.4, 0.4, 0.2])
+    equity, turnover, rebalances = evaluator.simulate(growth, current, target)
+
+    for path in range(growth.shape[2]):
+        weights, value, traded_total, count = current.copy(), 1.0, 0.0, 0
+        for t in range(growth.shape[0] + 1):
+            if t > 0:
+                gross = weights * growth[t - 1, :, path]
+                value *= gross.sum()
+                weights = gross / gross.sum()
+            if np.abs(weights - target).max() > 0.05:
+                traded = np.abs(weights - target).sum()
+                value *= 1 - traded * 0.002
+                traded_total += traded
+                count += 1
+                weights = target.copy()
+            assert equity[t, path] == pytest.approx(value)
+        assert turnover[path] == pytest.approx(traded_total) and rebalances[path] == count
+
+
+def test_flat_market_only_costs_fees():
+    evaluator = MonteCarloEvaluator(fee_rate=0.001)
+    growth = np.ones((10, 2, 5))
+    equity, turnover, rebalances = evaluator.simulate(growth, np.array([0.7, 0.3]), np.array([0.5, 0.5]),
+                                                      every_bar=True)
+    assert turnover == pytest.approx([0.4] * 5) and rebalances.tolist() == [1] * 5
+    assert equity[-1] == pytest.approx(1 - 0.4 * 0.001)
+
+
+def test_rejects_oversized_requests():
+    evaluator = MonteCarloEvaluator()
+    with pytest.raises(ValueError):
+        evaluator.evaluate(WEIGHTS, SIGNALS, PRICES, n_paths=100000, horizon=365)
+    with pytest.raises(ValueError):
+        evaluator.evaluate({}, SIGNALS, PRICES)
+    for n_paths, horizon in ((0, 30), (10, 0), (-5, 30)):
+        with pytest.raises(ValueError):
+            evaluator.evaluate(WEIGHTS, SIGNALS, PRICES, n_paths=n_paths, horizon=horizon)
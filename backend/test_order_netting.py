@@ -0,0 +1,74 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from models.order_netting import OrderNettingBook
+from models.rebalance_planner import RebalancePlanner
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00}
+
+
+def random_book(seed, bots=30):
+    rng = np.random.default_rng(seed)
+    planner = RebalancePlanner()
+    book = OrderNettingBook(planner)
+    assets = list(PRICES)
+    for b in range(bots):
+        current = rng.dirichlet(np.ones(len(assets)))
+        targets = rng.dirichlet(np.ones(len(assets))) * 100
+        book.add(f"bot_{b}", planner.plan(dict(zip(assets, current.tolist())), dict(zip(assets, targets.tolist())),
+                                          PRICES, total_value=float(rng.uniform(1000, 50000))))
+    return planner, book
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_every_order_is_filled_and_crossing_balances(seed):
+    planner, book = random_book(seed)
+    orders = list(book.orders)
+    plans, stats = book.settle()
+
+    assert sum(len(plan) for plan in plans.values()) == len(orders) == stats['orders']
+
+    crossed = defaultdict(float)
+    remaining = {owner: iter(plan) for owner, plan in plans.items()}
+    for owner, trade in orders:
+        fill = next(remaining[owner])
+        assert (fill['asset'], fill['action'], fill['value'], fill['amount']) == \
+            (trade['asset'], trade['action'], trade['value'], trade['amount'])
+        assert 0 <= fill['crossed_value'] <= fill['value'] + 0.01
+        crossed[(fill['asset'], fill['action'])] += fill['crossed_value']
+
+    for asset in PRICES:
+        assert crossed[(asset, 'BUY')] == pytest.approx(crossed[(asset, 'SELL')], abs=0.01 * len(orders))
+    assert stats['execution_orders'] <= len(PRICES)
+    assert stats['cost'] <= stats['unnetted_cost'] + 0.01
+
+
+def test_residual_costs_are_split_pro_rata():
+    planner = RebalancePlanner()
+    book = OrderNettingBook(planner)
+    trade = {'asset': 'BTC', 'action': 'BUY', 'amount': 0.01, 'price': PRICES['BTC'], 'fee': 1.0, 'slippage': 1.0}
+    book.add('small', [dict(trade, value=1000.0)])
+    book.add('large', [dict(trade, value=3000.0)])
+    book.add('seller', [dict(trade, action='SELL', value=2000.0)])
+    plans, stats = book.settle()
+
+    assert stats['execution_orders'] == 1 and stats['executed_value'] == 2000.0
+    assert plans['seller'][0]['fee'] == 0 and plans['seller'][0]['slippage'] == 0
+    assert plans['large'][0]['fee'] == pytest.approx(3 * plans['small'][0]['fee'], abs=0.01)
+    assert plans['small'][0]['crossed_value'] == 500.0 and plans['large'][0]['crossed_value'] == 1500.0
+
+
+def test_fully_offsetting_bots_never_reach_the_market():
+    planner = RebalancePlanner()
+    plan = planner.plan({'BTC': 0.6, 'ETH': 0.4}, {'BTC': 50.0, 'ETH': 50.0}, PRICES, total_value=20000)
+    mirror = [dict(trade, action='BUY' if trade['action'] == 'SELL' else 'SELL') for trade in plan]
+    book = OrderNettingBook(planner)
+    book.add('a', plan)
+    book.add('b', mirror)
+    plans, stats = book.settle()
+
+    assert stats['execution_orders'] == 0 and stats['cost'] == 0
+    assert stats['crossed_value'] == stats['gross_value']
+    assert all(trade['fee'] == 0 and trade['slippage'] == 0 for trade in plans['a'] + plans['b'])
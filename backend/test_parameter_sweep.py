@@ -0,0 +1,84 @@
+import pandas as pd
+
+from models.backtest_engine import BacktestEngine
+from models.parameter_sweep import ParameterSweep
+from services.synthetic_market import SyntheticMarket
+from signals.indicators import DEFAULT_SCORE_WEIGHTS, DEFAULT_WINDOWS
+
+TOKENS = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+ALT_WEIGHTS = {'mean_reversion': 0.4, 'momentum': 0.4, 'volatility': 0.1, 'breakout': 0.1}
+
+
+def make_panel(bars=150, seed=3):
+    market = SyntheticMarket(seed=seed, drift=[0.001, 0.001, 0.001, 0.001, 0.0],
+                             volatility=[0.04, 0.05, 0.06, 0.06, 0.001], correlation=0.5)
+    return market.generate(len(TOKENS), bars, [45000, 3000, 1.2, 25.0, 1.0])
+
+
+def small_grid():
+    return ParameterSweep.build_grid(window_grid={'mean_reversion': [7, 14], 'breakout': [20, 30]},
+                                     weight_vectors=[DEFAULT_SCORE_WEIGHTS, ALT_WEIGHTS], risk_profiles=[25, 75],
+                                     strategies=['tactical', 'momentum'])
+
+
+def test_grid_is_the_cartesian_product_of_every_dimension():
+    grid = small_grid()
+    assert len(grid) == 2 * 2 * 2 * 2 * 2
+    assert {(p['windows']['mean_reversion'], p['windows']['breakout']) for p in grid} == {(7, 20), (7, 30),
+                                                                                         (14, 20), (14, 30)}
+    assert all(p['windows']['momentum'] == DEFAULT_WINDOWS['momentum'] for p in grid)
+    assert {p['strategy'] for p in grid} == {'tactical', 'momentum'}
+    assert len({(tuple(sorted(p['windows'].items())), tuple(p['weights'].values()), p['risk_profile'], p['strategy'])
+                for p in grid}) == len(grid)
+
+    grid[0]['weights']['momentum'] = 99  # Every point owns its weights
+    assert DEFAULT_SCORE_WEIGHTS['momentum'] != 99
+
+
+def test_an_empty_grid_spec_is_todays_defaults():
+    assert ParameterSweep.build_grid() == [{'windows': dict(DEFAULT_WINDOWS), 'weights': dict(DEFAULT_SCORE_WEIGHTS),
+                                            'risk_profile': 50, 'strategy': 'tactical'}]
+
+
+def test_batches_never_mix_window_combinations():
+    grid = small_grid()
+    batches = ParameterSweep(TOKENS, make_panel(), max_workers=2)._batches(grid)
+    assert sum(len(batch) for batch in batches) == len(grid)
+    for batch in batches:
+        assert len({tuple(sorted(point['windows'].items())) for point in batch}) == 1
+
+
+def test_results_are_ranked_and_match_direct_backtests():
+    panel = make_panel()
+    grid = small_grid()
+    table = ParameterSweep(TOKENS, panel, max_workers=1).run(grid)
+
+    assert len(table) == len(grid)
+    assert list(table['rank']) == list(range(1, len(grid) + 1))
+    assert table['sharpe_ratio'].is_monotonic_decreasing and table['sharpe_ratio'].nunique() > 1
+    assert not any(column.endswith('_curve') for column in table.columns)
+
+    backtester = BacktestEngine()
+    for _, row in table.iloc[[0, -1]].iterrows():
+        windows = {key: int(row[f'{key}_window']) for key in DEFAULT_WINDOWS}
+        weights = {key: row[f'{key}_weight'] for key in DEFAULT_SCORE_WEIGHTS}
+        history = backtester.precompute_signals(panel, windows, weights)
+        expected = backtester.run(TOKENS, panel, row['strategy'], row['risk_profile'], signal_history=history,
+                                  windows=windows)
+        for key in ('total_return', 'sharpe_ratio', 'max_drawdown', 'rebalances'):
+            assert row[key] == expected[key], key
+
+
+def test_rank_by_another_column():
+    table = ParameterSweep(TOKENS, make_panel(), max_workers=1).run(small_grid(), rank_by='max_drawdown',
+                                                                    ascending=True)
+    assert table['max_drawdown'].is_monotonic_increasing
+    assert table.loc[0, 'rank'] == 1
+
+
+def test_worker_pool_matches_a_single_process_run():
+    panel = make_panel()
+    grid = ParameterSweep.build_grid(window_grid={'momentum': [7, 14]}, risk_profiles=[25, 75])
+    single = ParameterSweep(TOKENS, panel, max_workers=1).run(grid)
+    pooled = ParameterSweep(TOKENS, panel, max_workers=2).run(grid)
+    pd.testing.assert_frame_equal(single, pooled)
@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+from models.performance_rollup import DAY, PerformanceRollup
+from models.virtual_account import VirtualAccountManager
+
+START = 1700438400  # Monday 2023-11-20 00:00 UTC
+
+
+def hourly(hours, start=START):
+    return [{'timestamp': start + h * 3600, 'value': 1000.0 + h % 24, 'pnl': 0, 'pnl_percent': 0}
+            for h in range(hours)]
+
+
+def test_a_year_of_hourly_records_stays_bounded_and_ordered():
+    rollup = PerformanceRollup(raw_days=7, daily_days=84)
+    history = []
+    for record in hourly(365 * 24):
+        history.append(record)
+        rollup.maintain(history)
+
+    resolutions = [record.get('resolution', 'raw') for record in history]
+    assert resolutions == sorted(resolutions, key=['weekly', 'daily', 'raw'].index)
+    assert resolutions.count('raw') <= 8 * 24 and resolutions.count('daily') <= 84 + 7
+    assert len(history) <= 8 * 24 + 91 + 53  # Raw week, daily quarter, weekly year
+    assert sum(record.get('count', 1) for record in history) == 365 * 24
+    timestamps = [record['timestamp'] for record in history]
+    assert timestamps == sorted(timestamps)
+    assert history[-1]['timestamp'] - history[0]['timestamp'] > 350 * DAY
+
+
+def test_rolled_records_carry_ohlc_and_events():
+    rollup = PerformanceRollup(raw_days=1, daily_days=7)
+    history = hourly(24)
+    history[5]['value'] = 5000.0
+    history[6]['value'] = 10.0
+    history[7]['event'] = 'resumed'
+    history.append({'timestamp': START + 3 * DAY, 'value': 1.0})
+
+    splices = rollup.maintain(history)
+    assert [(start, stop) for start, stop, _ in splices] == [(0, 24)]
+    day = history[0]
+    assert (day['open'], day['high'], day['low'], day['close']) == (1000.0, 5000.0, 10.0, 1023.0)
+    assert day['value'] == 1023.0 and day['count'] == 24 and day['events'] == ['resumed']
+    assert day['resolution'] == 'daily' and day['period_start'] == START
+    assert 'event' not in day
+
+
+def test_weeks_roll_up_from_daily_records():
+    rollup = PerformanceRollup(raw_days=1, daily_days=7)
+    history = []
+    for record in hourly(22 * 24):
+        history.append(record)
+        rollup.maintain(history)
+    weekly = [record for record in history if record.get('resolution') == 'weekly']
+    assert [record['period_start'] for record in weekly] == [START, START + 7 * DAY]
+    assert all(record['count'] == 7 * 24 for record in weekly)
+    assert weekly[0]['high'] == 1023.0 and weekly[0]['low'] == 1000.0
+
+
+def test_appends_within_a_day_do_nothing():
+    rollup = PerformanceRollup()
+    history = hourly(30 * 24)  # Loaded without a policy
+    assert rollup.maintain(history, now=START + 30 * DAY)
+    before = list(history)
+    history.append({'timestamp': history[-1]['timestamp'] + 60, 'value': 1.0})
+    assert rollup.maintain(history) == [] and history[:-1] == before
+
+
+@pytest.mark.parametrize('storage', ['journal', 'sqlite'])
+def test_rollups_are_persisted(tmp_path, storage):
+    now = time.time()
+    start = now - 30 * DAY
+    accounts = {'alice': {'user_id': 'alice', 'account_id': 'a1', 'balance': 0.0, 'initial_balance': 100000,
+                          'trade_history': [], 'performance_history': [], 'created_at': start,
+                          'bots': [{'bot_id': 'b1', 'status': 'active', 'allocated_fund': 1000.0, 'assets': {},
+                                    'performance_history': hourly(30 * 24 - 1, start=start)}]}}
+    (tmp_path / 'accounts.json').write_text(json.dumps(accounts))
+
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False, storage=storage)
+    history = manager.accounts['alice']['bots'][0]['performance_history']
+    assert len(history) < 8 * 24 + 30
+    manager._update_all_portfolios(prices={'BTC': 1.0})
+    manager.close()
+
+    restored = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                     storage=storage)
+    assert restored.accounts['alice']['bots'][0]['performance_history'] == history
+    assert restored.accounts['alice']['performance_history'] == manager.accounts['alice']['performance_history']
+    restored.close()
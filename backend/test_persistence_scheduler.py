@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+
+import pytest
+
+from models.virtual_account import VirtualAccountManager
+from services.persistence_scheduler import PersistenceScheduler
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00, 'WBTC': 109400, 'LINK': 14.0}
+
+
+class RecordingStore:
+    def __init__(self):
+        self.batches = []
+
+    def append_encoded(self, payloads):
+        self.batches.append([json.loads(payload) for payload in payloads])
+
+
+class RejectingStore(RecordingStore):
+    """Rejects a whole batch (like a rolled-back transaction) if any op's value is 'bad'"""
+
+    def __init__(self, error=ValueError):
+        super().__init__()
+        self.error = error
+
+    def append_encoded(self, payloads):
+        if any(json.loads(payload).get('value') == 'bad' for payload in payloads):
+            raise self.error("rejected")
+        super().append_encoded(payloads)
+
+
+def test_a_burst_is_one_write_with_superseded_sets_dropped():
+    store = RecordingStore()
+    scheduler = PersistenceScheduler(store, threading.RLock(), window=60)
+    assets = {'BTC': 1.0}
+    for amount in (2.0, 3.0, 4.0):
+        assets['BTC'] = amount
+        scheduler.record({'op': 'set', 'path': ['alice', 'bots', 'b1', 'assets'], 'value': assets})
+        scheduler.record({'op': 'append', 'path': ['alice', 'trade_history'], 'value': {'amount': amount}})
+    scheduler.record({'op': 'set', 'path': ['bob', 'balance'], 'value': 5.0})
+    assert store.batches == []
+
+    assert scheduler.flush() == 5
+    [batch] = store.batches
+    assert [op['value'] for op in batch if op['path'][-1] == 'assets'] == [{'BTC': 4.0}]
+    assert [op['value']['amount'] for op in batch if op['op'] == 'append'] == [2.0, 3.0, 4.0]
+    stats = scheduler.stats()
+    assert stats['coalesced'] == 2 and stats['accounts_flushed'] == 2 and stats['writes_avoided'] == 6
+    scheduler.close()
+
+
+def test_values_are_captured_when_recorded():
+    store = RecordingStore()
+    scheduler = PersistenceScheduler(store, threading.RLock(), window=60)
+    account = {'bots': []}
+    scheduler.record({'op': 'create_account', 'user_id': 'alice', 'account': account})
+    account['bots'].append({'bot_id': 'b1'})
+    scheduler.flush()
+    assert store.batches[0][0]['account'] == {'bots': []}
+    scheduler.close()
+
+
+def test_the_worker_flushes_once_per_window_and_close_flushes_the_rest():
+    store = RecordingStore()
+    scheduler = PersistenceScheduler(store, threading.RLock(), window=0.05)
+    for i in range(20):
+        scheduler.record({'op': 'append', 'path': ['alice', 'trade_history'], 'value': i})
+    deadline = time.time() + 5
+    while not store.batches and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(store.batches) == 1 and len(store.batches[0]) == 20
+
+    scheduler.record({'op': 'append', 'path': ['alice', 'trade_history'], 'value': 20})
+    scheduler.close()
+    assert store.batches[-1] == [{'op': 'append', 'path': ['alice', 'trade_history'], 'value': 20}]
+    scheduler.record({'op': 'append', 'path': ['alice', 'trade_history'], 'value': 21})  # Written through after close
+    assert len(store.batches) == 3
+
+
+def test_a_rejected_op_is_quarantined_and_the_rest_commit():
+    store = RejectingStore()
+    scheduler = PersistenceScheduler(store, threading.RLock(), window=60)
+    scheduler.record({'op': 'set', 'path': ['alice', 'balance'], 'value': 1.0})
+    scheduler.record({'op': 'set', 'path': ['alice', 'note'], 'value': 'bad'})
+    scheduler.record({'op': 'set', 'path': ['alice', 'status'], 'value': 'ok'})
+    scheduler.record({'op': 'set', 'path': ['bob', 'balance'], 'value': 2.0})
+
+    assert scheduler.flush() == 3
+    written = [op['value'] for batch in store.batches for op in batch]
+    assert written == [1.0, 'ok', 2.0]
+    assert [json.loads(op)['path'] for op, _ in scheduler.quarantine] == [['alice', 'note']]
+    assert scheduler.stats()['quarantined'] == 1 and scheduler.pending == 0
+
+    # Later flushes aren't stuck on it
+    scheduler.record({'op': 'set', 'path': ['alice', 'balance'], 'value': 3.0})
+    assert scheduler.flush() == 1 and store.batches[-1][0]['value'] == 3.0
+    scheduler.close()
+
+
+def test_a_store_outage_keeps_the_ops_pending():
+    store = RejectingStore(error=OSError)
+    scheduler = PersistenceScheduler(store, threading.RLock(), window=60)
+    scheduler.record({'op': 'set', 'path': ['alice', 'balance'], 'value': 'bad'})
+    with pytest.raises(OSError):
+        scheduler.flush()
+    assert scheduler.pending == 1 and scheduler.quarantined == 0
+    store.error = ValueError
+    scheduler.close()
+    assert scheduler.quarantined == 1
+
+
+def test_a_splice_sqlite_rejects_does_not_block_the_batch(tmp_path):
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                    storage='sqlite', persist_interval=60)
+    manager.create_account('alice')
+    with manager._lock:
+        manager._record('splice', path=['alice', 'performance_history'], start=0, stop=0, value=[{'timestamp': 1.0}])
+        manager._record('set', path=['alice', 'balance'], value=42.0)
+    manager.persistence.flush()
+    assert manager.persistence.quarantined == 1
+    assert manager.store.load()['alice']['balance'] == 42.0
+    manager.close()
+
+
+def test_a_compaction_with_buffered_changes_does_not_replay_them_twice(tmp_path):
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                    storage='journal', persist_interval=60)
+    manager._get_current_prices = lambda: dict(PRICES)
+    manager.create_account('alice')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    assert manager.persistence.pending > 0
+
+    manager.store.compact()  # As the journal worker would, with changes still buffered
+    manager.execute_virtual_trade('alice', bot['bot_id'], 'BTC', 'BUY', 0.01, PRICES['BTC'])
+    manager.persistence.flush()
+    manager.store.sync()
+    manager.store._closed.set()  # Crash: no final compaction
+    manager.persistence._closed.set()
+
+    restored = VirtualAccountManager(data_file=manager.data_file, start_updates=False, storage='journal')
+    account = restored.accounts['alice']
+    assert len(account['bots']) == 1 and len(account['trade_history']) == 1
+    assert account['bots'][0]['assets'] == manager.accounts['alice']['bots'][0]['assets']
@@ -0,0 +1,204 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from models.covariance import EWMACovariance
+from models.portfolio_optimizer import (MAX_WEIGHT, MIN_WEIGHT, box_bounds, equal_risk_contribution,
+                                        equal_risk_contribution_batch, max_sharpe, mean_variance, min_variance,
+                                        optimize, project_to_box_simplex, risk_contributions, sharpe_ratio)
+from models.rebalance_engine import RebalanceEngine
+from services.synthetic_market import SyntheticMarket
+
+
+def random_covariance(n, seed, vols=None):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n, 2 * n))
+    corr = factors @ factors.T
+    scale = 1 / np.sqrt(np.diag(corr))
+    corr = corr * np.outer(scale, scale)
+    vols = np.asarray(vols) if vols is not None else rng.uniform(0.01, 0.08, n)
+    return corr * np.outer(vols, vols)
+
+
+def feasible_grid(n, lower, upper, step=0.0025):
+    """Every point of a step-spaced grid on {sum(w) = 1, lower <= w <= upper}"""
+    values = np.arange(lower, upper + step / 2, step)
+    points = np.array([combo + (1 - sum(combo),) for combo in itertools.product(values, repeat=n - 1)])
+    last = points[:, -1]
+    return points[(last >= lower - 1e-12) & (last <= upper + 1e-12)]
+
+
+def assert_in_box(weights, lower=MIN_WEIGHT, upper=MAX_WEIGHT):
+    assert weights.sum() == pytest.approx(1.0, abs=1e-9)
+    assert weights.min() >= lower - 1e-9 and weights.max() <= upper + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_projection_matches_a_brute_force_search(seed):
+    rng = np.random.default_rng(seed)
+    lower, upper = MIN_WEIGHT, MAX_WEIGHT
+    y = rng.normal(0.33, 0.4, 3)
+    projected = project_to_box_simplex(y, lower, upper)
+    assert_in_box(projected, lower, upper)
+
+    grid = feasible_grid(3, lower, upper)
+    distances = ((grid - y) ** 2).sum(axis=1)
+    assert ((projected - y) ** 2).sum() <= distances.min() + 1e-12
+    np.testing.assert_allclose(projected, grid[distances.argmin()], atol=0.0025)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_projection_satisfies_the_optimality_condition(seed):
+    """The projection w of y is the feasible point with (y - w)'(v - w) <= 0 for every feasible v"""
+    rng = np.random.default_rng(100 + seed)
+    n = 6
+    y = rng.normal(1 / n, 0.3, n)
+    projected = project_to_box_simplex(y, MIN_WEIGHT, MAX_WEIGHT)
+    assert_in_box(projected)
+
+    # Feasible vertices: every asset at a bound except one that takes the remainder
+    vertices = []
+    for free in range(n):
+        for bounds in itertools.product([MIN_WEIGHT, MAX_WEIGHT], repeat=n - 1):
+            remainder = 1 - sum(bounds)
+            if MIN_WEIGHT <= remainder <= MAX_WEIGHT:
+                vertices.append(np.insert(np.array(bounds), free, remainder))
+    assert vertices
+    assert max((y - projected) @ (vertex - projected) for vertex in vertices) <= 1e-12
+
+
+def test_projection_keeps_feasible_points_and_handles_loose_bounds():
+    inside = np.array([0.1, 0.2, 0.3, 0.4])
+    np.testing.assert_allclose(project_to_box_simplex(inside, MIN_WEIGHT, MAX_WEIGHT), inside)
+    np.testing.assert_allclose(project_to_box_simplex(np.array([5.0, 5.0]), 0.0, 1.0), [0.5, 0.5])
+    assert box_bounds(2) == (MIN_WEIGHT, 1.0)  # Two assets can't both stay under 40%
+    assert box_bounds(30) == (0.0, MAX_WEIGHT)  # Thirty can't all hold 5%
+
+
+@pytest.mark.parametrize('n,seed', [(3, 1), (5, 2), (8, 3), (12, 4)])
+def test_optimized_weights_are_fully_invested_inside_the_box(n, seed):
+    cov = random_covariance(n, seed)
+    mu = np.random.default_rng(seed).normal(0.002, 0.01, n)
+    lower, upper = box_bounds(n)
+
+    for risk_factor in (0.0, 0.3, 0.7, 1.0):
+        assert_in_box(optimize(mu, cov, risk_factor), lower, upper)
+    assert_in_box(max_sharpe(mu, cov), lower, upper)
+    assert_in_box(min_variance(cov), lower, upper)
+
+
+def test_min_variance_beats_every_feasible_grid_point():
+    cov = random_covariance(3, 7)
+    weights = min_variance(cov)
+    grid = feasible_grid(3, MIN_WEIGHT, MAX_WEIGHT)
+    assert weights @ cov @ weights <= np.einsum('ki,ij,kj->k', grid, cov, grid).min() + 1e-12
+
+
+def test_max_sharpe_beats_every_feasible_grid_point():
+    cov = random_covariance(3, 8)
+    mu = np.array([0.004, 0.001, 0.002])
+    weights = max_sharpe(mu, cov)
+    grid = feasible_grid(3, MIN_WEIGHT, MAX_WEIGHT)
+    best = max(sharpe_ratio(point, mu, cov) for point in grid)
+    assert sharpe_ratio(weights, mu, cov) >= best - 1e-9
+    assert sharpe_ratio(weights, mu, cov) >= sharpe_ratio(min_variance(cov), mu, cov)
+
+
+def test_max_sharpe_without_a_positive_return_falls_back_to_min_variance():
+    cov = random_covariance(4, 9)
+    np.testing.assert_allclose(max_sharpe(np.full(4, -0.01), cov), min_variance(cov))
+
+
+def test_mean_variance_tilts_toward_expected_return():
+    cov = random_covariance(5, 10, vols=[0.03] * 5)
+    mu = np.array([0.02, 0.0, 0.0, 0.0, 0.0])
+    weights = mean_variance(mu, cov, risk_aversion=5.0)
+    assert_in_box(weights)
+    assert weights[0] == pytest.approx(MAX_WEIGHT)
+
+
+def shrunk_covariance(usdc_volatility, seed=3, bars=80):
+    """EWMACovariance.matrix for four coins and a stablecoin with the given daily volatility"""
+    tokens = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+    market = SyntheticMarket(seed=seed, drift=0.0, volatility=[0.03, 0.04, 0.05, 0.05, max(usdc_volatility, 1e-12)],
+                             correlation=0.6)
+    panel = market.generate(len(tokens), bars, [45000, 3000, 1.2, 25.0, 1.0])
+    if usdc_volatility == 0:
+        panel[-1] = 1.0  # Perfectly pegged
+    covariance = EWMACovariance(tokens)
+    covariance.seed(panel)
+    return covariance.matrix(tokens)
+
+
+def assert_equal_contributions(weights, cov):
+    assert weights.sum() == pytest.approx(1.0) and np.all(weights > 0) and np.all(np.isfinite(weights))
+    np.testing.assert_allclose(risk_contributions(weights, cov), 1 / len(weights), rtol=1e-6)
+
+
+@pytest.mark.parametrize('n,seed', [(2, 1), (5, 2), (10, 3), (25, 4)])
+def test_erc_risk_contributions_come_out_equal(n, seed):
+    cov = random_covariance(n, seed)
+    assert_equal_contributions(equal_risk_contribution(cov), cov)
+
+
+@pytest.mark.parametrize('usdc_volatility', [0.001, 1e-7, 0.0])
+def test_erc_handles_a_near_zero_variance_asset(usdc_volatility):
+    cov = shrunk_covariance(usdc_volatility)
+    weights = equal_risk_contribution(cov)
+    assert_equal_contributions(weights, cov)
+    assert weights[-1] == weights.max()  # The flat series needs the biggest weight for the same risk
+
+
+def test_erc_with_a_negatively_correlated_asset():
+    vols = np.array([0.04, 0.03, 1e-5])
+    corr = np.array([[1.0, 0.5, -0.6], [0.5, 1.0, -0.3], [-0.6, -0.3, 1.0]])
+    cov = corr * np.outer(vols, vols) + np.eye(3) * 1e-10
+    assert_equal_contributions(equal_risk_contribution(cov), cov)
+
+
+def test_erc_batch_matches_single_solves():
+    covs = np.stack([random_covariance(5, seed) for seed in range(8)] + [shrunk_covariance(0.0)])
+    batch = equal_risk_contribution_batch(covs)
+    for cov, weights in zip(covs, batch):
+        np.testing.assert_allclose(weights, equal_risk_contribution(cov), atol=1e-9)
+        assert_equal_contributions(weights, cov)
+
+
+def test_warm_starts_need_fewer_sweeps_after_a_small_change():
+    for usdc_volatility in (0.001, 0.0):
+        cov = shrunk_covariance(usdc_volatility, bars=80)
+        moved = shrunk_covariance(usdc_volatility, bars=81)  # One more bar of the same market
+        previous = equal_risk_contribution(cov)
+
+        cold, cold_sweeps = equal_risk_contribution(moved, return_sweeps=True)
+        warm, warm_sweeps = equal_risk_contribution(moved, start=previous, return_sweeps=True)
+        assert warm_sweeps < cold_sweeps
+        np.testing.assert_allclose(warm, cold, atol=1e-7)
+        assert_equal_contributions(warm, moved)
+
+    # Starting from the solution itself converges in one sweep
+    assert equal_risk_contribution(moved, start=warm, return_sweeps=True)[1] == 1
+
+
+def test_engine_warm_starts_risk_parity_from_its_previous_solution():
+    tokens = ['BTC', 'ETH', 'ADA', 'DOT', 'USDC']
+    market = SyntheticMarket(seed=5, drift=0.0, volatility=[0.03, 0.04, 0.05, 0.05, 0.001], correlation=0.6)
+    panel = market.generate(len(tokens), 81, [45000, 3000, 1.2, 25.0, 1.0])
+    covariance = EWMACovariance(tokens)
+    covariance.seed(panel[:, :-1], [78 * 86400])
+    engine = RebalanceEngine(covariance=covariance)
+    assets = ('BTC', 'ETH', 'USDC')
+
+    engine.prepare_risk_parity([assets])
+    version, first = engine.erc_solutions[assets]
+    assert version == covariance.version
+    assert_equal_contributions(first, covariance.matrix(list(assets)))
+
+    covariance.observe(dict(zip(tokens, panel[:, -1])), 80 * 86400)  # Closes a bar and bumps the version
+    assert engine._risk_parity_weights(assets) is not first
+    assert engine.erc_solutions[assets][0] == covariance.version
+    cold, cold_sweeps = equal_risk_contribution(covariance.matrix(list(assets)), return_sweeps=True)
+    warm, warm_sweeps = equal_risk_contribution(covariance.matrix(list(assets)), start=first, return_sweeps=True)
+    assert warm_sweeps < cold_sweeps
+    np.testing.assert_allclose(engine.erc_solutions[assets][1], warm)
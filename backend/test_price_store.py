@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+
+from services.price_service import PriceService
+from services.price_store import PriceHistoryStore
+
+DAY = 86400
+
+
+class FakeMarketChart:
+    """CoinGecko-shaped payloads: one sample per `step` seconds for `days` days plus the forming 'now' sample"""
+
+    def __init__(self, available_days=365, step=DAY):
+        self.available_days = available_days
+        self.step = step
+        self.calls = []
+        self.now = None
+
+    def price(self, ts):
+        return 100.0 + (ts // DAY) % 50
+
+    def __call__(self, token, days):
+        self.calls.append(days)
+        now = self.now
+        days = min(days, self.available_days)
+        stamps = [now - k * self.step for k in range(days * DAY // self.step, 0, -1)] + [now]
+        return {'prices': [[ts * 1000, self.price(ts)] for ts in stamps],
+                'market_caps': [[ts * 1000, 1e9] for ts in stamps],
+                'total_volumes': [[ts * 1000, 1e6] for ts in stamps]}
+
+
+def make_store(tmp_path, monkeypatch, now):
+    monkeypatch.setattr('services.price_store.time.time', lambda: now)
+    return PriceHistoryStore(root=str(tmp_path), refresh_interval=300)
+
+
+def assert_daily_up_to(rows, store, now):
+    assert np.all(np.diff(rows[:, 0]) == store.bar_interval)
+    assert rows[-1, 0] == store.bar_timestamp(now)
+
+
+def test_only_the_missing_tail_is_fetched(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart()
+    fetch.now = now
+    store = make_store(tmp_path, monkeypatch, now)
+    assert len(store.get_history('BTC', 30, fetch)) == 30
+    assert len(store.get_history('BTC', 30, fetch)) == 30
+    assert fetch.calls == [30]  # Forming bar refreshed recently: no second call
+
+    later = now + 3 * DAY
+    monkeypatch.setattr('services.price_store.time.time', lambda: later)
+    fetch.now = later
+    rows = store.get_history('BTC', 30, fetch)
+    assert fetch.calls == [30, 4]  # The last stored bar (to close it) plus three new ones
+    assert len(rows) == 30
+    assert_daily_up_to(store.read('BTC'), store, later)
+
+
+def test_a_longer_read_backfills_the_head(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart()
+    fetch.now = now
+    store = make_store(tmp_path, monkeypatch, now)
+    short = store.get_history('BTC', 7, fetch)
+    view = np.array(short)
+
+    rows = store.get_history('BTC', 60, fetch)
+    assert fetch.calls == [7, 60] and len(rows) == 60
+    assert_daily_up_to(rows, store, now)
+    np.testing.assert_array_equal(rows[-7:], view)
+    assert np.all(rows[:, 1] == [fetch.price(ts) for ts in rows[:, 0]])
+    np.testing.assert_array_equal(short, view)  # Views handed out earlier still read the old file
+
+    assert len(store.get_history('BTC', 60, fetch)) == 60
+    assert fetch.calls == [7, 60]
+
+
+def test_a_short_upstream_history_is_only_backfilled_once(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart(available_days=10)
+    fetch.now = now
+    store = make_store(tmp_path, monkeypatch, now)
+    assert len(store.get_history('NEW', 60, fetch)) == 11
+    assert len(store.get_history('NEW', 60, fetch)) == 11
+    assert fetch.calls == [60]
+
+
+def test_a_reopened_store_maps_the_same_bars(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart()
+    fetch.now = now
+    store = make_store(tmp_path, monkeypatch, now)
+    rows = np.array(store.get_history('ETH', 20, fetch))
+
+    reopened = PriceHistoryStore(root=str(tmp_path))
+    mapped = reopened.read('eth')
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+    np.testing.assert_array_equal(mapped[-20:], rows)
+    assert reopened.get_history('ETH', 20).shape == (20, 4)
+    assert len(reopened.read('MISSING')) == 0
+
+
+def test_an_hourly_store_keeps_chart_resolution(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart(step=3600)
+    fetch.now = now
+    monkeypatch.setattr('services.price_store.time.time', lambda: now)
+    store = PriceHistoryStore(root=str(tmp_path), bar_interval=3600)
+
+    rows = store.get_history('BTC', 7, fetch)
+    assert len(rows) == 7 * 24 and fetch.calls == [7]
+    assert np.all(np.diff(rows[:, 0]) == 3600) and rows[-1, 0] == store.bar_timestamp(now)
+
+    # Five hours later only the last day is re-requested
+    later = now + 5 * 3600
+    monkeypatch.setattr('services.price_store.time.time', lambda: later)
+    fetch.now = later
+    assert len(store.get_history('BTC', 7, fetch)) == 7 * 24
+    assert fetch.calls == [7, 1]
+    assert np.all(np.diff(store.read('BTC')[:, 0]) == 3600)
+
+
+def test_price_service_charts_are_hourly(tmp_path, monkeypatch):
+    now = 1700000000.0
+    fetch = FakeMarketChart(step=3600)
+    fetch.now = now
+    monkeypatch.setattr('services.price_store.time.time', lambda: now)
+
+    service = PriceService(price_store=PriceHistoryStore(root=str(tmp_path), bar_interval=3600))
+    service._fetch_market_chart = fetch
+    chart = service.get_historical_data('BTC', days=7)
+    assert len(chart['prices']) == 7 * 24
+    assert chart['prices'][1][0] - chart['prices'][0][0] == 3600 * 1000
+
+    # A daily store would thin the chart to a point per day, so it is bypassed
+    daily = PriceService(price_store=PriceHistoryStore(root=str(tmp_path / 'daily')))
+    daily._fetch_market_chart = fetch
+    assert len(daily.get_historical_data('BTC', days=7)['prices']) == 7 * 24 + 1
+    assert not any((tmp_path / 'daily').iterdir())
+
+
+def test_backfills_land_when_mapped_files_cannot_be_replaced(tmp_path, monkeypatch):
+    """Windows semantics: a file with a live memory map can be neither replaced nor deleted"""
+    now = 1700000000.0
+    fetch = FakeMarketChart()
+    fetch.now = now
+    store = make_store(tmp_path, monkeypatch, now)
+    short = store.get_history('BTC', 7, fetch)
+    mapped = {os.path.abspath(short.filename)}
+
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if os.path.abspath(dst) in mapped:
+            raise PermissionError(f"{dst} is mapped")
+        real_replace(src, dst)
+
+    def remove(path):
+        if os.path.abspath(path) in mapped:
+            raise PermissionError(f"{path} is mapped")
+        os.unlink(path)
+
+    monkeypatch.setattr('services.price_store.os.replace', replace)
+    monkeypatch.setattr('services.price_store.os.remove', remove)
+
+    rows = store.get_history('BTC', 60, fetch)
+    assert len(rows) == 60 and fetch.calls == [7, 60]
+    np.testing.assert_array_equal(rows[-7:], short)
+    assert sorted(os.listdir(tmp_path)) == ['BTC.1.f8', 'BTC.f8']  # The old file is still mapped
+
+    # Once nothing maps it, the next open picks the newest generation and clears the old one
+    mapped.clear()
+    reopened = PriceHistoryStore(root=str(tmp_path))
+    np.testing.assert_array_equal(reopened.get_history('BTC', 60), rows)
+    assert os.listdir(tmp_path) == ['BTC.1.f8']
@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from models.rebalance_engine import RebalanceEngine
+from models.rebalance_planner import RebalancePlanner
+
+BAND = 0.05
+CASES = range(40)
+
+
+def legacy_plan(current_weights, target_weights, prices, cash=0):
+    """generate_rebalance_plan before the cost-aware planner: every gap straight back to target"""
+    total_value = sum(current_weights.get(asset, 0) * prices.get(asset, 0) for asset in current_weights)
+    total_value += cash
+
+    trade_plan = []
+    for asset in set(list(current_weights.keys()) + list(target_weights.keys())):
+        current_weight = current_weights.get(asset, 0)
+        target_weight = target_weights.get(asset, 0)
+        price = prices.get(asset, 0)
+        if price <= 0:
+            continue
+        trade_value = target_weight * total_value / 100 - current_weight * total_value
+        if abs(trade_value) > 1:
+            trade_plan.append({
+                'asset': asset,
+                'action': "BUY" if trade_value > 0 else "SELL",
+                'amount': abs(round(trade_value / price, 8)),
+                'value': abs(round(trade_value, 2)),
+                'current_allocation': round(current_weight * 100, 2) if current_weight else 0,
+                'target_allocation': target_weight,
+                'price': price
+            })
+    return sorted(trade_plan, key=lambda x: abs(x['value']), reverse=True)
+
+
+def random_case(seed):
+    """Drifted portfolio, percentage targets over the same assets (plus maybe a new one), prices"""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 8))
+    assets = [f"T{i}" for i in range(n)]
+    targets = rng.dirichlet(np.full(n, 2.0))
+    current = rng.dirichlet(targets * 30 + 0.1)
+    if seed % 5 == 0:
+        current[-1] = 0  # Asset not held yet
+        current /= current.sum()
+    prices = dict(zip(assets, rng.uniform(0.5, 50000, n).round(4).tolist()))
+    return dict(zip(assets, current.tolist())), dict(zip(assets, (targets * 100).tolist())), prices
+
+
+def traded_values(plan):
+    return {trade['asset']: trade['value'] * (1 if trade['action'] == 'BUY' else -1) for trade in plan}
+
+
+def weights_after(current_weights, plan, total_value, cash=0):
+    flows = traded_values(plan)
+    values = {asset: weight * total_value + flows.get(asset, 0) for asset, weight in current_weights.items()}
+    return {asset: value / (total_value + cash) for asset, value in values.items()}
+
+
+@pytest.mark.parametrize('seed', CASES)
+def test_plan_lands_inside_bands_and_balances(seed):
+    current, targets, prices = random_case(seed)
+    total_value = 100000.0
+    plan = RebalancePlanner(drift_band=BAND, min_order_value=0).plan(current, targets, prices, total_value=total_value)
+
+    flows = traded_values(plan)
+    assert abs(sum(flows.values())) < 0.01 * len(flows) + 1e-9  # Buys paid for by sells (to the cent)
+    for asset, weight in weights_after(current, plan, total_value).items():
+        assert abs(weight - targets[asset] / 100) <= BAND + 1e-6, asset
+    for trade in plan:
+        if trade['action'] == 'SELL':
+            assert trade['value'] <= current[trade['asset']] * total_value + 0.01
+
+
+@pytest.mark.parametrize('seed', CASES)
+def test_plan_never_costs_more_than_legacy_plan(seed):
+    current, targets, prices = random_case(seed)
+    planner = RebalancePlanner(drift_band=BAND, min_order_value=0)
+    legacy = legacy_plan(current, targets, prices)
+    plan = planner.plan(current, targets, prices)  # Sized like the legacy planner
+
+    # Trading straight to target is one of the in-band outcomes, so the optimum can't cost more
+    assert planner.plan_cost(plan) <= planner.plan_cost(legacy) + 0.01 * len(legacy)
+    assert sum(t['value'] for t in plan) <= sum(t['value'] for t in legacy) + 0.01 * len(legacy)
+
+    # Every asset the legacy planner left out of band is moved the same way
+    legacy_flows, flows = traded_values(legacy), traded_values(plan)
+    for asset, value in legacy_flows.items():
+        if abs(value) > BAND * sum(current[a] * prices[a] for a in current) + 1:
+            assert np.sign(flows.get(asset, 0)) == np.sign(value), asset
+
+
+@pytest.mark.parametrize('seed', CASES)
+def test_plan_respects_minimum_order_sizes(seed):
+    current, targets, prices = random_case(seed)
+    asset = next(iter(prices))
+    planner = RebalancePlanner(drift_band=BAND, min_order_value=250, min_order_amounts={asset: 1000 / prices[asset]})
+    plan = planner.plan(current, targets, prices, total_value=20000.0)
+
+    for trade in plan:
+        minimum = 1000 if trade['asset'] == asset else 250
+        assert trade['value'] >= minimum - 0.01
+
+
+def test_in_band_portfolio_needs_no_trades():
+    current = {'BTC': 0.42, 'ETH': 0.33, 'USDC': 0.25}
+    targets = {'BTC': 40.0, 'ETH': 35.0, 'USDC': 25.0}
+    prices = {'BTC': 109400, 'ETH': 2675, 'USDC': 1.0}
+    assert RebalancePlanner().plan(current, targets, prices, total_value=50000) == []
+
+
+def test_cash_funds_buys_before_anything_is_sold():
+    current = {'BTC': 0.5, 'ETH': 0.5}
+    targets = {'BTC': 50.0, 'ETH': 50.0}
+    prices = {'BTC': 109400, 'ETH': 2675}
+    plan = RebalancePlanner().plan(current, targets, prices, cash=5000, total_value=10000)
+
+    assert {trade['action'] for trade in plan} == {'BUY'}
+    assert sum(trade['value'] for trade in plan) <= 5000
+
+
+def test_percentage_and_fractional_targets_give_the_same_plan():
+    current, targets, prices = random_case(3)
+    planner = RebalancePlanner()
+    fractions = {asset: weight / 100 for asset, weight in targets.items()}
+    by_percent = planner.plan(current, targets, prices, total_value=30000)
+    by_fraction = planner.plan(current, fractions, prices, total_value=30000)
+    assert [(t['asset'], t['value']) for t in by_percent] == [(t['asset'], t['value']) for t in by_fraction]
+
+
+def test_engine_plan_keeps_legacy_trade_fields():
+    current, targets, prices = random_case(7)
+    plan = RebalanceEngine().generate_rebalance_plan(current, targets, prices, total_value=50000)
+    legacy = legacy_plan(current, targets, prices)
+    assert plan and set(legacy[0]) <= set(plan[0])
+    assert [t['value'] for t in plan] == sorted((t['value'] for t in plan), reverse=True)
+
+
+def test_apply_trades_conserves_value_up_to_costs():
+    current, targets, prices = random_case(11)
+    total_value = 40000.0
+    holdings = {asset: weight * total_value / prices[asset] for asset, weight in current.items()}
+    plan = RebalancePlanner().plan(current, targets, prices, total_value=total_value)
+
+    updated = RebalancePlanner.apply_trades(holdings, plan)
+    value = sum(amount * prices[asset] for asset, amount in updated.items())
+    costs = sum(trade['fee'] + trade['slippage'] for trade in plan)
+    assert value == pytest.approx(total_value - costs, abs=0.05 * len(plan) + 1e-6)
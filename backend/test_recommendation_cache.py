@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from services.recommendation_cache import RecommendationCache
+
+WEIGHTS = {'BTC': 0.4, 'ETH': 0.3, 'USDC': 0.3}
+
+
+def counting_computer():
+    calls = []
+
+    def compute(risk_profile, current_weights):
+        calls.append(risk_profile)
+        return {'risk_profile': risk_profile, 'weights': current_weights}
+    return compute, calls
+
+
+def test_profiles_in_a_bucket_share_one_entry():
+    cache = RecommendationCache(bucket_size=5)
+    compute, calls = counting_computer()
+
+    assert cache.get(52, WEIGHTS, 1, compute)['risk_profile'] == 50
+    assert cache.get(48, WEIGHTS, 1, compute)['risk_profile'] == 50
+    assert cache.get(120, WEIGHTS, 1, compute)['risk_profile'] == 100
+    assert calls == [50, 100]
+    assert cache.stats()['hits'] == 1
+
+
+def test_weights_and_signals_version_are_part_of_the_key():
+    cache = RecommendationCache()
+    compute, calls = counting_computer()
+    cache.get(50, WEIGHTS, 1, compute)
+    cache.get(50, dict(WEIGHTS, BTC=0.5), 1, compute)
+    cache.get(50, WEIGHTS, 2, compute)
+    assert len(calls) == 3
+
+
+def test_publish_drops_entries_and_results_computed_on_old_data():
+    cache = RecommendationCache()
+    compute, calls = counting_computer()
+    cache.get(50, WEIGHTS, 1, compute)
+    cache.publish(1)
+    cache.get(50, WEIGHTS, 1, compute)
+    assert len(calls) == 2
+
+    def publish_midway(risk_profile, current_weights):
+        cache.publish(2)
+        return 'stale'
+    assert cache.get(25, WEIGHTS, 1, publish_midway) == 'stale'
+    assert cache.get(25, WEIGHTS, 1, compute)['risk_profile'] == 25
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = RecommendationCache()
+    release = threading.Event()
+    calls = []
+
+    def slow(risk_profile, current_weights):
+        calls.append(risk_profile)
+        release.wait(5)
+        return risk_profile
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(75, WEIGHTS, 1, slow))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 7:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [75] and results == [75] * 8
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    cache = RecommendationCache()
+
+    def failing(risk_profile, current_weights):
+        raise RuntimeError('no prices')
+    with pytest.raises(RuntimeError):
+        cache.get(50, WEIGHTS, 1, failing)
+    compute, calls = counting_computer()
+    cache.get(50, WEIGHTS, 1, compute)
+    assert calls == [50]
+
+
+def test_warm_fills_every_bucket_once():
+    cache = RecommendationCache(bucket_size=25)
+    compute, calls = counting_computer()
+    cache.put(50, WEIGHTS, 1, {'risk_profile': 50})
+
+    assert cache.warm(WEIGHTS, 1, compute) == 4
+    assert sorted(calls) == [0, 25, 75, 100]
+    assert cache.warm(WEIGHTS, 1, compute) == 0
+    assert cache.get(60, WEIGHTS, 1, compute) == {'risk_profile': 50}
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from signals.strategy import SignalGenerator, SignalSnapshotCache
+
+DAY = 86400
+
+
+def daily_frame(seed, end=None, n=60):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end=pd.Timestamp.fromtimestamp(end or time.time()), periods=n, freq='D')
+    return pd.DataFrame({'price': 100 * np.cumprod(1 + rng.normal(0.001, 0.03, n))}, index=index)
+
+
+class CountingFetch:
+    """Stands in for fetch_price_data_batch; `fallback` tokens come back as tagged mock data"""
+
+    def __init__(self, generator, fallback=()):
+        self.generator = generator
+        self.fallback = set(fallback)
+        self.calls = []
+
+    def __call__(self, tokens, days=30):
+        self.calls.append(list(tokens))
+        return {token: self.generator._fallback_price_data(token, days) if token in self.fallback
+                else daily_frame(i) for i, token in enumerate(tokens)}
+
+
+def test_snapshots_hit_on_the_same_bar_and_miss_after_it():
+    cache = SignalSnapshotCache(bar_interval=DAY)
+    bar = cache.bar_timestamp(1700000000)
+    assert cache.get('BTC', 'p', bar) is None
+    cache.put('BTC', 'p', bar, {'total_score': 1.0})
+    assert cache.get('BTC', 'p', bar) == {'total_score': 1.0}
+    assert cache.get('BTC', 'other params', bar) is None
+    assert cache.get('BTC', 'p', bar + DAY) is None  # A new bar started
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'hit_rate': 0.25, 'entries': 1}
+
+
+def test_invalidation_drops_one_token_or_everything():
+    cache = SignalSnapshotCache()
+    for token in ('BTC', 'ETH'):
+        cache.put(token, 'p', 0, {'token': token})
+    cache.invalidate('BTC')
+    assert cache.get('BTC', 'p', 0) is None and cache.get('ETH', 'p', 0) == {'token': 'ETH'}
+    cache.invalidate()
+    assert cache.stats()['entries'] == 0
+
+
+def test_generate_signals_reuses_the_bar_and_refetches_after_it(monkeypatch):
+    generator = SignalGenerator(['BTC', 'ETH'])
+    fetch = generator.fetch_price_data_batch = CountingFetch(generator)
+    first = generator.generate_signals()
+    assert generator.generate_signals() == first
+    assert fetch.calls == [['BTC', 'ETH']]
+
+    generator.indicator_windows['breakout'] = 21  # Different params, different snapshot
+    generator.generate_signals()
+    assert fetch.calls[-1] == ['BTC', 'ETH']
+
+    next_bar = generator.snapshot_cache.current_bar() + DAY
+    monkeypatch.setattr(generator.snapshot_cache, 'current_bar', lambda: next_bar)
+    generator.generate_signals()
+    assert len(fetch.calls) == 3
+
+
+def test_fallback_signals_are_never_cached():
+    generator = SignalGenerator(['BTC', 'ETH'])
+    fetch = generator.fetch_price_data_batch = CountingFetch(generator, fallback={'ETH'})
+    generator.generate_signals()
+    generator.generate_signals()
+    assert fetch.calls == [['BTC', 'ETH'], ['ETH']]  # Upstream retried for the token that fell back
+
+    fetch.fallback.clear()
+    generator.generate_signals()
+    generator.generate_signals()
+    assert fetch.calls[2:] == [['ETH']]
+
+
+def test_fallback_signals_from_the_panel_path_are_never_cached():
+    tokens = [f'T{i}' for i in range(20)]
+    generator = SignalGenerator(tokens)
+    generator.panel_min_tokens = 1
+    fetch = generator.fetch_price_data_batch = CountingFetch(generator, fallback={'T3'})
+    generator.generate_signals()
+    generator.generate_signals()
+    assert fetch.calls[1] == ['T3']
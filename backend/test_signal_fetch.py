@@ -0,0 +1,65 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from signals.strategy import SignalGenerator
+
+
+def real_frame(token, days):
+    index = pd.date_range(end=pd.Timestamp.now(), periods=days, freq='D')
+    return pd.DataFrame({'price': np.linspace(100, 120, days) * (1 + len(token) / 100)}, index=index)
+
+
+@pytest.fixture
+def generator():
+    """A generator whose per-token fetch is stubbed: SLOW blocks until released, FAIL raises"""
+    generator = SignalGenerator(['BTC', 'SLOW', 'ETH', 'FAIL', 'USDC'])
+    generator.fetch_deadline = 0.3
+    release = threading.Event()
+
+    def fetch_price_data(token, days=30):
+        if token == 'SLOW':
+            release.wait(5)
+        if token == 'FAIL':
+            raise RuntimeError("429 Too Many Requests")
+        return real_frame(token, days)
+
+    generator.fetch_price_data = fetch_price_data
+    yield generator
+    release.set()
+
+
+def test_the_batch_honours_the_deadline_and_keeps_token_order(generator):
+    started = time.monotonic()
+    frames = generator.fetch_price_data_batch(generator.tokens, days=60)
+    assert time.monotonic() - started < generator.fetch_deadline + 1
+
+    assert list(frames) == generator.tokens
+    assert [token for token, frame in frames.items() if generator.is_fallback(frame)] == ['SLOW', 'FAIL']
+    for token in ('BTC', 'ETH', 'USDC'):
+        np.testing.assert_array_equal(frames[token]['price'], real_frame(token, 60)['price'])
+        assert not frames[token].attrs
+
+
+def test_late_and_failed_tokens_are_refetched_rather_than_cached(generator):
+    first = generator.generate_signals()
+    assert list(first) == generator.tokens
+
+    started = time.monotonic()
+    second = generator.generate_signals()
+    assert time.monotonic() - started < generator.fetch_deadline + 1
+    for token in ('BTC', 'ETH', 'USDC'):
+        assert second[token] is first[token]  # Cached real signals
+    for token in ('SLOW', 'FAIL'):
+        assert second[token] is not first[token]
+    assert generator.snapshot_cache.stats()['entries'] == 3
+
+
+def test_a_sequential_fetch_falls_back_too():
+    generator = SignalGenerator(['BTC'])
+    generator._fetch_market_chart = lambda token, days: None
+    frame = generator.fetch_price_data('BTC', 30)
+    assert generator.is_fallback(frame) and len(frame) > 0
@@ -0,0 +1,126 @@
+import pytest
+import requests
+
+from models.virtual_account import VirtualAccountManager
+from services.token_registry import TokenRegistry
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeCoinGecko:
+    """Answers simple/price and coins/markets from a table of {coin id: price}; records every call"""
+
+    def __init__(self, prices, failing_chunks=(), markets=()):
+        self.prices = prices
+        self.failing_chunks = set(failing_chunks)  # Indexes of simple/price calls that fail
+        self.markets = list(markets)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url.rsplit('/', 1)[-1], dict(params)))
+        if url.endswith('/simple/price'):
+            if len(self.calls) - 1 in self.failing_chunks:
+                raise requests.exceptions.ConnectionError('boom')
+            ids = params['ids'].split(',')
+            return FakeResponse({i: {'usd': self.prices[i]} for i in ids if i in self.prices})
+        start = (params['page'] - 1) * 250
+        return FakeResponse(self.markets[start:start + params['per_page']])
+
+
+def registry_with(count, chunk_size=250):
+    return TokenRegistry({f'T{i}': (f'coin-{i}', None) for i in range(count)}, chunk_size=chunk_size)
+
+
+@pytest.fixture
+def coingecko(monkeypatch):
+    def install(*args, **kwargs):
+        fake = FakeCoinGecko(*args, **kwargs)
+        monkeypatch.setattr('services.token_registry.requests.get', fake.get)
+        return fake
+    return install
+
+
+def test_prices_are_fetched_in_chunks_of_ids(coingecko):
+    registry = registry_with(600)
+    fake = coingecko({f'coin-{i}': float(i) for i in range(600)})
+
+    prices = registry.fetch_prices(registry.symbols())
+    assert prices == {f'T{i}': float(i) for i in range(600)}
+    chunks = [params['ids'].split(',') for _, params in fake.calls]
+    assert [len(chunk) for chunk in chunks] == [250, 250, 100]
+    assert sorted(sum(chunks, [])) == sorted(f'coin-{i}' for i in range(600))
+
+
+def test_symbols_sharing_an_id_cost_one_slot(coingecko):
+    registry = registry_with(3, chunk_size=2)
+    registry.register('WBTC', 'coin-0')
+    fake = coingecko({'coin-0': 10.0, 'coin-1': 11.0, 'coin-2': 12.0})
+
+    prices = registry.fetch_prices(['T0', 'wbtc', 'T1', 'T2'])
+    assert prices == {'T0': 10.0, 'wbtc': 10.0, 'T1': 11.0, 'T2': 12.0}
+    assert [params['ids'] for _, params in fake.calls] == ['coin-0,coin-1', 'coin-2']
+    assert registry.symbol('coin-0') == 'WBTC'  # Last registration wins the reverse lookup
+
+
+def test_failed_chunks_and_unknown_ids_are_left_out(coingecko):
+    registry = registry_with(5, chunk_size=2)
+    coingecko({f'coin-{i}': float(i) for i in range(4)}, failing_chunks=[1])
+
+    assert registry.fetch_prices(registry.symbols()) == {'T0': 0.0, 'T1': 1.0}
+    assert registry.fetch_prices([]) == {}
+
+
+def test_unknown_symbols_resolve_to_their_lower_cased_name(coingecko):
+    registry = TokenRegistry()
+    fake = coingecko({'pepe': 0.00001})
+    assert registry.fetch_prices(['PEPE']) == {'PEPE': 0.00001}
+    assert fake.calls[0][1]['ids'] == 'pepe'
+
+
+def test_top_markets_keep_existing_mappings(coingecko):
+    markets = [{'id': 'bitcoin', 'symbol': 'btc', 'current_price': 100.0},
+               {'id': 'bitcoin-imposter', 'symbol': 'btc', 'current_price': 1.0}]
+    markets += [{'id': f'coin-{i}', 'symbol': f'c{i}', 'current_price': float(i)} for i in range(300)]
+    fake = coingecko({}, markets=markets)
+    registry = TokenRegistry()
+
+    prices = registry.load_top_markets(count=300)
+    assert [params['per_page'] for _, params in fake.calls] == [250, 50]
+    assert registry.coin_id('BTC') == 'bitcoin' and prices['BTC'] == 100.0
+    assert registry.coin_id('C297') == 'coin-297' and prices['C297'] == 297.0
+    assert 'C298' not in prices  # Past the requested count
+
+
+def test_fallback_prices_fill_the_gaps_in_a_partial_response(coingecko, tmp_path):
+    registry = TokenRegistry()
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                    token_registry=registry)
+    coingecko({'bitcoin': 50000.0, 'ethereum': 3000.0})
+
+    prices = manager._get_current_prices()
+    assert prices == {**registry.fallback_prices(), 'BTC': 50000.0, 'ETH': 3000.0}
+    assert prices['ADA'] == 0.70 and 'SOL' not in prices  # No fallback price for SOL
+    manager.close()
+
+
+def test_fallback_prices_jitter_when_every_chunk_fails(coingecko, tmp_path):
+    registry = TokenRegistry()
+    manager = VirtualAccountManager(data_file=str(tmp_path / 'accounts.json'), start_updates=False,
+                                    token_registry=registry)
+    coingecko({}, failing_chunks=[0])
+
+    prices = manager._get_current_prices()
+    fallback = registry.fallback_prices()
+    assert set(prices) == set(fallback)
+    for token, price in prices.items():
+        assert price == pytest.approx(fallback[token], rel=0.005)
+    manager.close()
@@ -0,0 +1,79 @@
+from models.virtual_account import VirtualAccountManager
+
+PRICES = {'BTC': 109400, 'ETH': 2675, 'ADA': 0.70, 'DOT': 4.12, 'USDC': 1.00, 'WBTC': 109400, 'LINK': 14.0}
+
+
+def make_manager(path):
+    manager = VirtualAccountManager(data_file=str(path), start_updates=False, storage='journal')
+    manager._get_current_prices = lambda: dict(PRICES)
+    return manager
+
+
+def scanned_index(manager):
+    """What the bot indexes should hold, by scanning every account"""
+    bots, by_status = {}, {}
+    for user_id, account in manager.accounts.items():
+        for bot in account['bots']:
+            bots[bot['bot_id']] = (user_id, bot)
+            by_status.setdefault(bot['status'], set()).add(bot['bot_id'])
+    return bots, by_status
+
+
+def assert_index_consistent(manager):
+    bots, by_status = scanned_index(manager)
+    assert {bot_id: (user_id, bot['bot_id']) for bot_id, (user_id, bot) in manager.bots.items()} == \
+        {bot_id: (user_id, bot['bot_id']) for bot_id, (user_id, bot) in bots.items()}
+    assert all(manager.bots[bot_id][1] is bot for bot_id, (_, bot) in bots.items())
+    for status in set(by_status) | set(manager.bots_by_status):
+        assert set(manager.bots_by_status.get(status, {})) == by_status.get(status, set())
+
+
+def test_indexes_follow_deploy_stop_resume_delete_and_load(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    manager.create_account('bob')
+    first = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    second = manager.deploy_bot('alice', 'momentum', 50, 10000)
+    third = manager.deploy_bot('bob', 'shannon', 50, 10000)
+    assert_index_consistent(manager)
+
+    manager.stop_bot('alice', first['bot_id'])
+    manager.stop_bot('bob', third['bot_id'])
+    assert_index_consistent(manager)
+    assert set(manager.bots_by_status['active']) == {second['bot_id']}
+
+    manager.resume_bot('bob', third['bot_id'])
+    manager.delete_bot('alice', first['bot_id'])
+    assert_index_consistent(manager)
+    assert [bot['bot_id'] for bot in manager.accounts['alice']['bots']] == [second['bot_id']]
+
+    manager.close()
+    assert_index_consistent(make_manager(tmp_path / 'accounts.json'))
+
+
+def test_lookups_are_scoped_to_the_owner(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    manager.create_account('bob')
+    bot = manager.deploy_bot('alice', 'tactical', 50, 10000)
+
+    assert manager.stop_bot('bob', bot['bot_id']) is False
+    assert manager.delete_bot('bob', bot['bot_id']) == (False, "Bot not found.")
+    manager.execute_virtual_trade('bob', bot['bot_id'], 'BTC', 'BUY', 1, PRICES['BTC'])
+    assert manager.accounts['bob']['trade_history'] == []
+    assert manager.bots[bot['bot_id']] == ('alice', bot) and bot['status'] == 'active'
+    manager.close()
+
+
+def test_valuation_only_touches_active_bots(tmp_path):
+    manager = make_manager(tmp_path / 'accounts.json')
+    manager.create_account('alice')
+    active = manager.deploy_bot('alice', 'tactical', 50, 10000)
+    stopped = manager.deploy_bot('alice', 'momentum', 50, 10000)
+    manager.stop_bot('alice', stopped['bot_id'])
+    stopped['portfolio_value'] = -1  # Would be overwritten if the stopped bot were revalued
+
+    manager._update_all_portfolios(prices={asset: price * 2 for asset, price in PRICES.items()})
+    assert active['portfolio_value'] > 10000 and stopped['portfolio_value'] == -1
+    assert [bot['bot_id'] for _, bot in manager.get_active_bots()] == [active['bot_id']]
+    manager.close()